@@ -0,0 +1,347 @@
+"""
+Audit log writes, partitions and retention.
+
+record_event() stamps an AuditLog row with the current time and buffers it
+in the process; the buffer is written with one bulk_create when it holds
+AUDIT_FLUSH_SIZE events, every AUDIT_FLUSH_INTERVAL seconds from a
+background thread, and at exit. Set AUDIT_ASYNC = False to write each event
+inline instead.
+
+A batch that fails is requeued. Events that fail a second time are written
+one at a time, so a single bad event cannot block the rest; one that fails
+AUDIT_FLUSH_RETRIES flushes is logged and dropped. The buffer holds at most
+AUDIT_BUFFER_MAX_EVENTS events, dropping the oldest (and logging it) beyond
+that, so a database outage cannot grow the process without bound.
+
+On PostgreSQL accounts_auditlog is range-partitioned by month on timestamp
+(UTC months, accounts migration 0008), so queries filtered on timestamp
+only touch the months they cover. `python manage.py rotate_audit_log` (run
+daily) creates the partitions for the coming months and archives every
+month older than AUDIT_RETENTION_MONTHS to a gzipped NDJSON file in default
+storage before dropping it. Other databases keep one table; rotation archives and deletes
+the old rows in batches.
+"""
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
+from .models import AuditLog
+import atexit
+import gzip
+import json
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLE = AuditLog._meta.db_table
+
+
+class AuditBuffer:
+    """Holds unsaved AuditLog rows until they are flushed."""
+
+    def __init__(self):
+        self._pending = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._thread = None
+
+    @property
+    def flush_size(self):
+        return getattr(settings, 'AUDIT_FLUSH_SIZE', 200)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'AUDIT_FLUSH_INTERVAL', 5)
+
+    @property
+    def max_events(self):
+        return getattr(settings, 'AUDIT_BUFFER_MAX_EVENTS', 10000)
+
+    @property
+    def max_retries(self):
+        return getattr(settings, 'AUDIT_FLUSH_RETRIES', 3)
+
+    def _trim(self):
+        """Drop the oldest events beyond max_events. Call with the lock held."""
+        overflow = len(self._pending) - self.max_events
+        if overflow <= 0:
+            return 0
+        del self._pending[:overflow]
+        return overflow
+
+    def add(self, event):
+        """Buffer an event; flush inline when a threshold is reached."""
+        with self._lock:
+            self._pending.append(event)
+            dropped = self._trim()
+            due = (
+                len(self._pending) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if dropped:
+            logger.error(f"Audit buffer full, dropped the {dropped} oldest events")
+        self._ensure_thread()
+        if due:
+            self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        return pending
+
+    def requeue(self, events):
+        """Put back events after a failed flush, ahead of newer ones."""
+        with self._lock:
+            self._pending[:0] = events
+            dropped = self._trim()
+        if dropped:
+            logger.error(f"Audit buffer full, dropped the {dropped} oldest events")
+
+    def flush(self):
+        """Write all buffered events. Returns the number written."""
+        pending = self.drain()
+        if not pending:
+            return 0
+        try:
+            write_events(pending)
+        except Exception:
+            logger.exception(f"Failed to flush {len(pending)} audit events")
+            return self._retry(pending)
+        return len(pending)
+
+    def _retry(self, events):
+        """
+        Handle a batch that failed. Events failing for the first time are
+        requeued; the others are written one by one to isolate a bad event,
+        which is dropped after max_retries failed flushes.
+
+        Returns:
+            int: Number of events written
+        """
+        requeue, written = [], 0
+        for event in events:
+            event._flush_failures = getattr(event, '_flush_failures', 0) + 1
+            if event._flush_failures == 1:
+                requeue.append(event)
+                continue
+            try:
+                write_events([event])
+                written += 1
+            except Exception as e:
+                if event._flush_failures < self.max_retries:
+                    requeue.append(event)
+                    continue
+                logger.error(
+                    f"Dropping audit event {event.action} by {event.actor_email} "
+                    f"(user {event.target_user_id}, course {event.target_course_id}) "
+                    f"after {event._flush_failures} failed writes: {e}; details={event.details!r}"
+                )
+        self.requeue(requeue)
+        return written
+
+    def _ensure_thread(self):
+        if self._thread is not None or not getattr(settings, 'AUDIT_FLUSH_THREAD', True):
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+def _drop_missing_references(events):
+    """Null foreign keys to users/courses deleted while their events were buffered."""
+    for field in AuditLog._meta.concrete_fields:
+        if not field.is_relation:
+            continue
+        ids = {getattr(event, field.attname) for event in events} - {None}
+        if not ids:
+            continue
+        existing = set(field.related_model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        for event in events:
+            if getattr(event, field.attname) not in existing:
+                setattr(event, field.attname, None)
+
+
+def write_events(events):
+    """Insert AuditLog instances with bulk_create."""
+    _drop_missing_references(events)
+    with transaction.atomic():
+        AuditLog.objects.bulk_create(events, batch_size=500)
+
+
+def record_event(action, actor=None, actor_email=None, **fields):
+    """
+    Record an audit event.
+
+    Args:
+        action (str): One of AuditLog.ACTION_CHOICES
+        actor: User performing the action; actor_email defaults to theirs
+        fields: target_user, target_course, details, ip_address
+
+    Returns:
+        AuditLog: The event (without a pk until it is flushed when buffered)
+    """
+    if actor_email is None:
+        actor_email = actor.email if actor is not None else ''
+    event = AuditLog(action=action, actor=actor, actor_email=actor_email, timestamp=timezone.now(), **fields)
+    if getattr(settings, 'AUDIT_ASYNC', True):
+        audit_buffer.add(event)
+    else:
+        write_events([event])
+    return event
+
+
+audit_buffer = AuditBuffer()
+atexit.register(audit_buffer.flush)
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Monthly partitions as {month start: table name}, PostgreSQL only."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        try:
+            stamp = datetime.strptime(name[len(TABLE) + 2:], '%Y_%m')
+        except ValueError:
+            continue  # the default partition
+        partitions[stamp.replace(tzinfo=dt_timezone.utc)] = name
+    return partitions
+
+
+def create_partitions(months_ahead=None):
+    """
+    Make sure monthly partitions exist from this month to `months_ahead`.
+
+    Returns:
+        list: Names of partitions created
+    """
+    months_ahead = months_ahead if months_ahead is not None else getattr(settings, 'AUDIT_PARTITIONS_AHEAD', 2)
+    existing = list_partitions()
+    created = []
+    this_month = _month_start(timezone.now())
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = _add_months(this_month, offset)
+            if month in existing:
+                continue
+            name = partition_name(month)
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{TABLE}" '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            )
+            created.append(name)
+    if created:
+        logger.info(f"Created audit log partitions {', '.join(created)}")
+    return created
+
+
+def archive_rows(rows, month):
+    """
+    Write rows (values() dicts) as gzipped NDJSON to default storage.
+
+    Returns:
+        str: Storage path of the archive
+    """
+    prefix = getattr(settings, 'AUDIT_ARCHIVE_PREFIX', 'audit_archive/')
+    with tempfile.TemporaryFile() as handle:
+        with gzip.GzipFile(fileobj=handle, mode='wb') as archive:
+            for row in rows:
+                archive.write((json.dumps(row, cls=DjangoJSONEncoder) + '\n').encode())
+        handle.seek(0)
+        return default_storage.save(f'{prefix}auditlog-{month:%Y-%m}.ndjson.gz', File(handle))
+
+
+def _month_rows(month):
+    return (
+        AuditLog.objects.filter(timestamp__gte=month, timestamp__lt=_add_months(month, 1))
+        .order_by('timestamp', 'id')
+        .values()
+        .iterator(chunk_size=2000)
+    )
+
+
+def expire_old_events(retention_months=None, batch_size=5000):
+    """
+    Archive and remove audit events older than the retention period.
+
+    Returns:
+        list: Storage paths of the archives written
+    """
+    retention_months = retention_months if retention_months is not None else getattr(settings, 'AUDIT_RETENTION_MONTHS', 12)
+    cutoff = _add_months(_month_start(timezone.now()), -retention_months)
+    archives = []
+
+    if is_partitioned():
+        for month, name in sorted(list_partitions().items()):
+            if month >= cutoff:
+                continue
+            archives.append(archive_rows(_month_rows(month), month))
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+                cursor.execute(f'DROP TABLE "{name}"')
+            logger.info(f"Archived and dropped audit log partition {name}")
+        return archives
+
+    oldest = AuditLog.objects.filter(timestamp__lt=cutoff).order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return archives
+    month = _month_start(oldest)
+    while month < cutoff:
+        if AuditLog.objects.filter(timestamp__gte=month, timestamp__lt=_add_months(month, 1)).exists():
+            archives.append(archive_rows(_month_rows(month), month))
+            old = AuditLog.objects.filter(timestamp__gte=month, timestamp__lt=_add_months(month, 1))
+            while True:
+                batch = list(old.values_list('pk', flat=True)[:batch_size])
+                if not batch:
+                    break
+                AuditLog.objects.filter(pk__in=batch).delete()
+            logger.info(f"Archived and deleted audit log events for {month:%Y-%m}")
+        month = _add_months(month, 1)
+    return archives
@@ -0,0 +1,33 @@
+"""
+Create upcoming audit log partitions and archive expired months.
+
+Usage (daily from cron):
+    python manage.py rotate_audit_log
+    python manage.py rotate_audit_log --retention-months 24 --months-ahead 3
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from accounts.audit import audit_buffer, create_partitions, expire_old_events, is_partitioned
+
+
+class Command(BaseCommand):
+    help = 'Create monthly audit log partitions and archive events past retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-months', type=int,
+                            default=getattr(settings, 'AUDIT_RETENTION_MONTHS', 12),
+                            help='Whole months of events to keep in the database')
+        parser.add_argument('--months-ahead', type=int,
+                            default=getattr(settings, 'AUDIT_PARTITIONS_AHEAD', 2),
+                            help='Future months to create partitions for (PostgreSQL)')
+
+    def handle(self, *args, **options):
+        if is_partitioned():
+            created = create_partitions(max(options['months_ahead'], 0))
+            self.stdout.write(f'Created {len(created)} partitions')
+
+        archives = expire_old_events(max(options['retention_months'], 1))
+        for path in archives:
+            self.stdout.write(f'Archived {path}')
+        audit_buffer.flush()
+        self.stdout.write(self.style.SUCCESS(f'Archived {len(archives)} months of audit events'))
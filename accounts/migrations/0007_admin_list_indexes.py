@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-17 02:51
+
+from django.db import migrations, models
+
+
+TRIGRAM_INDEXES = {
+    'accounts_user_email_trgm': 'email',
+    'accounts_user_first_name_trgm': 'first_name',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Trigram GIN indexes serve the admin search's icontains (UPPER(col::text) LIKE ...)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON accounts_customuser USING GIN (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_customuser_firebase_uid_customuser_theme'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('courses', '0009_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='accounts_au_timesta_23ba9d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['-created_at', '-id'], name='accounts_cu_created_ce24d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', '-created_at', '-id'], name='accounts_cu_role_0d817c_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
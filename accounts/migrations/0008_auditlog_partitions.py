@@ -0,0 +1,85 @@
+# Generated by Django 5.1.7 on 2026-10-17 02:55
+
+import django.utils.timezone
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+TABLE = 'accounts_auditlog'
+OLD_TABLE = 'accounts_auditlog_unpartitioned'
+SEQUENCE = 'accounts_auditlog_partitioned_id_seq'
+MONTHS_AHEAD = 2
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_auditlog(apps, schema_editor):
+    """
+    Rebuild accounts_auditlog as a table range-partitioned by month on
+    timestamp. The primary key becomes (id, timestamp) because PostgreSQL
+    requires the partition key in it; ids still come from one sequence.
+    Indexes and foreign keys are recreated from their existing definitions.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [TABLE, f'{TABLE}_pkey'],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min("timestamp") FROM {TABLE}')
+        oldest = cursor.fetchone()[0] or datetime.now(timezone.utc)
+
+    schema_editor.execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+    schema_editor.execute(f'CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")')
+    schema_editor.execute(f'CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+    schema_editor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+
+    month = datetime(oldest.year, oldest.month, 1, tzinfo=timezone.utc)
+    last = _add_months(datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0), MONTHS_AHEAD)
+    while month <= last:
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+    # Catches rows outside the monthly partitions if rotation stops running
+    schema_editor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+    schema_editor.execute(f'INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}')
+    schema_editor.execute(f"SELECT setval('{SEQUENCE}', (SELECT coalesce(max(id), 0) + 1 FROM {TABLE}), false)")
+    schema_editor.execute(f'DROP TABLE {OLD_TABLE}')
+
+    schema_editor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, "timestamp")')
+    for definition in indexes:
+        schema_editor.execute(definition)
+    for name, definition in foreign_keys:
+        schema_editor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(partition_auditlog, migrations.RunPython.noop),
+    ]
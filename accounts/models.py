@@ -51,6 +51,10 @@ class CustomUser(AbstractUser):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['role', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.email} ({self.role})"
@@ -177,7 +181,7 @@ class AuditLog(models.Model):
     target_user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='audit_logs_target')
     target_course = models.ForeignKey('courses.Course', on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_logs')
     details = models.JSONField(default=dict, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)  # set when the event happens, not when it is flushed
     ip_address = models.CharField(max_length=45, blank=True, null=True)  # Supports IPv6
     
 
@@ -186,6 +190,7 @@ class AuditLog(models.Model):
         indexes = [
             models.Index(fields=['target_user', '-timestamp']),
             models.Index(fields=['action', '-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
         ]
 
     def __str__(self):
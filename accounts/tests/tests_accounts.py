@@ -1,7 +1,16 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from accounts.models import AuditLog
+from accounts.audit import audit_buffer, expire_old_events, record_event
+from datetime import timedelta
+from unittest.mock import patch
+import gzip
+import json
+import shutil
+import tempfile
 
 User = get_user_model()
 
@@ -146,3 +155,100 @@ class AuditLogTestCase(TestCase):
         self.assertEqual(log.action, 'user_created')
         self.assertEqual(log.target_user, target)
         self.assertIsNotNone(log.timestamp)
+
+
+
+@override_settings(AUDIT_ASYNC=True, AUDIT_FLUSH_THREAD=False, AUDIT_FLUSH_SIZE=100, AUDIT_FLUSH_INTERVAL=3600)
+class AuditBufferTestCase(TestCase):
+    """Test buffered audit writes and retention"""
+    
+    def setUp(self):
+        """Set up an admin and a target user with an empty buffer"""
+        audit_buffer.drain()
+        self.addCleanup(audit_buffer.drain)
+        self.actor = User.objects.create_user(username='admin@example.com', email='admin@example.com', password='testpass123', role='admin')
+        self.target = User.objects.create_user(username='user@example.com', email='user@example.com', password='testpass123')
+    
+    def test_events_are_written_in_bulk(self):
+        """Test events wait in the buffer and are inserted together"""
+        for _ in range(3):
+            record_event('user_suspended', actor=self.actor, target_user=self.target)
+        self.assertEqual(AuditLog.objects.count(), 0)
+        
+        with self.assertNumQueries(5):
+            self.assertEqual(audit_buffer.flush(), 3)
+        log = AuditLog.objects.first()
+        self.assertEqual(log.actor_email, 'admin@example.com')
+        self.assertEqual(AuditLog.objects.filter(target_user=self.target).count(), 3)
+    
+    def test_timestamp_is_event_time(self):
+        """Test the timestamp is taken when the event is recorded, not flushed"""
+        event = record_event('user_activated', actor=self.actor, target_user=self.target)
+        with patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(hours=1)):
+            audit_buffer.flush()
+        self.assertEqual(AuditLog.objects.get().timestamp, event.timestamp)
+    
+    def test_deleted_target_is_dropped(self):
+        """Test a user deleted before the flush does not break the insert"""
+        record_event('user_suspended', actor=self.actor, target_user=self.target)
+        self.target.delete()
+        
+        self.assertEqual(audit_buffer.flush(), 1)
+        log = AuditLog.objects.get()
+        self.assertIsNone(log.target_user_id)
+        self.assertEqual(log.actor_id, self.actor.id)
+    
+    @override_settings(AUDIT_FLUSH_RETRIES=2)
+    def test_bad_event_is_isolated_and_dropped(self):
+        """Test an event that cannot be written does not block the others"""
+        record_event('user_suspended', actor=self.actor, target_user=self.target)
+        record_event('user_deleted', actor=self.actor, details={'unserializable': object()})
+        record_event('user_activated', actor=self.actor, target_user=self.target)
+        
+        with self.assertLogs('accounts.audit', 'ERROR'):
+            self.assertEqual(audit_buffer.flush(), 0)
+        self.assertEqual(len(audit_buffer), 3)
+        
+        with self.assertLogs('accounts.audit', 'ERROR') as logs:
+            self.assertEqual(audit_buffer.flush(), 2)
+        self.assertIn('Dropping audit event user_deleted', logs.output[-1])
+        self.assertEqual(len(audit_buffer), 0)
+        self.assertEqual(set(AuditLog.objects.values_list('action', flat=True)), {'user_suspended', 'user_activated'})
+        
+        record_event('user_created', actor=self.actor)
+        self.assertEqual(audit_buffer.flush(), 1)
+    
+    @override_settings(AUDIT_BUFFER_MAX_EVENTS=2, AUDIT_FLUSH_SIZE=100, AUDIT_FLUSH_INTERVAL=3600, AUDIT_FLUSH_THREAD=False)
+    def test_buffer_is_capped(self):
+        """Test the oldest events are dropped once the buffer is full"""
+        with self.assertLogs('accounts.audit', 'ERROR'):
+            for action in ('user_created', 'user_suspended', 'user_activated'):
+                record_event(action, actor=self.actor)
+        
+        self.assertEqual([event.action for event in audit_buffer.drain()], ['user_suspended', 'user_activated'])
+    
+    @override_settings(AUDIT_ASYNC=False)
+    def test_sync_mode_writes_inline(self):
+        """Test AUDIT_ASYNC=False writes each event immediately"""
+        record_event('user_deleted', actor=self.actor, details={'username': 'gone'})
+        self.assertEqual(len(audit_buffer), 0)
+        self.assertEqual(AuditLog.objects.get().details, {'username': 'gone'})
+    
+    def test_expired_months_are_archived(self):
+        """Test events past retention are archived as NDJSON and deleted"""
+        old = AuditLog.objects.create(actor=self.actor, actor_email=self.actor.email, action='user_created',
+                                      timestamp=timezone.now() - timedelta(days=400))
+        AuditLog.objects.create(actor=self.actor, actor_email=self.actor.email, action='user_created')
+        
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, True)
+        storage = FileSystemStorage(location=location)
+        with patch('accounts.audit.default_storage', storage):
+            archives = expire_old_events(retention_months=12)
+        
+        self.assertEqual(len(archives), 1)
+        self.assertEqual(list(AuditLog.objects.values_list('action', flat=True)), ['user_created'])
+        self.assertFalse(AuditLog.objects.filter(pk=old.pk).exists())
+        with storage.open(archives[0]) as archive:
+            rows = [json.loads(line) for line in gzip.decompress(archive.read()).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [old.pk])
@@ -190,7 +190,7 @@ def instructor_dashboard(request):
         return redirect('accounts:login')
     
     from courses.models import Course
-    courses = Course.objects.filter(instructor=request.user)
+    courses = Course.objects.filter(instructor=request.user).select_related('stats')
     context = {'courses': courses}
     return render(request, 'accounts/instructor_dashboard.html', context)
 
@@ -8,3 +8,7 @@ class AdminPanelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admin_panel'
     verbose_name = "Admin Panel"
+
+    def ready(self):
+        # Register signal handlers that invalidate the dashboard metrics snapshot
+        from . import signals  # noqa: F401
@@ -0,0 +1,248 @@
+"""
+Bulk admin actions on users and courses.
+
+A selection is either explicit ids ({'ids': [...]}) or whitelisted filters
+({'filters': {...}}, see FILTERS). Rows are walked in pk order
+ADMIN_BULK_CHUNK_SIZE at a time; each chunk is one update() limited to the
+rows the action actually changes plus one bulk_create of their audit
+events, in a single transaction. update() skips model signals, so the
+dashboard metrics snapshot (and, for courses, the catalog cache) is
+invalidated explicitly after each chunk.
+
+Selections of up to ADMIN_BULK_INLINE_LIMIT rows are applied within the
+request. Larger ones are queued as a BulkActionJob that
+`python manage.py process_bulk_admin_jobs` works through, saving its
+position and counts after every chunk so progress can be polled and an
+interrupted job resumes where it stopped.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from accounts.audit import write_events
+from accounts.models import AuditLog, CustomUser
+from courses.catalog import bump_catalog_version
+from courses.models import Course
+from datetime import timedelta
+from .listing import search_filter
+from .metrics import invalidate_metrics
+from .models import BulkActionJob
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODELS = {'user': CustomUser, 'course': Course}
+
+# target -> action -> (values to set, rows the action changes, audit action)
+ACTIONS = {
+    'user': {
+        'suspend': (lambda reason: {'is_suspended': True, 'suspended_at': timezone.now()}, Q(is_suspended=False), 'user_suspended'),
+        'activate': (lambda reason: {'is_suspended': False, 'suspended_at': None}, Q(is_suspended=True), 'user_activated'),
+    },
+    'course': {
+        'flag': (lambda reason: {'is_flagged': True, 'flag_reason': reason}, Q(is_flagged=False), 'course_flagged'),
+        'unflag': (lambda reason: {'is_flagged': False, 'flag_reason': None}, Q(is_flagged=True), 'course_unflagged'),
+        'suspend': (lambda reason: {'is_suspended': True, 'suspended_reason': reason}, Q(is_suspended=False), 'course_suspended'),
+        'unsuspend': (lambda reason: {'is_suspended': False, 'suspended_reason': None}, Q(is_suspended=True), 'course_unsuspended'),
+    },
+}
+
+BOOLEAN_FILTERS = {'is_suspended', 'is_flagged'}
+
+# target -> filter name -> lookup ('q' searches the listing's search fields)
+FILTERS = {
+    'user': {'role': 'role', 'is_suspended': 'is_suspended', 'q': ('email', 'first_name')},
+    'course': {'status': 'status', 'instructor': 'instructor_id', 'is_flagged': 'is_flagged',
+               'is_suspended': 'is_suspended', 'q': ('title', 'description')},
+}
+
+
+class BulkActionError(ValueError):
+    """An invalid bulk action or selection."""
+
+
+def _chunk_size():
+    return getattr(settings, 'ADMIN_BULK_CHUNK_SIZE', 500)
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ('1', 'true', 'yes'):
+        return True
+    if str(value).lower() in ('0', 'false', 'no'):
+        return False
+    raise BulkActionError(f'Invalid boolean: {value}')
+
+
+def clean_selection(target, selection):
+    """
+    Validate a selection and normalize ids to sorted ints.
+
+    Raises:
+        BulkActionError: Neither ids nor filters, or an unknown filter
+    """
+    if selection.get('ids'):
+        try:
+            ids = sorted({int(pk) for pk in selection['ids']})
+        except (TypeError, ValueError):
+            raise BulkActionError('ids must be integers')
+        if len(ids) > getattr(settings, 'ADMIN_BULK_MAX_IDS', 10000):
+            raise BulkActionError('Too many ids, select with filters instead')
+        return {'ids': ids}
+
+    filters = selection.get('filters') or {}
+    if not filters:
+        raise BulkActionError('Select rows with ids or filters')
+    unknown = set(filters) - set(FILTERS[target])
+    if unknown:
+        raise BulkActionError(f"Unknown filters: {', '.join(sorted(unknown))}")
+    return {'filters': {name: _as_bool(value) if name in BOOLEAN_FILTERS else value for name, value in filters.items()}}
+
+
+def _filtered(target, filters):
+    rows = MODELS[target].objects.all()
+    for name, value in filters.items():
+        lookup = FILTERS[target][name]
+        if isinstance(lookup, tuple):
+            rows = rows.filter(search_filter(value, lookup))
+        else:
+            rows = rows.filter(**{lookup: value})
+    return rows
+
+
+def count_selection(target, selection):
+    if 'ids' in selection:
+        return len(selection['ids'])
+    return _filtered(target, selection['filters']).count()
+
+
+def _next_ids(target, selection, after_id, chunk_size):
+    if 'ids' in selection:
+        return [pk for pk in selection['ids'] if pk > after_id][:chunk_size]
+    rows = _filtered(target, selection['filters']).filter(pk__gt=after_id).order_by('pk')
+    return list(rows.values_list('pk', flat=True)[:chunk_size])
+
+
+def apply_chunk(target, action, selection, reason, actor, after_id=0, chunk_size=None, job_id=None):
+    """
+    Apply an action to the next chunk of selected rows after `after_id`.
+
+    Returns:
+        tuple: (last id examined or None when the selection is exhausted,
+        rows examined, rows changed)
+    """
+    values, pending, audit_action = ACTIONS[target][action]
+    ids = _next_ids(target, selection, after_id, chunk_size or _chunk_size())
+    if not ids:
+        return None, 0, 0
+
+    rows = MODELS[target].objects.filter(pk__in=ids).filter(pending)
+    if target == 'user' and actor is not None:
+        rows = rows.exclude(pk=actor.pk)  # admins cannot sweep themselves up
+
+    details = {'reason': reason, 'bulk': True}
+    if job_id:
+        details['job'] = job_id
+    with transaction.atomic():
+        changed = list(rows.select_for_update().values_list('pk', flat=True))
+        if changed:
+            MODELS[target].objects.filter(pk__in=changed).update(**values(reason))
+            now = timezone.now()
+            write_events([
+                AuditLog(
+                    actor=actor,
+                    actor_email=actor.email if actor is not None else '',
+                    action=audit_action,
+                    details=details,
+                    timestamp=now,
+                    **{'target_user_id' if target == 'user' else 'target_course_id': pk},
+                )
+                for pk in changed
+            ])
+    if changed:
+        invalidate_metrics()
+        if target == 'course':
+            bump_catalog_version()
+    return ids[-1], len(ids), len(changed)
+
+
+def start_bulk_action(target, action, selection, reason, actor):
+    """
+    Apply a bulk action now, or queue it when the selection is large.
+
+    Returns:
+        tuple: (BulkActionJob or None, dict with 'matched' and 'changed' when applied inline)
+
+    Raises:
+        BulkActionError: Unknown action or invalid selection
+    """
+    if action not in ACTIONS[target]:
+        raise BulkActionError(f'Unknown action: {action}')
+    selection = clean_selection(target, selection)
+    total = count_selection(target, selection)
+
+    if total > getattr(settings, 'ADMIN_BULK_INLINE_LIMIT', 500):
+        job = BulkActionJob.objects.create(
+            target=target, action=action, selection=selection, reason=reason,
+            actor=actor, actor_email=actor.email, total=total,
+        )
+        logger.info(f"Queued bulk {action} of {total} {target}s as job {job.id}")
+        return job, None
+
+    after_id, changed = 0, 0
+    while True:
+        after_id, _, chunk_changed = apply_chunk(target, action, selection, reason, actor, after_id)
+        if after_id is None:
+            break
+        changed += chunk_changed
+    return None, {'matched': total, 'changed': changed}
+
+
+def claim_job():
+    """
+    Take the oldest pending job, or a processing one whose worker stopped
+    reporting progress ADMIN_BULK_JOB_STALE_AFTER seconds ago.
+    """
+    stale = timezone.now() - timedelta(seconds=getattr(settings, 'ADMIN_BULK_JOB_STALE_AFTER', 300))
+    with transaction.atomic():
+        job = (
+            BulkActionJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='processing', updated_at__lt=stale))
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'processing'
+        job.started_at = job.started_at or timezone.now()
+        job.updated_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+    return job
+
+
+def run_job(job):
+    """Work through a claimed job chunk by chunk, recording progress."""
+    try:
+        while True:
+            last_id, examined, changed = apply_chunk(
+                job.target, job.action, job.selection, job.reason, job.actor,
+                after_id=job.last_id, job_id=job.id,
+            )
+            if last_id is None:
+                break
+            job.last_id = last_id
+            job.processed += examined
+            job.changed += changed
+            BulkActionJob.objects.filter(pk=job.pk).update(
+                last_id=job.last_id, processed=job.processed, changed=job.changed, updated_at=timezone.now(),
+            )
+    except Exception as e:
+        logger.exception(f"Bulk action job {job.id} failed")
+        job.status = 'failed'
+        job.error_message = str(e)
+    else:
+        job.status = 'completed'
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'completed_at', 'updated_at'])
+    return job
@@ -0,0 +1,40 @@
+"""
+Run queued bulk admin actions.
+
+Usage:
+    python manage.py process_bulk_admin_jobs
+    python manage.py process_bulk_admin_jobs --once
+"""
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from admin_panel.bulk import claim_job, run_job
+import time
+
+
+class Command(BaseCommand):
+    help = 'Apply queued bulk user and course actions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait for new jobs when none are queued')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no jobs are queued')
+
+    def handle(self, *args, **options):
+        finished = 0
+        try:
+            while True:
+                close_old_connections()
+                job = claim_job()
+                if job is not None:
+                    run_job(job)
+                    finished += 1
+                    self.stdout.write(f'Job {job.id}: {job.status}, {job.changed} of {job.total} changed')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted')
+
+        self.stdout.write(self.style.SUCCESS(f'Finished {finished} bulk action jobs'))
@@ -0,0 +1,111 @@
+"""
+Admin dashboard metrics snapshot.
+
+compute_metrics() gathers every dashboard number with one conditional
+aggregate per table (users, courses, payouts) plus the platform revenue
+ledger. The result is cached for ADMIN_METRICS_TTL seconds with the time it
+was computed; signal handlers (see signals.py) drop it when a user, course,
+payment or payout changes in a way that affects it. With
+ADMIN_METRICS_BACKGROUND_REFRESH on, a snapshot older than
+ADMIN_METRICS_REFRESH_AFTER seconds is served as is while a background
+thread recomputes it, so admins only wait when there is no snapshot at all.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from accounts.models import CustomUser
+from courses.models import Course
+from payments.models import Payout
+from payments.ledger import platform_totals
+from decimal import Decimal
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+METRICS_CACHE_KEY = 'admin_panel:metrics'
+REFRESH_LOCK_KEY = 'admin_panel:metrics:refreshing'
+
+
+def _ttl():
+    return getattr(settings, 'ADMIN_METRICS_TTL', 60)
+
+
+def compute_metrics():
+    """
+    Compute all dashboard numbers.
+
+    Returns:
+        dict: Dashboard counts and amounts plus 'computed_at'
+    """
+    users = CustomUser.objects.aggregate(
+        total_users=Count('pk'),
+        students=Count('pk', filter=Q(role='student')),
+        instructors=Count('pk', filter=Q(role='instructor')),
+        suspended_users=Count('pk', filter=Q(is_suspended=True)),
+    )
+    courses = Course.objects.aggregate(
+        total_courses=Count('pk'),
+        published_courses=Count('pk', filter=Q(status='published')),
+        flagged_courses=Count('pk', filter=Q(is_flagged=True)),
+    )
+    payouts = Payout.objects.aggregate(pending_payouts=Sum('total_amount', filter=Q(status='pending')))
+    revenue = platform_totals()
+
+    return {
+        **users,
+        **courses,
+        'total_revenue': revenue['net_revenue'],
+        'platform_fees': revenue['net_platform_fees'],
+        'pending_payouts': payouts['pending_payouts'] or Decimal('0.00'),
+        'computed_at': timezone.now(),
+    }
+
+
+def refresh_metrics():
+    """Recompute the snapshot and cache it."""
+    metrics = compute_metrics()
+    cache.set(METRICS_CACHE_KEY, metrics, timeout=_ttl())
+    return metrics
+
+
+def invalidate_metrics():
+    """Drop the cached snapshot so the next dashboard load recomputes it."""
+    cache.delete(METRICS_CACHE_KEY)
+
+
+def _refresh_in_background():
+    # cache.add is atomic, so only one process starts a refresh at a time
+    if not cache.add(REFRESH_LOCK_KEY, True, timeout=_ttl()):
+        return
+
+    def run():
+        from django.db import close_old_connections
+
+        try:
+            refresh_metrics()
+        except Exception:
+            logger.exception("Background admin metrics refresh failed")
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+            close_old_connections()
+
+    threading.Thread(target=run, name='admin-metrics-refresh', daemon=True).start()
+
+
+def get_metrics():
+    """
+    The cached snapshot, computed now when there is none.
+
+    Returns:
+        dict: See compute_metrics
+    """
+    metrics = cache.get(METRICS_CACHE_KEY)
+    if metrics is None:
+        return refresh_metrics()
+
+    age = (timezone.now() - metrics['computed_at']).total_seconds()
+    if getattr(settings, 'ADMIN_METRICS_BACKGROUND_REFRESH', True) and age >= getattr(settings, 'ADMIN_METRICS_REFRESH_AFTER', 45):
+        _refresh_in_background()
+    return metrics
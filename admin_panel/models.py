@@ -0,0 +1,55 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+
+class BulkActionJob(models.Model):
+    """A bulk user or course action too large to apply within the request."""
+
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    TARGET_CHOICES = (
+        ('user', 'Users'),
+        ('course', 'Courses'),
+    )
+
+    target = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    action = models.CharField(max_length=20)
+    selection = models.JSONField(default=dict)  # {'ids': [...]} or {'filters': {...}}
+    reason = models.TextField(blank=True)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='bulk_action_jobs')
+    actor_email = models.CharField(max_length=255)
+
+    # Progress
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total = models.IntegerField(default=0)  # Matching rows when the job was queued
+    processed = models.IntegerField(default=0)  # Rows examined so far
+    changed = models.IntegerField(default=0)  # Rows actually updated
+    last_id = models.BigIntegerField(default=0)  # Resume point, rows are walked in pk order
+    error_message = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Last progress report
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.target}s ({self.status})"
+
+    @property
+    def progress_percentage(self):
+        if not self.total:
+            return 100 if self.status == 'completed' else 0
+        return min(int(self.processed * 100 / self.total), 100)
@@ -0,0 +1,39 @@
+"""
+Signal handlers that drop the cached dashboard metrics snapshot.
+
+Only saves that can change a dashboard number invalidate it; a login's
+last_login update or a new (unpaid) payment, for example, does not.
+Payment status changes applied with update() by the webhook processor are
+picked up when the snapshot's short TTL runs out.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import CustomUser
+from courses.models import Course
+from payments.models import Payment, Payout
+from .metrics import invalidate_metrics
+
+METRIC_FIELDS = {
+    CustomUser: {'role', 'is_suspended'},
+    Course: {'status', 'is_flagged'},
+    Payment: {'status'},
+    Payout: {'status', 'total_amount'},
+}
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Payout)
+def metrics_source_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (created and sender is Payment):
+        return
+    if created or update_fields is None or METRIC_FIELDS[sender] & set(update_fields):
+        invalidate_metrics()
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Payout)
+def metrics_source_deleted(sender, instance, **kwargs):
+    invalidate_metrics()
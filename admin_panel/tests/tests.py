@@ -1,3 +1,286 @@
-from django.test import TestCase
+from django.test import RequestFactory, TestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from accounts.models import AuditLog
+from courses.models import Course
+from payments.models import Payment, Payout
+from admin_panel.bulk import claim_job, run_job
+from admin_panel.listing import keyset_page, list_context
+from admin_panel.metrics import METRICS_CACHE_KEY, get_metrics
+from admin_panel.models import BulkActionJob
+from courses.catalog import get_catalog_version
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+import csv
+import gzip
+import io
+import json
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(ADMIN_EXPORT_CHUNK_SIZE=2)
+class AdminExportTestCase(TestCase):
+    """Test the streaming payment and audit log exports"""
+
+    def setUp(self):
+        """Set up an admin, a course and some captured payments"""
+        self.admin = User.objects.create_user(username='admin@example.com', email='admin@example.com', password='testpass123', role='admin')
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com', password='testpass123', role='student')
+        self.instructor = User.objects.create_user(username='instructor@example.com', email='instructor@example.com', password='testpass123', role='instructor')
+        self.course = Course.objects.create(instructor=self.instructor, title='Test Course', description='Test', price=Decimal('99.99'), status='published')
+        for index in range(5):
+            Payment.objects.create(
+                student=self.student, instructor=self.instructor, course=self.course,
+                amount=Decimal('99.99'), platform_fee=Decimal('10.00'), instructor_payout=Decimal('89.99'),
+                status='captured' if index < 4 else 'created', razorpay_order_id=f'order_{index}',
+            )
+        self.client.login(username='admin@example.com', password='testpass123')
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(f'admin_panel:{name}'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_payments_csv(self):
+        """Test the CSV export streams a header and every captured payment"""
+        response, body = self.export('payments_export')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['course__title'], 'Test Course')
+        self.assertEqual(rows[0]['student__email'], 'student@example.com')
+
+    def test_payments_ndjson_gzip(self):
+        """Test NDJSON output compressed on the fly"""
+        response, body = self.export('payments_export', format='ndjson', gzip='1')
+        lines = gzip.decompress(body).decode().splitlines()
+
+        self.assertIn('payments.ndjson.gz', response['Content-Disposition'])
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[0])['amount'], '99.99')
+
+    def test_payments_date_range(self):
+        """Test start and end limit the export to whole days"""
+        Payment.objects.filter(razorpay_order_id='order_0').update(created_at=timezone.now() - timedelta(days=10))
+        today = timezone.localdate().isoformat()
+
+        _, body = self.export('payments_export', format='ndjson', start=today, end=today)
+        self.assertEqual(len(body.decode().splitlines()), 3)
+
+    def test_invalid_parameters(self):
+        """Test bad dates and formats are rejected before streaming"""
+        url = reverse('admin_panel:payments_export')
+        self.assertEqual(self.client.get(url, {'start': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+
+    def test_audit_json_joins_targets(self):
+        """Test the JSON audit export includes joined target columns and details"""
+        AuditLog.objects.create(actor=self.admin, actor_email=self.admin.email, action='course_flagged',
+                                target_user=self.instructor, target_course=self.course, details={'reason': 'spam'})
+        AuditLog.objects.create(actor=self.admin, actor_email=self.admin.email, action='user_suspended', target_user=self.student)
+
+        _, body = self.export('audit_logs_export', format='json')
+        logs = json.loads(body)
+
+        self.assertEqual(len(logs), 2)
+        flagged = next(log for log in logs if log['action'] == 'course_flagged')
+        self.assertEqual(flagged['target_user_email'], 'instructor@example.com')
+        self.assertEqual(flagged['target_course'], 'Test Course')
+        self.assertEqual(flagged['details'], {'reason': 'spam'})
+
+        _, body = self.export('audit_logs_export', action='user_suspended')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([row['action'] for row in rows], ['user_suspended'])
+        self.assertEqual(rows[0]['target_course'], '')
+
+
+
+class AdminMetricsTestCase(TestCase):
+    """Test the cached dashboard metrics snapshot"""
+
+    def setUp(self):
+        """Set up users, courses and a pending payout"""
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin@example.com', email='admin@example.com', password='testpass123', role='admin')
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com', password='testpass123', role='student')
+        self.instructor = User.objects.create_user(username='instructor@example.com', email='instructor@example.com', password='testpass123', role='instructor')
+        self.course = Course.objects.create(instructor=self.instructor, title='Test Course', description='Test', price=Decimal('99.99'), status='published')
+        Course.objects.create(instructor=self.instructor, title='Draft Course', description='Test', price=Decimal('10.00'), status='draft', is_flagged=True)
+        Payout.objects.create(instructor=self.instructor, course=self.course, total_amount=Decimal('50.00'))
+        cache.clear()
+
+    def test_snapshot_values(self):
+        """Test every number comes from a handful of aggregate queries"""
+        with self.assertNumQueries(4):
+            metrics = get_metrics()
+
+        self.assertEqual(metrics['total_users'], 3)
+        self.assertEqual(metrics['students'], 1)
+        self.assertEqual(metrics['instructors'], 1)
+        self.assertEqual(metrics['suspended_users'], 0)
+        self.assertEqual(metrics['total_courses'], 2)
+        self.assertEqual(metrics['published_courses'], 1)
+        self.assertEqual(metrics['flagged_courses'], 1)
+        self.assertEqual(metrics['pending_payouts'], Decimal('50.00'))
+        self.assertEqual(metrics['total_revenue'], Decimal('0.00'))
+        self.assertIsNotNone(metrics['computed_at'])
+
+    def test_snapshot_is_cached(self):
+        """Test a second read does not touch the database"""
+        first = get_metrics()
+        with self.assertNumQueries(0):
+            second = get_metrics()
+        self.assertEqual(first['computed_at'], second['computed_at'])
+
+    def test_relevant_save_invalidates(self):
+        """Test suspending a user drops the snapshot but a login does not"""
+        get_metrics()
+        self.client.login(username='student@example.com', password='testpass123')
+        self.assertIsNotNone(cache.get(METRICS_CACHE_KEY))
+
+        self.student.is_suspended = True
+        self.student.save(update_fields=['is_suspended'])
+        self.assertIsNone(cache.get(METRICS_CACHE_KEY))
+        self.assertEqual(get_metrics()['suspended_users'], 1)
+
+    @override_settings(ADMIN_METRICS_REFRESH_AFTER=30)
+    def test_stale_snapshot_refreshes_in_background(self):
+        """Test an old snapshot is served while a refresh is started"""
+        metrics = get_metrics()
+        metrics['computed_at'] -= timedelta(seconds=40)
+        cache.set(METRICS_CACHE_KEY, metrics)
+
+        with patch('admin_panel.metrics._refresh_in_background') as refresh:
+            self.assertEqual(get_metrics()['computed_at'], metrics['computed_at'])
+        refresh.assert_called_once()
+
+
+
+class AdminListingTestCase(TestCase):
+    """Test keyset paging and search for the admin lists"""
+
+    def setUp(self):
+        """Set up users sharing a creation time so the id tie-break matters"""
+        created_at = timezone.now()
+        for index in range(7):
+            User.objects.create_user(username=f'user{index}@example.com', email=f'user{index}@example.com', password='testpass123', first_name='Asha' if index % 2 else 'Ravi')
+        User.objects.update(created_at=created_at)
+        self.factory = RequestFactory()
+
+    def test_pages_cover_every_row_once(self):
+        """Test following cursors returns each user exactly once, newest first"""
+        seen, cursor = [], None
+        while True:
+            page, cursor = keyset_page(User.objects.all(), 'created_at', cursor, page_size=3)
+            seen.extend(user.id for user in page)
+            if not cursor:
+                break
+        self.assertEqual(seen, list(User.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_search_and_exact_count(self):
+        """Test search ORs the fields in one query and small lists are counted exactly"""
+        request = self.factory.get('/', {'q': 'asha'})
+        with self.assertNumQueries(2):
+            context = list_context(request, User.objects.only('id', 'email', 'created_at'), 'created_at', search_fields=('email', 'first_name'))
+        self.assertEqual(context['total_count'], 3)
+        self.assertFalse(context['count_is_estimate'])
+        self.assertIsNone(context['next_cursor'])
+
+    def test_invalid_cursor_starts_over(self):
+        """Test a garbage cursor returns the first page"""
+        request = self.factory.get('/', {'cursor': 'not-a-cursor'})
+        context = list_context(request, User.objects.all(), 'created_at')
+        self.assertEqual(len(context['page']), 7)
+
+
+
+class AdminBulkActionTestCase(TestCase):
+    """Test bulk user and course actions"""
+
+    def setUp(self):
+        """Set up an admin, some students and an instructor's courses"""
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin@example.com', email='admin@example.com', password='testpass123', role='admin')
+        self.students = [
+            User.objects.create_user(username=f'spam{index}@example.com', email=f'spam{index}@example.com', password='testpass123', role='student')
+            for index in range(5)
+        ]
+        self.instructor = User.objects.create_user(username='instructor@example.com', email='instructor@example.com', password='testpass123', role='instructor')
+        self.courses = [
+            Course.objects.create(instructor=self.instructor, title=f'Course {index}', description='Test', price=Decimal('10.00'), status='published')
+            for index in range(3)
+        ]
+        self.client.login(username='admin@example.com', password='testpass123')
+
+    def post(self, name, data):
+        return self.client.post(reverse(f'admin_panel:{name}'), json.dumps(data), content_type='application/json')
+
+    def test_suspend_users_by_ids(self):
+        """Test one update suspends the selection and writes one audit row per change"""
+        self.students[0].suspend()
+        ids = [user.id for user in self.students] + [self.admin.id]
+
+        response = self.post('bulk_user_action', {'action': 'suspend', 'ids': ids, 'reason': 'spam'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['changed'], 4)
+        self.assertEqual(User.objects.filter(is_suspended=True).count(), 5)
+        self.admin.refresh_from_db()
+        self.assertFalse(self.admin.is_suspended)
+        logs = AuditLog.objects.filter(action='user_suspended')
+        self.assertEqual(logs.count(), 4)
+        self.assertEqual(logs.first().details['reason'], 'spam')
+
+    def test_flag_courses_by_filter(self):
+        """Test a filter selection flags courses and invalidates the catalog"""
+        version = get_catalog_version()
+        response = self.post('bulk_course_action', {'action': 'flag', 'filters': {'instructor': self.instructor.id}, 'reason': 'copyright'})
+
+        self.assertEqual(response.json()['changed'], 3)
+        self.assertEqual(Course.objects.filter(is_flagged=True, flag_reason='copyright').count(), 3)
+        self.assertGreater(get_catalog_version(), version)
+        self.assertEqual(AuditLog.objects.filter(action='course_flagged').count(), 3)
+
+    def test_suspend_courses_records_reason(self):
+        """Test bulk suspend stores the reason like the single-course action and unsuspend clears it"""
+        ids = list(Course.objects.filter(instructor=self.instructor).values_list('id', flat=True))
+        self.post('bulk_course_action', {'action': 'suspend', 'ids': ids, 'reason': 'chargebacks'})
+        self.assertEqual(Course.objects.filter(is_suspended=True, suspended_reason='chargebacks').count(), 3)
+
+        self.post('bulk_course_action', {'action': 'unsuspend', 'ids': ids})
+        self.assertEqual(Course.objects.filter(is_suspended=False, suspended_reason__isnull=True).count(), 3)
+
+        self.client.post(reverse('admin_panel:course_action', args=[ids[0]]), {'action': 'suspend', 'reason': 'chargebacks'})
+        self.assertEqual(Course.objects.get(pk=ids[0]).suspended_reason, 'chargebacks')
+
+    @override_settings(ADMIN_BULK_INLINE_LIMIT=2, ADMIN_BULK_CHUNK_SIZE=2)
+    def test_large_selection_runs_as_job(self):
+        """Test a large selection is queued and reports progress"""
+        response = self.post('bulk_user_action', {'action': 'suspend', 'filters': {'role': 'student'}})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['total'], 5)
+        self.assertFalse(User.objects.filter(is_suspended=True).exists())
+
+        job = claim_job()
+        self.assertEqual(job.status, 'processing')
+        self.assertIsNone(claim_job())
+        run_job(job)
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual(status['changed'], 5)
+        self.assertEqual(status['progress_percentage'], 100)
+        self.assertEqual(AuditLog.objects.filter(action='user_suspended', details__job=job.id).count(), 5)
+
+    def test_invalid_selection(self):
+        """Test unknown actions and filters are rejected"""
+        self.assertEqual(self.post('bulk_user_action', {'action': 'delete', 'ids': [1]}).status_code, 400)
+        self.assertEqual(self.post('bulk_user_action', {'action': 'suspend', 'filters': {'password': 'x'}}).status_code, 400)
+        self.assertEqual(self.post('bulk_course_action', {'action': 'flag'}).status_code, 400)
+        self.assertFalse(BulkActionJob.objects.exists())
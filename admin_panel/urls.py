@@ -11,6 +11,9 @@ urlpatterns = [
     path('courses/', views.admin_courses, name='courses'),
     path('course/<int:course_id>/', views.admin_course_detail, name='course_detail'),
     path('course/<int:course_id>/action/', views.admin_course_action, name='course_action'),
+    path('users/bulk-action/', views.admin_bulk_user_action, name='bulk_user_action'),
+    path('courses/bulk-action/', views.admin_bulk_course_action, name='bulk_course_action'),
+    path('bulk-jobs/<int:job_id>/', views.admin_bulk_job_status, name='bulk_job_status'),
     path('payments/', views.admin_payments, name='payments'),
     path('payments/export/', views.admin_payments_export, name='payments_export'),
     path('audit-logs/', views.admin_audit_log, name='audit_logs'),
@@ -1,53 +1,56 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.db import models
+from accounts.audit import record_event
 from accounts.models import AuditLog, CustomUser
 from accounts.decorators import admin_required
 from courses.models import Course, Enrollment
-from payments.models import Payment, Payout
+from payments.models import Payment
+from payments.ledger import course_totals, platform_totals
+from .bulk import BulkActionError, start_bulk_action
+from .exports import ExportError, chunk_size, date_range, export_response
+from .listing import list_context
+from .metrics import get_metrics
+from .models import BulkActionJob
 from django.utils import timezone
-import csv
 import json
 from datetime import timedelta
 
+PAYMENT_EXPORT_FIELDS = (
+    'id', 'student__email', 'instructor__email', 'course__title',
+    'amount', 'platform_fee', 'instructor_payout', 'created_at',
+)
+AUDIT_EXPORT_FIELDS = ('id', 'action', 'actor_email', 'target_user_email', 'target_course_title', 'timestamp')
+
+# Columns loaded for the paged admin lists
+USER_LIST_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'is_active', 'is_suspended', 'created_at')
+COURSE_LIST_FIELDS = (
+    'id', 'title', 'status', 'price', 'is_private', 'is_flagged', 'is_suspended', 'created_at',
+    'instructor__id', 'instructor__email', 'instructor__first_name', 'instructor__last_name',
+)
+AUDIT_LIST_FIELDS = (
+    'id', 'action', 'actor_email', 'timestamp', 'details', 'ip_address',
+    'target_user__id', 'target_user__email', 'target_course__id', 'target_course__title',
+)
+
 # Create your views here.
 @admin_required
 def admin_dashboard(request):
     """Admin dashboard with key statistics."""
-    # User starts
-    total_users = CustomUser.objects.count()
-    students = CustomUser.objects.filter(role='student').count()
-    instructors = CustomUser.objects.filter(role='instructor').count()
-    suspended_users = CustomUser.objects.filter(is_suspended=True).count()
-
-    # Course stats
-    total_courses = Course.objects.count()
-    published_courses = Course.objects.filter(status='published').count()
-    flagged_courses = Course.objects.filter(is_flagged=True).count()
-
-    # Payment stats
-    total_revenue = sum(p.amount for p in Payment.objects.filter(status='completed'))
-    platform_fees = sum(p.platform_fee for p in Payment.objects.filter(status='completed'))
-    pending_payouts = sum(p.amount for p in Payout.objects.filter(status='pending'))
+    # Counts and amounts come from the cached metrics snapshot
+    metrics = get_metrics()
 
     # Recent activity
     recent_users = CustomUser.objects.all().order_by('-created_at')[:5]
-    recent_payments = Payment.objects.filter(status='completed').order_by('-created_at')[:5]
+    recent_payments = Payment.objects.filter(status='captured').order_by('-created_at')[:5]
     recent_logs = AuditLog.objects.all().order_by('-timestamp')[:10]
 
     context = {
-        'total_users': total_users,
-        'students': students,
-        'instructors': instructors,
-        'suspended_users': suspended_users,
-        'total_courses': total_courses,
-        'published_courses': published_courses,
-        'flagged_courses': flagged_courses,
-        'total_revenue': total_revenue,
-        'platform_fees': platform_fees,
-        'pending_payouts': pending_payouts,
+        **metrics,
+        'metrics_computed_at': metrics['computed_at'],
         'recent_users': recent_users,
         'recent_payments': recent_payments,
         'recent_logs': recent_logs,
@@ -58,20 +61,17 @@ def admin_dashboard(request):
 @admin_required
 def admin_users(request):
     """Admin user management."""
-    users = CustomUser.objects.all().order_by('-created_at')
+    users = CustomUser.objects.only(*USER_LIST_FIELDS)
     role_filter = request.GET.get('role')
-    search_query = request.GET.get('q')
 
     if role_filter:
         users = users.filter(role=role_filter)
-    if search_query:
-        users = users.filter(email__icontains=search_query) | users.filter(first_name__icontains=search_query)
 
-    context = {
-        'users': users,
+    context = list_context(request, users, 'created_at', search_fields=('email', 'first_name'))
+    context.update({
+        'users': context['page'],
         'role_filter': role_filter,
-        'search_query': search_query
-    }
+    })
     return render(request, 'admin_panel/users.html', context)
 
 
@@ -106,7 +106,7 @@ def admin_user_action(request, user_id):
 
     if action == 'suspend':
         user.suspend()
-        AuditLog.objects.create(
+        record_event(
             actor=request.user,
             actor_email=actor_email,
             action='user_suspended',
@@ -116,7 +116,7 @@ def admin_user_action(request, user_id):
     elif action == 'activate':
         user.is_suspended = False
         user.save()
-        AuditLog.objects.create(
+        record_event(
             actor=request.user,
             actor_email=actor_email,
             action='user_activated',
@@ -125,7 +125,7 @@ def admin_user_action(request, user_id):
     elif action == 'delete':
         username = user.username
         user.delete()
-        AuditLog.objects.create(
+        record_event(
             actor=request.user,
             actor_email=actor_email,
             action='user_deleted',
@@ -139,20 +139,17 @@ def admin_user_action(request, user_id):
 @admin_required
 def admin_courses(request):
     """Admin course management."""
-    courses = Course.objects.all().order_by('-created_at').select_related('instructor')
+    courses = Course.objects.select_related('instructor').only(*COURSE_LIST_FIELDS)
     status_filter = request.GET.get('status')
-    search_query = request.GET.get('q')
 
     if status_filter:
         courses = courses.filter(status=status_filter)
-    if search_query:
-        courses = courses.filter(title__icontains=search_query) | courses.filter(description__icontains=search_query)
 
-    context = {
-        'courses': courses,
+    context = list_context(request, courses, 'created_at', search_fields=('title', 'description'))
+    context.update({
+        'courses': context['page'],
         'status_filter': status_filter,
-        'search_query': search_query
-    }
+    })
     return render(request, 'admin_panel/courses.html', context)
 
 
@@ -162,7 +159,7 @@ def admin_course_detail(request, course_id):
     course = get_object_or_404(Course, id=course_id)
     videos = course.videos.all()
     enrollments = course.enrollments.all()
-    payments = course.payments.filter(status='completed')
+    payments = course.payments.filter(status='captured')
 
     context = {
         'course': course,
@@ -170,7 +167,7 @@ def admin_course_detail(request, course_id):
         'enrollments': enrollments,
         'payments': payments,
         'enrollment_count': enrollments.count(),
-        'revenue': sum(p.amount for p in payments),
+        'revenue': course_totals(course.id)['net_revenue'],
     }
     return render(request, 'admin_panel/course_detail.html', context)
 
@@ -187,7 +184,7 @@ def admin_course_action(request, course_id):
         course.is_flagged = True
         course.flag_reason = reason
         course.save()
-        AuditLog.objects.create(
+        record_event(
             actor=request.user,
             actor_email=request.user.email,
             action='course_flagged',
@@ -198,7 +195,7 @@ def admin_course_action(request, course_id):
         course.is_flagged = False
         course.flag_reason = None
         course.save()
-        AuditLog.objects.create(
+        record_event(
             actor=request.user,
             actor_email=request.user.email,
             action='course_unflagged',
@@ -206,9 +203,9 @@ def admin_course_action(request, course_id):
         )
     elif action == 'suspend':
         course.is_suspended = True
-        course.suspend_reason = reason
+        course.suspended_reason = reason
         course.save()
-        AuditLog.objects.create(
+        record_event(
             actor=request.user,
             actor_email=request.user.email,
             action='course_suspended',
@@ -217,9 +214,9 @@ def admin_course_action(request, course_id):
         )
     elif action == 'unsuspend':
         course.is_suspended = False
-        course.suspend_reason = None
+        course.suspended_reason = None
         course.save()
-        AuditLog.objects.create(
+        record_event(
             actor=request.user,
             actor_email=request.user.email,
             action='course_unsuspended',
@@ -229,24 +226,84 @@ def admin_course_action(request, course_id):
     return JsonResponse({'status': 'success'})
 
 
+def _bulk_request(request):
+    """Read action, reason and selection from a JSON or form POST."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise BulkActionError('Invalid JSON body')
+        if not isinstance(data, dict):
+            raise BulkActionError('Invalid JSON body')
+        return data.get('action'), data.get('reason', ''), {'ids': data.get('ids'), 'filters': data.get('filters')}
+    filters = {name: request.POST[name] for name in ('role', 'status', 'instructor', 'is_flagged', 'is_suspended', 'q') if request.POST.get(name)}
+    return request.POST.get('action'), request.POST.get('reason', ''), {'ids': request.POST.getlist('ids'), 'filters': filters}
+
+
+def _bulk_action(request, target):
+    try:
+        action, reason, selection = _bulk_request(request)
+        job, result = start_bulk_action(target, action, selection, reason or '', request.user)
+    except BulkActionError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if job is not None:
+        return JsonResponse(_job_status(job), status=202)
+    return JsonResponse({'status': 'completed', **result})
+
+
+def _job_status(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'total': job.total,
+        'processed': job.processed,
+        'changed': job.changed,
+        'progress_percentage': job.progress_percentage,
+        'error': job.error_message or None,
+        'status_url': reverse('admin_panel:bulk_job_status', args=[job.id]),
+    }
+
+
+@admin_required
+@require_POST
+def admin_bulk_user_action(request):
+    """Suspend or activate many users, selected by ids or filters."""
+    return _bulk_action(request, 'user')
+
+
+@admin_required
+@require_POST
+def admin_bulk_course_action(request):
+    """Flag, unflag, suspend or unsuspend many courses, selected by ids or filters."""
+    return _bulk_action(request, 'course')
+
+
+@admin_required
+def admin_bulk_job_status(request, job_id):
+    """Progress of a queued bulk action."""
+    job = get_object_or_404(BulkActionJob, id=job_id)
+    return JsonResponse(_job_status(job))
+
+
 @admin_required
 def admin_payments(request):
     """Admin payments analytics"""
-    payments = Payment.objects.filter(status='completed').select_related('student', 'instructor', 'course')
+    payments = Payment.objects.filter(status='captured').select_related('student', 'instructor', 'course')
 
-    total_revenue = sum(p.amount for p in payments)
-    total_platform_fees = sum(p.platform_fee for p in payments)
-    total_instructor_payout = sum(p.instructor_payout for p in payments)
+    totals = platform_totals()
+    total_revenue = totals['net_revenue']
+    total_platform_fees = totals['net_platform_fees']
+    total_instructor_payout = totals['net_earnings']
 
     # Top courses
     top_courses = Course.objects.annotate(
-        revenue=models.Sum('payments__amount', filter=models.Q(payments__status='completed'))
-    ).order_by('-revenue')[:5]
+        revenue=models.Sum('revenue_days__gross') - models.Sum('revenue_days__refunds')
+    ).filter(revenue__isnull=False).order_by('-revenue')[:5]
 
     # Top instructors
     top_instructors = CustomUser.objects.filter(role='instructor').annotate(
-        revenue=models.Sum('payments__amount', filter=models.Q(payments__status='completed'))
-    ).order_by('-revenue')[:5]
+        revenue=models.Sum('revenue_days__gross') - models.Sum('revenue_days__refunds')
+    ).filter(revenue__isnull=False).order_by('-revenue')[:5]
 
     # Recent payments
     recent_payments = payments.order_by('-created_at')[:10]
@@ -264,79 +321,59 @@ def admin_payments(request):
 
 @admin_required
 def admin_payments_export(request):
-    """Export payments data as CSV."""
-    payments = Payment.objects.filter(status='completed').values(
-        'id', 'student__email', 'instructor__email', 'course__title',
-        'amount', 'platform_fee', 'instructor_payout', 'created_at'
-    )
-
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="payments.csv"'
-
-    writer = csv.DictWriter(response, fieldnames=[
-        'id', 'student__email', 'instructor__email', 'course__title',
-        'amount', 'platform_fee', 'instructor_payout', 'created_at'
-    ])
-    writer.writeheader()
-    for payment in payments:
-        writer.writerow(payment)
-
-    return response
+    """Stream captured payments as CSV, JSON or NDJSON."""
+    try:
+        payments = (
+            Payment.objects.filter(status='captured', **date_range(request, 'created_at'))
+            .order_by('-created_at')
+            .values(*PAYMENT_EXPORT_FIELDS)
+            .iterator(chunk_size=chunk_size())
+        )
+        return export_response(request, payments, PAYMENT_EXPORT_FIELDS, 'payments')
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
 
 @admin_required
 def admin_audit_log(request):
     """View audit logs"""
-    logs = AuditLog.objects.all().order_by('-timestamp')
+    logs = AuditLog.objects.select_related('target_user', 'target_course').only(*AUDIT_LIST_FIELDS)
     
     action_filter = request.GET.get('action')
     if action_filter:
         logs = logs.filter(action=action_filter)
+    try:
+        # A date range lets PostgreSQL skip the monthly partitions outside it
+        logs = logs.filter(**date_range(request, 'timestamp'))
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
-    context = {
-        'logs': logs,
+    context = list_context(request, logs, 'timestamp')
+    context.update({
+        'logs': context['page'],
         'action_filter': action_filter,
-    }
+        'start': request.GET.get('start'),
+        'end': request.GET.get('end'),
+    })
     return render(request, 'admin_panel/audit_log.html', context)
 
 
 @admin_required
 def admin_audit_export(request):
-    """Export audit logs as CSV or JSON"""
-    logs = AuditLog.objects.all().order_by('-timestamp')
-    export_format = request.GET.get('format', 'csv')
-    
-    if export_format == 'json':
-        data = [{
-            'id': log.id,
-            'action': log.action,
-            'actor_email': log.actor_email,
-            'target_user_email': log.target_user.email if log.target_user else None,
-            'target_course': log.target_course.title if log.target_course else None,
-            'timestamp': log.timestamp.isoformat(),
-            'details': log.details,
-        } for log in logs]
-        
-        response = HttpResponse(json.dumps(data, indent=2), content_type='application/json')
-        response['Content-Disposition'] = 'attachment; filename="audit_logs.json"'
-        return response
-    
-    # CSV format
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="audit_logs.csv"'
-    
-    writer = csv.DictWriter(response, fieldnames=[
-        'id', 'action', 'actor_email', 'target_user_email', 'target_course', 'timestamp'
-    ])
-    writer.writeheader()
-    for log in logs:
-        writer.writerow({
-            'id': log.id,
-            'action': log.action,
-            'actor_email': log.actor_email,
-            'target_user_email': log.target_user.email if log.target_user else '',
-            'target_course': log.target_course.title if log.target_course else '',
-            'timestamp': log.timestamp,
-        })
-    
-    return response
+    """Stream audit logs as CSV, JSON or NDJSON."""
+    try:
+        logs = AuditLog.objects.filter(**date_range(request, 'timestamp'))
+        action_filter = request.GET.get('action')
+        if action_filter:
+            logs = logs.filter(action=action_filter)
+        # JSON exports carry the details column, CSV keeps the flat columns
+        fields = AUDIT_EXPORT_FIELDS if request.GET.get('format', 'csv') == 'csv' else AUDIT_EXPORT_FIELDS + ('details',)
+        rows = (
+            logs.order_by('-timestamp')
+            .annotate(target_user_email=models.F('target_user__email'), target_course_title=models.F('target_course__title'))
+            .values(*fields)
+            .iterator(chunk_size=chunk_size())
+        )
+        return export_response(request, rows, fields, 'audit_logs', labels={'target_course_title': 'target_course'})
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
@@ -8,3 +8,7 @@ class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
     verbose_name = 'Courses'
+
+    def ready(self):
+        # Register signal handlers for denormalized course stats
+        from . import signals  # noqa: F401
@@ -0,0 +1,158 @@
+"""
+Course catalog listing for the home page.
+
+Public courses are paged with a keyset cursor on (-created_at, -id) and each
+page is cached under the current catalog version, which is bumped whenever a
+Course is saved or deleted. Private courses the viewer owns or is enrolled in
+come from a small cached per-user set and are merged into the page window.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from .models import Course, Enrollment
+import base64
+import binascii
+
+CATALOG_VERSION_KEY = 'courses:catalog:version'
+
+
+def _page_size():
+    return getattr(settings, 'CATALOG_PAGE_SIZE', 24)
+
+
+def _cache_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_catalog_version():
+    """Current catalog version; part of every cached page key."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog page at once."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 2, timeout=None)
+
+
+def encode_cursor(created_at, course_id):
+    """Opaque cursor pointing just past the given (created_at, id) key."""
+    raw = f"{created_at.isoformat()}|{course_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, course_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            return None
+        return created_at, int(course_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _before(key):
+    """Filter for rows strictly after `key` in (-created_at, -id) order."""
+    created_at, course_id = key
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=course_id)
+
+
+def _visible_courses():
+    return Course.objects.filter(status='published', is_suspended=False).select_related('instructor')
+
+
+def get_public_page(cursor_key=None, page_size=None):
+    """
+    Fetch one page of public courses, served from cache when possible.
+
+    Returns:
+        tuple: (list of Course, next cursor key or None)
+    """
+    page_size = page_size or _page_size()
+    cursor_part = f"{cursor_key[0].isoformat()}:{cursor_key[1]}" if cursor_key else 'first'
+    cache_key = f"courses:catalog:v{get_catalog_version()}:{page_size}:{cursor_part}"
+
+    page = cache.get(cache_key)
+    if page is None:
+        queryset = _visible_courses().filter(is_private=False).order_by('-created_at', '-id')
+        if cursor_key:
+            queryset = queryset.filter(_before(cursor_key))
+        courses = list(queryset[:page_size + 1])
+        next_key = None
+        if len(courses) > page_size:
+            courses = courses[:page_size]
+            next_key = (courses[-1].created_at, courses[-1].id)
+        page = (courses, next_key)
+        cache.set(cache_key, page, timeout=_cache_timeout())
+    return page
+
+
+def _viewer_cache_key(user_id):
+    return f"courses:catalog:viewer:{user_id}"
+
+
+def get_viewer_private_courses(user):
+    """
+    Private courses the user owns or is actively enrolled in.
+
+    The result is cached per user and tagged with the catalog version, so it
+    is recomputed after course changes or the user's enrollment changes.
+    """
+    version = get_catalog_version()
+    cached = cache.get(_viewer_cache_key(user.id))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    enrolled_ids = Enrollment.objects.filter(student=user, is_active=True).values('course_id')
+    courses = list(
+        _visible_courses()
+        .filter(is_private=True)
+        .filter(Q(instructor=user) | Q(id__in=enrolled_ids))
+        .order_by('-created_at', '-id')
+    )
+    cache.set(_viewer_cache_key(user.id), (version, courses), timeout=_cache_timeout())
+    return courses
+
+
+def invalidate_viewer(user_id):
+    """Drop a user's cached private course set."""
+    cache.delete(_viewer_cache_key(user_id))
+
+
+def get_catalog_page(user, cursor=None, page_size=None):
+    """
+    Build one page of the home catalog for a viewer.
+
+    Private courses visible to the viewer are merged into the page whose
+    keyset window contains them, so every course appears exactly once
+    while paging.
+
+    Returns:
+        tuple: (list of Course, next cursor string or None)
+    """
+    cursor_key = decode_cursor(cursor)
+    courses, next_key = get_public_page(cursor_key, page_size)
+
+    if user.is_authenticated:
+        private = [
+            course for course in get_viewer_private_courses(user)
+            if (cursor_key is None or (course.created_at, course.id) < cursor_key)
+            and (next_key is None or (course.created_at, course.id) > next_key)
+        ]
+        if private:
+            courses = sorted(courses + private, key=lambda c: (c.created_at, c.id), reverse=True)
+
+    next_cursor = encode_cursor(*next_key) if next_key else None
+    return courses, next_cursor
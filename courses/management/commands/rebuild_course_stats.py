@@ -0,0 +1,23 @@
+"""
+Rebuild denormalized CourseStats rows from the source tables.
+
+Usage:
+    python manage.py rebuild_course_stats
+    python manage.py rebuild_course_stats --course 12 --course 15
+"""
+from django.core.management.base import BaseCommand
+from courses.stats import rebuild_course_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute enrollment, rating, resource and video counters for courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help='Only rebuild this course id (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of courses recomputed per batch')
+
+    def handle(self, *args, **options):
+        written = rebuild_course_stats(options['course_ids'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {written} courses'))
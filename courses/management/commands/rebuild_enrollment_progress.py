@@ -0,0 +1,23 @@
+"""
+Recompute Enrollment progress counters from VideoProgress.
+
+Usage:
+    python manage.py rebuild_enrollment_progress
+    python manage.py rebuild_enrollment_progress --course 12 --chunk-size 1000
+"""
+from django.core.management.base import BaseCommand
+from courses.progress import rebuild_enrollment_progress
+
+
+class Command(BaseCommand):
+    help = 'Backfill completed-video counts, watched seconds and progress for enrollments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help='Only rebuild enrollments in this course id (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of enrollments recomputed per batch')
+
+    def handle(self, *args, **options):
+        written = rebuild_enrollment_progress(options['course_ids'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt progress for {written} enrollments'))
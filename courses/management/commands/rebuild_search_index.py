@@ -0,0 +1,20 @@
+"""
+Rebuild course search documents from the Course and instructor tables.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from courses.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search document for every course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of courses written per batch')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} courses'))
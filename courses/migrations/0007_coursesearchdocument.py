@@ -0,0 +1,117 @@
+# Generated by Django 5.1.7 on 2026-10-17 01:42
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models, OperationalError
+
+
+POSTGRES_SETUP = [
+    """
+    ALTER TABLE courses_coursesearchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(instructor_text, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX courses_search_vector_gin ON courses_coursesearchdocument USING GIN (search_vector)",
+]
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE courses_search_fts USING fts5(
+        title, instructor_text,
+        content='courses_coursesearchdocument', content_rowid='course_id',
+        tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER courses_search_ai AFTER INSERT ON courses_coursesearchdocument BEGIN
+        INSERT INTO courses_search_fts(rowid, title, instructor_text)
+        VALUES (new.course_id, new.title, new.instructor_text);
+    END
+    """,
+    """
+    CREATE TRIGGER courses_search_ad AFTER DELETE ON courses_coursesearchdocument BEGIN
+        INSERT INTO courses_search_fts(courses_search_fts, rowid, title, instructor_text)
+        VALUES ('delete', old.course_id, old.title, old.instructor_text);
+    END
+    """,
+    """
+    CREATE TRIGGER courses_search_au AFTER UPDATE ON courses_coursesearchdocument BEGIN
+        INSERT INTO courses_search_fts(courses_search_fts, rowid, title, instructor_text)
+        VALUES ('delete', old.course_id, old.title, old.instructor_text);
+        INSERT INTO courses_search_fts(rowid, title, instructor_text)
+        VALUES (new.course_id, new.title, new.instructor_text);
+    END
+    """,
+]
+
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS courses_search_ai",
+    "DROP TRIGGER IF EXISTS courses_search_ad",
+    "DROP TRIGGER IF EXISTS courses_search_au",
+    "DROP TABLE IF EXISTS courses_search_fts",
+]
+
+
+def create_fulltext_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRES_SETUP
+    elif vendor == 'sqlite':
+        statements = SQLITE_SETUP
+    else:
+        return
+    try:
+        for statement in statements:
+            schema_editor.execute(statement)
+    except OperationalError:
+        # SQLite built without FTS5 - search falls back to LIKE queries
+        if vendor != 'sqlite':
+            raise
+
+
+def drop_fulltext_structures(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_TEARDOWN:
+            schema_editor.execute(statement)
+
+
+def backfill_documents(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseSearchDocument = apps.get_model('courses', 'CourseSearchDocument')
+
+    def normalize(*parts):
+        return ' '.join(re.findall(r'\w+', ' '.join(p or '' for p in parts).lower()))
+
+    documents = [
+        CourseSearchDocument(
+            course_id=course.id,
+            title=normalize(course.title),
+            instructor_text=normalize(course.instructor.first_name, course.instructor.last_name, course.instructor.email),
+        )
+        for course in Course.objects.select_related('instructor').iterator(chunk_size=500)
+    ]
+    CourseSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_catalog_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchDocument',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='courses.course')),
+                ('title', models.TextField(blank=True)),
+                ('instructor_text', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_structures, drop_fulltext_structures),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
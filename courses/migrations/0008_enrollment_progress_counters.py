@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_coursesearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_videos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='watched_seconds',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-17 02:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+TRIGRAM_INDEXES = {
+    'courses_course_title_trgm': 'title',
+    'courses_course_description_trgm': 'description',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Trigram GIN indexes serve the admin search's icontains (UPPER(col::text) LIKE ...)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON courses_course USING GIN (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_enrollment_progress_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='courses_cou_status_a4fc1c_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
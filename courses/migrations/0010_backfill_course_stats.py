@@ -0,0 +1,63 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def _grouped_counts(queryset, course_ids):
+    rows = queryset.filter(course_id__in=course_ids).values('course_id').annotate(n=Count('pk'))
+    return {row['course_id']: row['n'] for row in rows}
+
+
+def backfill_course_stats(apps, schema_editor):
+    """
+    Create stats rows for courses that predate 0005.
+
+    Courses created since then got their row from the post_save signal and
+    are kept current incrementally, so only missing rows are computed.
+    """
+    Course = apps.get_model('courses', 'Course')
+    CourseStats = apps.get_model('courses', 'CourseStats')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    CourseRating = apps.get_model('courses', 'CourseRating')
+    CourseResource = apps.get_model('courses', 'CourseResource')
+    Video = apps.get_model('videos', 'Video')
+
+    missing = Course.objects.filter(stats__isnull=True).order_by('pk').values_list('pk', flat=True)
+    course_ids = list(missing[:500])
+    while course_ids:
+        enrollments = _grouped_counts(Enrollment.objects.filter(is_active=True), course_ids)
+        resources = _grouped_counts(CourseResource.objects.all(), course_ids)
+        videos = _grouped_counts(Video.objects.all(), course_ids)
+        stats = {
+            course_id: CourseStats(
+                course_id=course_id,
+                active_enrollments=enrollments.get(course_id, 0),
+                resource_count=resources.get(course_id, 0),
+                video_count=videos.get(course_id, 0),
+            )
+            for course_id in course_ids
+        }
+        ratings = (
+            CourseRating.objects.filter(course_id__in=course_ids)
+            .values('course_id', 'rating')
+            .annotate(n=Count('pk'), total=Sum('rating'))
+        )
+        for rating in ratings:
+            row = stats[rating['course_id']]
+            row.rating_count += rating['n']
+            row.rating_sum += rating['total']
+            star_field = f"rating_{rating['rating']}_count"
+            setattr(row, star_field, getattr(row, star_field) + rating['n'])
+        CourseStats.objects.bulk_create(stats.values(), ignore_conflicts=True)
+        course_ids = list(missing.filter(pk__gt=course_ids[-1])[:500])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_admin_list_indexes'),
+        ('videos', '0004_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_course_stats, migrations.RunPython.noop),
+    ]
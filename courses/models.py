@@ -35,6 +35,8 @@ class Course(models.Model):
             models.Index(fields=['instructor', '-created_at']),
             models.Index(fields=['status']),
             models.Index(fields=['is_private']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['status', '-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -50,7 +52,17 @@ class Course(models.Model):
     
     def enrollment_count(self):
         """Get number of enrollments."""
-        return self.enrollments.filter(is_active=True).count()
+        return self.get_stats().active_enrollments
+
+    def get_stats(self):
+        """Get the denormalized stats row, rebuilding it if missing."""
+        try:
+            return self.stats
+        except CourseStats.DoesNotExist:
+            from .stats import rebuild_course_stats
+            rebuild_course_stats([self.id])
+            self.stats = CourseStats.objects.get(course=self)
+            return self.stats
     
     def is_accessible_by_user(self, user):
         """Check if a user can access this course."""
@@ -79,6 +91,9 @@ class Enrollment(models.Model):
     is_active = models.BooleanField(default=True)
     progress_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.0,)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # Maintained incrementally by courses/progress.py
+    completed_videos = models.PositiveIntegerField(default=0)
+    watched_seconds = models.PositiveBigIntegerField(default=0)
 
     class Meta:
         unique_together = ('student', 'course')
@@ -160,3 +175,54 @@ class CourseReferral(models.Model):
     
     def __str__(self):
         return f"Referral: {self.course.title} ({self.referrer.email} -> {self.referred_student.email})"
+
+
+class CourseStats(models.Model):
+    """
+    Denormalized per-course counters kept up to date by signals.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='stats', primary_key=True)
+    active_enrollments = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    resource_count = models.PositiveIntegerField(default=0)
+    video_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Course stats'
+
+    def __str__(self):
+        return f"Stats for course {self.course_id}"
+
+    @property
+    def average_rating(self):
+        """Average rating, or None when the course has no ratings."""
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    def rating_histogram(self):
+        """Rating counts keyed by star value (1-5)."""
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+
+
+class CourseSearchDocument(models.Model):
+    """
+    Normalized search text for a course.
+
+    The database-specific full-text structures (a tsvector column with a GIN
+    index on PostgreSQL, an FTS5 table on SQLite) are derived from this table.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='search_document', primary_key=True)
+    title = models.TextField(blank=True)
+    instructor_text = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for course {self.course_id}"
@@ -0,0 +1,155 @@
+"""
+Per-enrollment progress counters.
+
+Enrollment.completed_videos and Enrollment.watched_seconds are adjusted by
+deltas whenever VideoProgress changes (see videos/signals.py and
+videos/progress.write_progress), so progress_percentage is derived from two
+integers and CourseStats.video_count instead of aggregating VideoProgress.
+completed_at is stamped the first time an enrollment reaches 100%.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum, Q
+from django.utils import timezone
+from decimal import Decimal
+from .models import CourseStats, Enrollment
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def progress_for(completed_videos, video_count):
+    """Percentage of a course's videos completed, capped at 100."""
+    if video_count <= 0:
+        return Decimal('0.00')
+    percent = Decimal(min(completed_videos, video_count) * 100) / Decimal(video_count)
+    return percent.quantize(Decimal('0.01'))
+
+
+def _video_count(course_id):
+    count = CourseStats.objects.filter(course_id=course_id).values_list('video_count', flat=True).first()
+    return count or 0
+
+
+def _progress_fields(enrollment, completed_videos, video_count, now):
+    """Field values to write for an enrollment's new completed count."""
+    percent = progress_for(completed_videos, video_count)
+    fields = {'progress_percentage': percent}
+    if percent >= 100 and enrollment['completed_at'] is None:
+        fields['completed_at'] = now
+    return fields
+
+
+def adjust_enrollment_progress(student_id, course_id, completed_videos=0, watched_seconds=0):
+    """
+    Apply counter deltas to one enrollment and refresh its percentage.
+
+    Example: adjust_enrollment_progress(student.id, course.id, completed_videos=1)
+
+    Touches a single row regardless of how many videos the course has. Does
+    nothing if the student is not enrolled.
+    """
+    if not completed_videos and not watched_seconds:
+        return
+
+    with transaction.atomic():
+        enrollment = (
+            Enrollment.objects.select_for_update()
+            .filter(student_id=student_id, course_id=course_id)
+            .values('pk', 'completed_videos', 'watched_seconds', 'completed_at')
+            .first()
+        )
+        if enrollment is None:
+            return
+        completed = max(enrollment['completed_videos'] + completed_videos, 0)
+        fields = {
+            'completed_videos': completed,
+            'watched_seconds': max(enrollment['watched_seconds'] + watched_seconds, 0),
+        }
+        if completed_videos:
+            fields.update(_progress_fields(enrollment, completed, _video_count(course_id), timezone.now()))
+        Enrollment.objects.filter(pk=enrollment['pk']).update(**fields)
+
+
+def refresh_course_progress(course_id, chunk_size=500):
+    """
+    Recompute progress_percentage for every enrollment in a course.
+
+    Called when the course's video count changes; only reads the stored
+    counters, never VideoProgress.
+    """
+    video_count = _video_count(course_id)
+    now = timezone.now()
+    enrollments = Enrollment.objects.filter(course_id=course_id).order_by('pk')
+    batch = []
+    for row in enrollments.values('pk', 'completed_videos', 'completed_at').iterator(chunk_size=chunk_size):
+        enrollment = Enrollment(pk=row['pk'], completed_at=row['completed_at'])
+        for field, value in _progress_fields(row, row['completed_videos'], video_count, now).items():
+            setattr(enrollment, field, value)
+        batch.append(enrollment)
+        if len(batch) >= chunk_size:
+            Enrollment.objects.bulk_update(batch, ['progress_percentage', 'completed_at'])
+            batch = []
+    if batch:
+        Enrollment.objects.bulk_update(batch, ['progress_percentage', 'completed_at'])
+
+
+def rebuild_enrollment_progress(course_ids=None, chunk_size=500):
+    """
+    Recompute counters and percentages from VideoProgress (backfill).
+
+    Args:
+        course_ids (list): Limit to enrollments in these courses, or None for all
+        chunk_size (int): Number of enrollments handled per batch
+
+    Returns:
+        int: Number of enrollments written
+    """
+    enrollments = Enrollment.objects.order_by('pk')
+    if course_ids is not None:
+        enrollments = enrollments.filter(course_id__in=course_ids)
+
+    written = 0
+    batch = []
+    for row in enrollments.values('pk', 'student_id', 'course_id', 'completed_at').iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            written += _write_progress(batch)
+            batch = []
+    if batch:
+        written += _write_progress(batch)
+    return written
+
+
+def _write_progress(rows):
+    from videos.models import VideoProgress
+
+    student_ids = {row['student_id'] for row in rows}
+    course_ids = {row['course_id'] for row in rows}
+    totals = dict(CourseStats.objects.filter(course_id__in=course_ids).values_list('course_id', 'video_count'))
+    progress = {
+        (row['student_id'], row['video__course_id']): row
+        for row in VideoProgress.objects.filter(student_id__in=student_ids, video__course_id__in=course_ids)
+        .values('student_id', 'video__course_id')
+        .annotate(completed=Count('pk', filter=Q(is_completed=True)), watched=Sum('watched_duration'))
+    }
+
+    now = timezone.now()
+    enrollments = []
+    for row in rows:
+        counts = progress.get((row['student_id'], row['course_id']), {})
+        enrollment = Enrollment(
+            pk=row['pk'],
+            completed_videos=counts.get('completed', 0),
+            watched_seconds=counts.get('watched') or 0,
+            completed_at=row['completed_at'],
+        )
+        fields = _progress_fields(row, enrollment.completed_videos, totals.get(row['course_id'], 0), now)
+        for field, value in fields.items():
+            setattr(enrollment, field, value)
+        enrollments.append(enrollment)
+
+    Enrollment.objects.bulk_update(
+        enrollments, ['completed_videos', 'watched_seconds', 'progress_percentage', 'completed_at']
+    )
+    logger.debug(f"Rebuilt progress for {len(enrollments)} enrollments")
+    return len(enrollments)
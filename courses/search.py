@@ -0,0 +1,180 @@
+"""
+Full-text course search.
+
+CourseSearchDocument rows are kept current by signals; the database derives
+its own index from them (see migration 0007):
+- PostgreSQL: weighted tsvector column with a GIN index, ranked by ts_rank
+- SQLite: FTS5 external-content table kept in sync by triggers, ranked by bm25
+- Anything else: icontains over the document table, newest first
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from .models import Course, CourseSearchDocument, Enrollment
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_TERMS = 8
+
+_fts5_available = None
+
+
+def normalize_text(*parts):
+    """Lowercase and split into word tokens joined by spaces."""
+    return ' '.join(re.findall(r'\w+', ' '.join(part or '' for part in parts).lower()))
+
+
+def tokenize_query(query):
+    """Word tokens of a user query, capped at MAX_QUERY_TERMS."""
+    return normalize_text(query).split()[:MAX_QUERY_TERMS]
+
+
+def instructor_text(user):
+    return normalize_text(user.first_name, user.last_name, user.email)
+
+
+def index_course(course):
+    """Create or refresh the search document for a course."""
+    CourseSearchDocument.objects.update_or_create(
+        course_id=course.pk,
+        defaults={
+            'title': normalize_text(course.title),
+            'instructor_text': instructor_text(course.instructor),
+        },
+    )
+
+
+def index_instructor(user):
+    """Refresh instructor text on every document for the user's courses."""
+    CourseSearchDocument.objects.filter(course__instructor=user).update(instructor_text=instructor_text(user))
+
+
+def rebuild_search_index(chunk_size=500):
+    """Recreate documents for every course. Returns the number indexed."""
+    indexed = 0
+    batch = []
+    for course in Course.objects.select_related('instructor').order_by('pk').iterator(chunk_size=chunk_size):
+        batch.append(CourseSearchDocument(
+            course_id=course.pk,
+            title=normalize_text(course.title),
+            instructor_text=instructor_text(course.instructor),
+        ))
+        if len(batch) >= chunk_size:
+            indexed += _write_documents(batch)
+            batch = []
+    if batch:
+        indexed += _write_documents(batch)
+    return indexed
+
+
+def _write_documents(documents):
+    CourseSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=['title', 'instructor_text', 'updated_at'],
+    )
+    return len(documents)
+
+
+def _has_fts5():
+    global _fts5_available
+    if _fts5_available is None:
+        _fts5_available = 'courses_search_fts' in connection.introspection.table_names()
+    return _fts5_available
+
+
+def _visibility_sql(user):
+    """WHERE fragment restricting results to courses the user may see."""
+    sql = "c.status = 'published' AND NOT c.is_suspended AND (NOT c.is_private"
+    params = []
+    if user.is_authenticated:
+        sql += (
+            " OR c.instructor_id = %s OR c.id IN ("
+            "SELECT e.course_id FROM courses_enrollment e WHERE e.student_id = %s AND e.is_active)"
+        )
+        params += [user.pk, user.pk]
+    return sql + ')', params
+
+
+def _postgres_ids(terms, user, limit, offset):
+    visibility, params = _visibility_sql(user)
+    sql = (
+        "SELECT c.id FROM courses_coursesearchdocument d "
+        "JOIN courses_course c ON c.id = d.course_id "
+        "WHERE d.search_vector @@ to_tsquery('simple', %s) AND " + visibility + " "
+        "ORDER BY ts_rank(d.search_vector, to_tsquery('simple', %s)) DESC, c.created_at DESC, c.id DESC "
+        "LIMIT %s OFFSET %s"
+    )
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery] + params + [tsquery, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _sqlite_ids(terms, user, limit, offset):
+    visibility, params = _visibility_sql(user)
+    sql = (
+        "SELECT c.id FROM courses_search_fts f "
+        "JOIN courses_course c ON c.id = f.rowid "
+        "WHERE courses_search_fts MATCH %s AND " + visibility + " "
+        "ORDER BY bm25(courses_search_fts, 10.0, 3.0), c.created_at DESC, c.id DESC "
+        "LIMIT %s OFFSET %s"
+    )
+    match = ' '.join(f'"{term}"*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match] + params + [limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms, user, limit, offset):
+    documents = CourseSearchDocument.objects.filter(
+        course__status='published',
+        course__is_suspended=False,
+    )
+    visible = Q(course__is_private=False)
+    if user.is_authenticated:
+        enrolled = Enrollment.objects.filter(student=user, is_active=True).values('course_id')
+        visible |= Q(course__instructor=user) | Q(course_id__in=enrolled)
+    documents = documents.filter(visible)
+    for term in terms:
+        documents = documents.filter(Q(title__icontains=term) | Q(instructor_text__icontains=term))
+    documents = documents.order_by('-course__created_at', '-course_id')
+    return list(documents.values_list('course_id', flat=True)[offset:offset + limit])
+
+
+def find_courses(query, user, page=1, page_size=None):
+    """
+    Ranked, prefix-matching course search with visibility rules applied.
+
+    Args:
+        query (str): Raw user query
+        user: The viewer (may be anonymous)
+        page (int): 1-based page number, capped at SEARCH_MAX_PAGE
+        page_size (int): Results per page (defaults to SEARCH_PAGE_SIZE)
+
+    Returns:
+        tuple: (list of Course in rank order, has_next)
+    """
+    terms = tokenize_query(query)
+    if not terms:
+        return [], False
+
+    page_size = page_size or getattr(settings, 'SEARCH_PAGE_SIZE', 20)
+    # Capped so a huge page number cannot overflow the database's OFFSET
+    page = min(max(int(page), 1), getattr(settings, 'SEARCH_MAX_PAGE', 1000))
+    offset = (page - 1) * page_size
+
+    if connection.vendor == 'postgresql':
+        ids = _postgres_ids(terms, user, page_size + 1, offset)
+    elif connection.vendor == 'sqlite' and _has_fts5():
+        ids = _sqlite_ids(terms, user, page_size + 1, offset)
+    else:
+        ids = _fallback_ids(terms, user, page_size + 1, offset)
+
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+    courses = Course.objects.select_related('instructor', 'stats').in_bulk(ids)
+    return [courses[course_id] for course_id in ids if course_id in courses], has_next
@@ -0,0 +1,136 @@
+"""
+Signal handlers that keep CourseStats counters, catalog caches and search
+documents in sync.
+"""
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import CustomUser
+from .models import Course, CourseStats, Enrollment, CourseRating, CourseResource
+from .stats import adjust_course_stats, rating_deltas, rebuild_course_stats
+from .catalog import bump_catalog_version, invalidate_viewer
+from .search import index_course, index_instructor
+
+SEARCHABLE_USER_FIELDS = {'first_name', 'last_name', 'email'}
+
+
+def remember_fields(instance, prefix, fields):
+    """
+    Copy loaded field values to `<prefix><field>` attributes.
+
+    Deferred fields are left as None and `<prefix>known` is False: reading
+    one would refetch the row, building a new instance and firing post_init
+    again. Handlers fall back to a rebuild when the old state is unknown.
+    """
+    values = instance.__dict__
+    for field in fields:
+        setattr(instance, f'{prefix}{field}', values.get(field))
+    setattr(instance, f'{prefix}known', all(field in values for field in fields))
+
+
+@receiver(post_save, sender=Course)
+def create_course_stats(sender, instance, created, raw=False, **kwargs):
+    """Give every new course an empty stats row."""
+    if created and not raw:
+        CourseStats.objects.get_or_create(course_id=instance.pk)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    """Invalidate cached catalog pages."""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Course)
+def index_course_for_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is None or {'title', 'instructor'} & set(update_fields):
+        index_course(instance)
+
+
+@receiver(post_save, sender=CustomUser)
+def index_instructor_for_search(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Keep instructor names/emails in search documents current."""
+    if raw or created:
+        return
+    if update_fields is None or SEARCHABLE_USER_FIELDS & set(update_fields):
+        index_instructor(instance)
+
+
+@receiver(post_init, sender=Enrollment)
+def remember_enrollment_state(sender, instance, **kwargs):
+    """Remember the loaded state so post_save can compute a delta."""
+    remember_fields(instance, '_stats_', ('course_id', 'is_active'))
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_viewer(instance.student_id)
+    if not created and not instance._stats_known:
+        rebuild_course_stats([instance.course_id])
+        remember_enrollment_state(sender, instance)
+        return
+    was_counted = not created and instance._stats_is_active
+    if was_counted and instance._stats_course_id != instance.course_id:
+        adjust_course_stats(instance._stats_course_id, active_enrollments=-1)
+        was_counted = False
+    adjust_course_stats(instance.course_id, active_enrollments=int(instance.is_active) - int(was_counted))
+    remember_enrollment_state(sender, instance)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    invalidate_viewer(instance.student_id)
+    if not instance._stats_known:
+        if instance._stats_course_id is not None:
+            rebuild_course_stats([instance._stats_course_id])
+    elif instance._stats_is_active:
+        adjust_course_stats(instance._stats_course_id, create_missing=False, active_enrollments=-1)
+
+
+@receiver(post_init, sender=CourseRating)
+def remember_rating_state(sender, instance, **kwargs):
+    remember_fields(instance, '_stats_', ('course_id', 'rating'))
+
+
+@receiver(post_save, sender=CourseRating)
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_course_id, old_rating = instance._stats_course_id, instance._stats_rating
+    if not created and not instance._stats_known:
+        rebuild_course_stats([instance.course_id])
+    elif created or old_rating is None:
+        adjust_course_stats(instance.course_id, **rating_deltas(instance.rating, 1))
+    elif old_course_id != instance.course_id:
+        adjust_course_stats(old_course_id, **rating_deltas(old_rating, -1))
+        adjust_course_stats(instance.course_id, **rating_deltas(instance.rating, 1))
+    elif old_rating != instance.rating:
+        deltas = rating_deltas(instance.rating, 1)
+        for field, delta in rating_deltas(old_rating, -1).items():
+            deltas[field] = deltas.get(field, 0) + delta
+        adjust_course_stats(instance.course_id, **deltas)
+    remember_rating_state(sender, instance)
+
+
+@receiver(post_delete, sender=CourseRating)
+def rating_deleted(sender, instance, **kwargs):
+    if not instance._stats_known:
+        if instance._stats_course_id is not None:
+            rebuild_course_stats([instance._stats_course_id])
+    elif instance._stats_rating is not None:
+        adjust_course_stats(instance._stats_course_id, create_missing=False, **rating_deltas(instance._stats_rating, -1))
+
+
+@receiver(post_save, sender=CourseResource)
+def resource_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_course_stats(instance.course_id, resource_count=1)
+
+
+@receiver(post_delete, sender=CourseResource)
+def resource_deleted(sender, instance, **kwargs):
+    adjust_course_stats(instance.course_id, create_missing=False, resource_count=-1)
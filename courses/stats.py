@@ -0,0 +1,135 @@
+"""
+Denormalized course statistics.
+
+Counters on CourseStats are adjusted in place with F() expressions by the
+signal handlers in courses/signals.py and videos/signals.py, so listing and
+detail pages never need to COUNT or AVG over child tables.
+"""
+from django.db.models import Count, F, Sum
+from .models import Course, CourseStats, Enrollment, CourseRating, CourseResource
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATS_FIELDS = [
+    'active_enrollments',
+    'rating_sum',
+    'rating_count',
+    'rating_1_count',
+    'rating_2_count',
+    'rating_3_count',
+    'rating_4_count',
+    'rating_5_count',
+    'resource_count',
+    'video_count',
+]
+
+
+def adjust_course_stats(course_id, create_missing=True, **deltas):
+    """
+    Apply counter deltas to a course's stats row.
+
+    Example: adjust_course_stats(course.id, active_enrollments=1)
+
+    If no row exists yet it is rebuilt from scratch (which already reflects
+    the change that triggered the call). Delete handlers pass
+    create_missing=False so a cascading course delete never re-creates it.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not course_id or not deltas:
+        return
+
+    updated = CourseStats.objects.filter(course_id=course_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and create_missing:
+        rebuild_course_stats([course_id])
+
+
+def rating_deltas(rating, sign):
+    """Counter deltas for adding (sign=1) or removing (sign=-1) one rating."""
+    return {
+        'rating_sum': sign * rating,
+        'rating_count': sign,
+        f'rating_{rating}_count': sign,
+    }
+
+
+def _grouped_counts(queryset, course_ids):
+    """Map course_id -> row count for a child queryset."""
+    rows = queryset.filter(course_id__in=course_ids).values('course_id').annotate(n=Count('pk'))
+    return {row['course_id']: row['n'] for row in rows}
+
+
+def compute_course_stats(course_ids):
+    """
+    Compute fresh stats for a batch of courses.
+
+    Runs one grouped query per child table regardless of batch size.
+    Returns unsaved CourseStats instances.
+    """
+    from videos.models import Video
+
+    stats = {course_id: CourseStats(course_id=course_id) for course_id in course_ids}
+
+    enrollments = _grouped_counts(Enrollment.objects.filter(is_active=True), course_ids)
+    resources = _grouped_counts(CourseResource.objects.all(), course_ids)
+    videos = _grouped_counts(Video.objects.all(), course_ids)
+
+    ratings = (
+        CourseRating.objects.filter(course_id__in=course_ids)
+        .values('course_id', 'rating')
+        .annotate(n=Count('pk'), total=Sum('rating'))
+    )
+
+    for course_id, row in stats.items():
+        row.active_enrollments = enrollments.get(course_id, 0)
+        row.resource_count = resources.get(course_id, 0)
+        row.video_count = videos.get(course_id, 0)
+
+    for rating in ratings:
+        row = stats[rating['course_id']]
+        row.rating_count += rating['n']
+        row.rating_sum += rating['total']
+        star_field = f"rating_{rating['rating']}_count"
+        setattr(row, star_field, getattr(row, star_field) + rating['n'])
+
+    return list(stats.values())
+
+
+def rebuild_course_stats(course_ids=None, chunk_size=500):
+    """
+    Recompute and upsert stats rows.
+
+    Args:
+        course_ids (list): Courses to rebuild, or None for every course
+        chunk_size (int): Number of courses handled per batch
+
+    Returns:
+        int: Number of stats rows written
+    """
+    if course_ids is None:
+        course_ids = Course.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+
+    written = 0
+    batch = []
+    for course_id in course_ids:
+        batch.append(course_id)
+        if len(batch) >= chunk_size:
+            written += _write_stats(batch)
+            batch = []
+    if batch:
+        written += _write_stats(batch)
+    return written
+
+
+def _write_stats(course_ids):
+    rows = compute_course_stats(course_ids)
+    CourseStats.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=STATS_FIELDS + ['updated_at'],
+    )
+    logger.debug(f"Rebuilt stats for {len(rows)} courses")
+    return len(rows)
@@ -1,8 +1,16 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from courses.models import Course, Enrollment
+from django.contrib.auth.models import AnonymousUser
+from courses.models import Course, Enrollment, CourseRating, CourseStats
+from courses.stats import rebuild_course_stats
+from courses.catalog import get_catalog_page
+from courses.search import find_courses
+from videos.models import Video, VideoProgress
+from django.core.cache import cache
+from django.core.management import call_command
 from decimal import Decimal
+import os
 
 User = get_user_model()
 
@@ -266,3 +274,390 @@ class CourseViewTestCase(TestCase):
         # Should redirect to payment
         self.assertEqual(response.status_code, 302)
         self.assertIn('/payments/', response.url)
+
+
+class CourseStatsTestCase(TestCase):
+    """Test denormalized course stats maintained by signals"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}@example.com',
+                email=f'student{i}@example.com',
+                password='testpass123',
+                role='student'
+            )
+            for i in range(3)
+        ]
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Stats Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+    
+    def get_stats(self):
+        return CourseStats.objects.get(course=self.course)
+    
+    def test_stats_row_created_with_course(self):
+        """Test a new course gets an empty stats row"""
+        stats = self.get_stats()
+        self.assertEqual(stats.active_enrollments, 0)
+        self.assertIsNone(stats.average_rating)
+    
+    def test_enrollment_counter_follows_is_active(self):
+        """Test enrollments are counted only while active"""
+        enrollments = [Enrollment.objects.create(student=s, course=self.course) for s in self.students]
+        self.assertEqual(self.get_stats().active_enrollments, 3)
+        
+        enrollments[0].is_active = False
+        enrollments[0].save()
+        self.assertEqual(self.get_stats().active_enrollments, 2)
+        
+        enrollments[0].save()  # No change should not double count
+        enrollments[1].delete()
+        self.assertEqual(self.get_stats().active_enrollments, 1)
+    
+    def test_rating_sum_and_histogram(self):
+        """Test ratings update sum, count and histogram"""
+        CourseRating.objects.create(course=self.course, student=self.students[0], rating=5)
+        rating = CourseRating.objects.create(course=self.course, student=self.students[1], rating=2)
+        
+        stats = self.get_stats()
+        self.assertEqual(stats.rating_count, 2)
+        self.assertEqual(stats.average_rating, 3.5)
+        
+        rating.rating = 4
+        rating.save()
+        stats = self.get_stats()
+        self.assertEqual(stats.average_rating, 4.5)
+        self.assertEqual(stats.rating_histogram(), {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+        
+        rating.delete()
+        self.assertEqual(self.get_stats().rating_count, 1)
+    
+    def test_deferred_fields_are_not_loaded(self):
+        """Test enrollments and ratings loaded with only() keep the counters right"""
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        CourseRating.objects.create(course=self.course, student=self.students[0], rating=5)
+        
+        enrollment = Enrollment.objects.only('id').get()
+        rating = CourseRating.objects.only('id').get()
+        self.assertFalse(enrollment._stats_known)
+        self.assertFalse(rating._stats_known)
+        
+        enrollment.is_active = False
+        enrollment.save()
+        rating.rating = 1
+        rating.save()
+        stats = self.get_stats()
+        self.assertEqual(stats.active_enrollments, 0)
+        self.assertEqual(stats.rating_histogram(), {1: 1, 2: 0, 3: 0, 4: 0, 5: 0})
+    
+    def test_rebuild_matches_incremental_counters(self):
+        """Test rebuilding from source tables restores drifted counters"""
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+            CourseRating.objects.create(course=self.course, student=student, rating=3)
+        CourseStats.objects.filter(course=self.course).update(active_enrollments=0, rating_sum=0)
+        
+        call_command('rebuild_course_stats', stdout=open(os.devnull, 'w'))
+        
+        stats = self.get_stats()
+        self.assertEqual(stats.active_enrollments, 3)
+        self.assertEqual(stats.rating_sum, 9)
+        self.assertEqual(stats.rating_3_count, 3)
+    
+    def test_missing_stats_row_is_rebuilt_on_read(self):
+        """Test enrollment_count works for courses without a stats row"""
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+        CourseStats.objects.filter(course=self.course).delete()
+        
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertEqual(course.enrollment_count(), 1)
+        self.assertEqual(rebuild_course_stats([self.course.pk]), 1)
+
+
+class CourseCatalogTestCase(TestCase):
+    """Test the cursor-paginated home catalog"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.student = User.objects.create_user(
+            username='student@example.com',
+            email='student@example.com',
+            password='testpass123',
+            role='student'
+        )
+        
+        self.public_courses = [
+            Course.objects.create(
+                instructor=self.instructor,
+                title=f'Public {i}',
+                description='Test',
+                price=Decimal('10.00'),
+                status='published'
+            )
+            for i in range(5)
+        ]
+        
+        self.private_course = Course.objects.create(
+            instructor=self.instructor,
+            title='Private Course',
+            description='Test',
+            price=Decimal('10.00'),
+            status='published',
+            is_private=True
+        )
+    
+    def collect_pages(self, user, page_size):
+        titles, cursor = [], None
+        while True:
+            courses, cursor = get_catalog_page(user, cursor=cursor, page_size=page_size)
+            titles.extend(c.title for c in courses)
+            if not cursor:
+                return titles
+    
+    def test_pages_cover_every_public_course_once(self):
+        """Test keyset pages return each course exactly once in order"""
+        titles = self.collect_pages(AnonymousUser(), page_size=2)
+        self.assertEqual(titles, [f'Public {i}' for i in reversed(range(5))])
+    
+    def test_private_enrolled_course_is_merged(self):
+        """Test enrolled private courses appear only for the enrolled user"""
+        Enrollment.objects.create(student=self.student, course=self.private_course)
+        
+        self.assertIn('Private Course', self.collect_pages(self.student, page_size=2))
+        self.assertNotIn('Private Course', self.collect_pages(AnonymousUser(), page_size=2))
+    
+    def test_cached_page_is_reused_until_course_changes(self):
+        """Test pages are served from cache and invalidated on save"""
+        get_catalog_page(AnonymousUser())
+        with self.assertNumQueries(0):
+            get_catalog_page(AnonymousUser())
+        
+        self.public_courses[0].title = 'Renamed'
+        self.public_courses[0].save()
+        courses, _ = get_catalog_page(AnonymousUser())
+        self.assertIn('Renamed', [c.title for c in courses])
+    
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Test a garbage cursor does not break the home page"""
+        response = self.client.get(reverse('home'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+
+
+class CourseSearchTestCase(TestCase):
+    """Test the full-text course search index"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor',
+            first_name='Ada',
+            last_name='Lovelace'
+        )
+        
+        self.student = User.objects.create_user(
+            username='student@example.com',
+            email='student@example.com',
+            password='testpass123',
+            role='student'
+        )
+        
+        self.python_course = Course.objects.create(
+            instructor=self.instructor,
+            title='Python Programming',
+            description='Test',
+            price=Decimal('10.00'),
+            status='published'
+        )
+        self.advanced_course = Course.objects.create(
+            instructor=self.instructor,
+            title='Advanced Python Programming Patterns',
+            description='Test',
+            price=Decimal('10.00'),
+            status='published'
+        )
+        self.private_course = Course.objects.create(
+            instructor=self.instructor,
+            title='Private Python Workshop',
+            description='Test',
+            price=Decimal('10.00'),
+            status='published',
+            is_private=True
+        )
+    
+    def titles(self, query, user=None, **kwargs):
+        courses, _ = find_courses(query, user or AnonymousUser(), **kwargs)
+        return [course.title for course in courses]
+    
+    def test_prefix_match_on_title(self):
+        """Test partial words match course titles"""
+        self.assertEqual(
+            set(self.titles('progr')),
+            {'Python Programming', 'Advanced Python Programming Patterns'}
+        )
+    
+    def test_all_terms_must_match(self):
+        """Test multi-word queries require every term"""
+        self.assertEqual(self.titles('python patterns'), ['Advanced Python Programming Patterns'])
+    
+    def test_instructor_rename_updates_index(self):
+        """Test instructor name changes are reflected through the user signal"""
+        self.assertEqual(len(self.titles('ada')), 2)
+        
+        self.instructor.first_name = 'Grace'
+        self.instructor.save()
+        self.assertEqual(self.titles('ada'), [])
+        self.assertEqual(len(self.titles('grace')), 2)
+    
+    def test_private_courses_visible_to_enrolled_student_only(self):
+        """Test private courses follow the same visibility rules as the catalog"""
+        self.assertNotIn('Private Python Workshop', self.titles('workshop'))
+        
+        Enrollment.objects.create(student=self.student, course=self.private_course)
+        self.assertIn('Private Python Workshop', self.titles('workshop', self.student))
+    
+    def test_pagination(self):
+        """Test results are paged"""
+        courses, has_next = find_courses('python', AnonymousUser(), page=1, page_size=1)
+        self.assertEqual(len(courses), 1)
+        self.assertTrue(has_next)
+        
+        courses, has_next = find_courses('python', AnonymousUser(), page=2, page_size=1)
+        self.assertEqual(len(courses), 1)
+        self.assertFalse(has_next)
+    
+    def test_huge_page_number(self):
+        """Test a page number past any database integer returns an empty page"""
+        self.assertEqual(find_courses('python', AnonymousUser(), page=10 ** 20), ([], False))
+        
+        response = self.client.get(reverse('courses:search'), {'q': 'python', 'page': str(10 ** 20)})
+        self.assertEqual(response.status_code, 200)
+    
+    def test_search_view(self):
+        """Test the search page renders ranked results"""
+        response = self.client.get(reverse('courses:search'), {'q': 'python'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Python Programming', response.content)
+
+
+class EnrollmentProgressTestCase(TestCase):
+    """Test incremental enrollment progress counters"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.student = User.objects.create_user(
+            username='student@example.com',
+            email='student@example.com',
+            password='testpass123',
+            role='student'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Progress Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+        
+        self.videos = [
+            Video.objects.create(course=self.course, title=f'Lesson {i}', video_file=f'videos/{i}.mp4', duration=100)
+            for i in range(4)
+        ]
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+    
+    def watch(self, video, seconds):
+        progress, _ = VideoProgress.objects.get_or_create(video=video, student=self.student)
+        progress.watched_duration = seconds
+        progress.update_completion()
+        return progress
+    
+    def get_enrollment(self):
+        return Enrollment.objects.get(pk=self.enrollment.pk)
+    
+    def test_counters_follow_video_progress(self):
+        """Test completions and watched seconds are tracked per enrollment"""
+        self.watch(self.videos[0], 30)
+        self.watch(self.videos[0], 95)
+        self.watch(self.videos[1], 40)
+        
+        enrollment = self.get_enrollment()
+        self.assertEqual(enrollment.completed_videos, 1)
+        self.assertEqual(enrollment.watched_seconds, 135)
+        self.assertEqual(enrollment.progress_percentage, Decimal('25.00'))
+        self.assertIsNone(enrollment.completed_at)
+    
+    def test_completed_at_set_when_all_videos_done(self):
+        """Test completed_at is stamped when progress reaches 100%"""
+        for video in self.videos:
+            self.watch(video, 100)
+        
+        enrollment = self.get_enrollment()
+        self.assertEqual(enrollment.progress_percentage, Decimal('100.00'))
+        self.assertIsNotNone(enrollment.completed_at)
+    
+    def test_new_video_lowers_percentage(self):
+        """Test adding a video to the course rescales existing enrollments"""
+        for video in self.videos[:2]:
+            self.watch(video, 100)
+        Video.objects.create(course=self.course, title='Bonus', video_file='videos/bonus.mp4', duration=100)
+        
+        self.assertEqual(self.get_enrollment().progress_percentage, Decimal('40.00'))
+    
+    def test_deleting_progress_reverses_counters(self):
+        """Test deleted progress rows are subtracted"""
+        progress = self.watch(self.videos[0], 95)
+        progress.delete()
+        
+        enrollment = self.get_enrollment()
+        self.assertEqual(enrollment.completed_videos, 0)
+        self.assertEqual(enrollment.watched_seconds, 0)
+        self.assertEqual(enrollment.progress_percentage, Decimal('0.00'))
+    
+    def test_rebuild_command_backfills_counters(self):
+        """Test the backfill command recomputes drifted counters"""
+        self.watch(self.videos[0], 95)
+        self.watch(self.videos[1], 50)
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(
+            completed_videos=0, watched_seconds=0, progress_percentage=0
+        )
+        
+        call_command('rebuild_enrollment_progress', '--chunk-size', '1', stdout=open(os.devnull, 'w'))
+        
+        enrollment = self.get_enrollment()
+        self.assertEqual(enrollment.completed_videos, 1)
+        self.assertEqual(enrollment.watched_seconds, 145)
+        self.assertEqual(enrollment.progress_percentage, Decimal('25.00'))
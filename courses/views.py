@@ -5,31 +5,20 @@ from django.http import JsonResponse
 from accounts.decorators import instructor_required
 from .models import Course, Enrollment, CourseResource, CourseRating, CourseReferral
 from .forms import CourseCreationForm, CourseResourceForm, CourseRatingForm
+from .catalog import get_catalog_page
+from .search import find_courses
 import uuid
 
 # Create your views here.
 def home(request):
     """Home page - list all published courses that are not private, or private courses the user is enrolled in."""
-    from django.db.models import Q
-    
-    # Base filter for published, non-suspended courses
-    base_filter = Q(status='published', is_suspended=False)
-    
-    if request.user.is_authenticated:
-        # For authenticated users: public courses OR private courses they own/enrolled in
-        courses = Course.objects.filter(
-            base_filter & (
-                Q(is_private=False) |  # All public courses
-                Q(is_private=True, instructor=request.user) |  # Courses they own
-                Q(is_private=True, enrollments__student=request.user, enrollments__is_active=True)  # Private courses they're enrolled in
-            )
-        ).prefetch_related('instructor').distinct()
-    else:
-        # For guests: only public courses
-        courses = Course.objects.filter(base_filter, is_private=False).prefetch_related('instructor')
+    # Public courses come from cached keyset pages; private courses the user
+    # owns or is enrolled in are merged in from a small per-user set
+    courses, next_cursor = get_catalog_page(request.user, cursor=request.GET.get('cursor'))
     
     context = {
         'courses': courses,
+        'next_cursor': next_cursor,
     }
     return render(request, 'courses/home.html', context)
 
@@ -37,7 +26,10 @@ def home(request):
 @login_required
 def my_courses(request):
     """View for students to see their enrolled courses."""
-    enrollments = Enrollment.objects.filter(student=request.user, is_active=True).select_related('course')
+    enrollments = (
+        Enrollment.objects.filter(student=request.user, is_active=True)
+        .select_related('course__instructor', 'course__stats')
+    )
     context = {
         'enrollments': enrollments,
     }
@@ -46,7 +38,7 @@ def my_courses(request):
 
 def course_detail(request, course_id):
     """Course detail page."""
-    course = get_object_or_404(Course, id=course_id)
+    course = get_object_or_404(Course.objects.select_related('instructor', 'stats'), id=course_id)
     
     # Check if user has access to this course
     if not course.is_accessible_by_user(request.user):
@@ -60,11 +52,13 @@ def course_detail(request, course_id):
         user_rating = course.ratings.filter(student=request.user).first()
     
     # Get average rating
-    avg_rating = get_course_average_rating(course)
-    all_ratings = course.ratings.all()
+    course_stats = course.get_stats()
+    avg_rating = course_stats.average_rating
+    all_ratings = course.ratings.select_related('student')
     
     context = {
         'course': course,
+        'course_stats': course_stats,
         'is_enrolled': is_enrolled,
         'platform_fee': course.get_platform_fee(),
         'instructor_payout': course.get_instructor_payout(),
@@ -185,45 +179,20 @@ def delete_resource(request, resource_id):
 def search_courses(request):
     """Search courses and instructors by title, instructor name, or keyword."""
     query = request.GET.get('q', '').strip()
-    courses = []
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
     
-    if query:
-        from django.db.models import Q
-        
-        # Search public courses by title or instructor name
-        courses = Course.objects.filter(
-            Q(title__icontains=query) | Q(instructor__first_name__icontains=query) | 
-            Q(instructor__last_name__icontains=query) | Q(instructor__email__icontains=query),
-            status='published',
-            is_suspended=False
-        ).exclude(is_private=True).prefetch_related('instructor').distinct()
-        
-        # If user is authenticated, also include private courses they're enrolled in
-        if request.user.is_authenticated:
-            private_enrolled = Course.objects.filter(
-                Q(title__icontains=query) | Q(instructor__first_name__icontains=query) | 
-                Q(instructor__last_name__icontains=query) | Q(instructor__email__icontains=query),
-                status='published',
-                is_private=True,
-                enrollments__student=request.user,
-                enrollments__is_active=True,
-                is_suspended=False
-            ).prefetch_related('instructor').distinct()
-            
-            instructor_private = Course.objects.filter(
-                Q(title__icontains=query) | Q(instructor__first_name__icontains=query) | 
-                Q(instructor__last_name__icontains=query) | Q(instructor__email__icontains=query),
-                status='published',
-                is_private=True,
-                instructor=request.user,
-                is_suspended=False
-            ).prefetch_related('instructor').distinct()
-            
-            courses = courses | private_enrolled | instructor_private
+    # Public courses plus private courses the user owns or is enrolled in,
+    # ranked by the full-text index
+    courses, has_next = find_courses(query, request.user, page=page)
     
     context = {
         'courses': courses,
         'query': query,
+        'page': page,
+        'has_next': has_next,
     }
     return render(request, 'courses/search_results.html', context)
 
@@ -251,10 +220,7 @@ def add_rating(request, course_id):
 
 def get_course_average_rating(course):
     """Get average rating for a course."""
-    ratings = course.ratings.all()
-    if not ratings:
-        return None
-    return sum(r.rating for r in ratings) / len(ratings)
+    return course.get_stats().average_rating
 
 
 @login_required
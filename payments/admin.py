@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment, Payout
+from .models import Payment, Payout, WebhookEvent
 
 
 @admin.register(Payment)
@@ -16,3 +16,11 @@ class PayoutAdmin(admin.ModelAdmin):
     list_filter = ('status', 'transferred', 'created_at')
     search_fields = ('instructor__email', 'stripe_transfer_id')
     readonly_fields = ('created_at', 'completed_at')
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event', 'received_at')
+    search_fields = ('event_id',)
+    readonly_fields = ('received_at', 'processed_at', 'attempts', 'payload')
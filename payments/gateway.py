@@ -0,0 +1,329 @@
+"""
+Payment gateway access for order creation and signature checks.
+
+RazorpayGateway wraps one razorpay.Client per process whose requests
+session keeps a pool of PAYMENT_GATEWAY_POOL_SIZE connections and applies
+PAYMENT_GATEWAY_TIMEOUT to every call. Calls that fail with a connection
+error, timeout or 5xx are retried up to PAYMENT_GATEWAY_RETRIES times with
+jittered exponential backoff. PAYMENT_GATEWAY_BREAKER_THRESHOLD failures in
+a row open a circuit breaker: for PAYMENT_GATEWAY_BREAKER_RESET seconds
+calls fail immediately with GatewayUnavailable instead of tying up a worker
+thread, then a single trial call decides whether it closes again.
+
+FakeGateway answers in-process (after PAYMENT_FAKE_GATEWAY_LATENCY
+seconds) so make_payment and confirm_payment can be load tested offline.
+Select it with PAYMENT_GATEWAY = 'fake'.
+
+Every call's latency and outcome is recorded in the gateway's metrics.
+"""
+from collections import defaultdict, deque
+from django.conf import settings
+import hashlib
+import hmac
+import itertools
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayError(Exception):
+    """A gateway call failed."""
+
+
+class GatewayUnavailable(GatewayError):
+    """The circuit breaker is open; the gateway was not called."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial call."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Whether a call may go through now."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_running = False
+
+
+class GatewayMetrics:
+    """Thread-safe per-operation call counts and latencies."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._retries = defaultdict(int)
+        self._rejected = defaultdict(int)
+        self._latencies = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, operation, seconds, ok=True):
+        with self._lock:
+            self._calls[operation] += 1
+            if not ok:
+                self._errors[operation] += 1
+            self._latencies[operation].append(seconds)
+
+    def record_retry(self, operation):
+        with self._lock:
+            self._retries[operation] += 1
+
+    def record_rejected(self, operation):
+        with self._lock:
+            self._rejected[operation] += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: operation -> calls, errors, retries, rejected and p50/p95/max
+            latency in seconds over the last `window` calls
+        """
+        with self._lock:
+            operations = set(self._calls) | set(self._rejected)
+            result = {}
+            for operation in operations:
+                latencies = sorted(self._latencies[operation])
+                result[operation] = {
+                    'calls': self._calls[operation],
+                    'errors': self._errors[operation],
+                    'retries': self._retries[operation],
+                    'rejected': self._rejected[operation],
+                    'p50': _percentile(latencies, 0.50),
+                    'p95': _percentile(latencies, 0.95),
+                    'max': latencies[-1] if latencies else 0.0,
+                }
+            return result
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class PaymentGateway:
+    """Retries, circuit breaking and metrics around a gateway's raw calls."""
+
+    def __init__(self, key_id='', key_secret='', retries=2, backoff=0.2, backoff_max=2.0,
+                 breaker=None, sleep=time.sleep):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = GatewayMetrics()
+        self.sleep = sleep
+
+    def is_retryable(self, error):
+        return False
+
+    def _call(self, operation, func, *args, **kwargs):
+        if not self.breaker.allow():
+            self.metrics.record_rejected(operation)
+            raise GatewayUnavailable(f'Payment gateway unavailable ({operation})')
+
+        for attempt in range(self.retries + 1):
+            started = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.metrics.record(operation, time.monotonic() - started, ok=False)
+                retryable = self.is_retryable(e)
+                if not retryable:
+                    # The gateway answered; a rejected request says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.retries:
+                    raise GatewayError(f'{operation} failed: {e}') from e
+                if not self.breaker.allow():
+                    self.metrics.record_rejected(operation)
+                    raise GatewayUnavailable(f'Payment gateway unavailable ({operation})') from e
+                self.metrics.record_retry(operation)
+                # Full jitter keeps retries from many workers from arriving together
+                self.sleep(random.uniform(0, min(self.backoff * 2 ** attempt, self.backoff_max)))
+                continue
+            self.metrics.record(operation, time.monotonic() - started)
+            self.breaker.record_success()
+            return result
+
+    def create_order(self, amount, currency, receipt, notes=None):
+        """
+        Create an order for `amount` in the currency's smallest unit.
+
+        Returns:
+            dict: The gateway's order, including 'id'
+        """
+        return self._call('create_order', self._create_order, {
+            'amount': amount,
+            'currency': currency,
+            'receipt': receipt,
+            'notes': notes or {},
+        })
+
+    def _create_order(self, data):
+        raise NotImplementedError
+
+    def payment_signature(self, order_id, payment_id):
+        return hmac.new(self.key_secret.encode(), f'{order_id}|{payment_id}'.encode(), hashlib.sha256).hexdigest()
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        """Check the signature checkout returns for a completed payment."""
+        return hmac.compare_digest(self.payment_signature(order_id, payment_id), signature or '')
+
+
+class RazorpayGateway(PaymentGateway):
+    """Razorpay over a pooled requests session."""
+
+    def __init__(self, client_factory=None, **kwargs):
+        super().__init__(**kwargs)
+        self._client_factory = client_factory or self._create_client
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def _create_client(self):
+        import razorpay
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        timeout = (_setting('PAYMENT_GATEWAY_CONNECT_TIMEOUT', 3), _setting('PAYMENT_GATEWAY_TIMEOUT', 10))
+
+        class TimeoutSession(requests.Session):
+            def request(self, *args, **kwargs):
+                kwargs.setdefault('timeout', timeout)
+                return super().request(*args, **kwargs)
+
+        session = TimeoutSession()
+        pool_size = _setting('PAYMENT_GATEWAY_POOL_SIZE', 10)
+        # Retries are handled (and counted) by PaymentGateway._call
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+        return razorpay.Client(session=session, auth=(self.key_id, self.key_secret))
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def is_retryable(self, error):
+        import requests
+        from razorpay.errors import GatewayError as RazorpayGatewayError, ServerError
+
+        return isinstance(error, (requests.ConnectionError, requests.Timeout, ServerError, RazorpayGatewayError))
+
+    def _create_order(self, data):
+        return self.client.order.create(data=data)
+
+
+class FakeGateway(PaymentGateway):
+    """In-process gateway for tests and offline load tests."""
+
+    def __init__(self, latency=0.0, **kwargs):
+        kwargs.setdefault('key_id', 'rzp_test_fake')
+        kwargs.setdefault('key_secret', 'fake_secret')
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.orders = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _create_order(self, data):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            order = dict(data, id=f'order_fake{next(self._ids)}', status='created')
+            self.orders[order['id']] = order
+        return order
+
+    def checkout(self, order_id):
+        """
+        Simulate the customer paying an order.
+
+        Returns:
+            tuple: (payment id, signature) as checkout would post to confirm_payment
+        """
+        payment_id = f'pay_fake{order_id[len("order_fake"):]}'
+        return payment_id, self.payment_signature(order_id, payment_id)
+
+
+def _build_gateway():
+    options = {
+        'key_id': _setting('RAZORPAY_KEY_ID', ''),
+        'key_secret': _setting('RAZORPAY_KEY_SECRET', ''),
+        'retries': _setting('PAYMENT_GATEWAY_RETRIES', 2),
+        'backoff': _setting('PAYMENT_GATEWAY_BACKOFF', 0.2),
+        'breaker': CircuitBreaker(
+            failure_threshold=_setting('PAYMENT_GATEWAY_BREAKER_THRESHOLD', 5),
+            reset_timeout=_setting('PAYMENT_GATEWAY_BREAKER_RESET', 30),
+        ),
+    }
+    if _setting('PAYMENT_GATEWAY', 'razorpay') == 'fake':
+        if not options['key_secret']:
+            options.pop('key_secret')
+        return FakeGateway(latency=_setting('PAYMENT_FAKE_GATEWAY_LATENCY', 0.0), **options)
+    return RazorpayGateway(**options)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Process-wide gateway selected by PAYMENT_GATEWAY."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = _build_gateway()
+    return _gateway
+
+
+def set_gateway(gateway):
+    """Replace the process-wide gateway (tests, load tests)."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
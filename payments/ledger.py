@@ -0,0 +1,213 @@
+"""
+Revenue ledger: daily rollups of captured and refunded payments.
+
+CourseRevenueDay, InstructorRevenueDay and PlatformRevenueDay hold one row
+per (course | instructor | platform, day). sync_payment() is called after a
+payment's status changes and applies the difference between its status and
+Payment.ledger_status (what the ledger has already counted) as F()
+increments, so each capture and refund is counted exactly once no matter
+how often it is synced. Captures are dated by completed_at, refunds by
+refunded_at. The same transaction credits or debits the instructor's
+PayoutBalance (see payouts.py).
+
+Totals and time series are aggregated from the rollups, so their cost
+depends on the number of days covered, not on the number of payments. `python manage.py rebuild_revenue_ledger` recomputes every rollup
+from Payment with grouped SQL aggregates.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from decimal import Decimal
+from .models import Payment, CourseRevenueDay, InstructorRevenueDay, PlatformRevenueDay
+from .payouts import adjust_balance, lock_balance
+import logging
+
+logger = logging.getLogger(__name__)
+
+AMOUNT_FIELDS = (
+    'gross', 'platform_fees', 'instructor_earnings',
+    'refunds', 'refunded_platform_fees', 'refunded_earnings',
+)
+COUNT_FIELDS = ('payments_count', 'refunds_count')
+
+
+def _local_date(value):
+    return timezone.localdate(value or timezone.now())
+
+
+def _capture_deltas(payment):
+    return {
+        'gross': payment['amount'],
+        'platform_fees': payment['platform_fee'],
+        'instructor_earnings': payment['instructor_payout'],
+        'payments_count': 1,
+    }
+
+
+def _refund_deltas(payment):
+    return {
+        'refunds': payment['amount'],
+        'refunded_platform_fees': payment['platform_fee'],
+        'refunded_earnings': payment['instructor_payout'],
+        'refunds_count': 1,
+    }
+
+
+def _bump(payment, date, deltas):
+    """Add deltas to the course, instructor and platform rows for a day."""
+    targets = [(PlatformRevenueDay, {})]
+    if payment['course_id']:
+        targets.append((CourseRevenueDay, {'course_id': payment['course_id']}))
+    if payment['instructor_id']:
+        targets.append((InstructorRevenueDay, {'instructor_id': payment['instructor_id']}))
+    for model, lookup in targets:
+        row, _ = model.objects.get_or_create(date=date, **lookup)
+        model.objects.filter(pk=row.pk).update(**{field: F(field) + value for field, value in deltas.items()})
+
+
+def sync_payment(payment_id):
+    """
+    Bring the ledger up to date with one payment's status.
+
+    Returns:
+        bool: Whether the ledger changed
+    """
+    with transaction.atomic():
+        owner = Payment.objects.filter(pk=payment_id).values('instructor_id', 'course_id').first()
+        if owner is None:
+            return False
+        # Balance row before payment row, the same order create_payout locks them in
+        balance = None
+        if owner['instructor_id'] and owner['course_id']:
+            balance = lock_balance(owner['instructor_id'], owner['course_id'])
+
+        payment = (
+            Payment.objects.select_for_update()
+            .filter(pk=payment_id)
+            .values('status', 'ledger_status', 'amount', 'platform_fee', 'instructor_payout',
+                    'course_id', 'instructor_id', 'completed_at', 'refunded_at', 'payout_id')
+            .first()
+        )
+        target = payment['status'] if payment['status'] in ('captured', 'refunded') else ''
+        counted = payment['ledger_status']
+        if target == counted or not target:
+            return False
+
+        earnings, unsettled = Decimal('0.00'), 0
+        if counted == '' and (target == 'captured' or payment['completed_at'] is not None):
+            _bump(payment, _local_date(payment['completed_at']), _capture_deltas(payment))
+            earnings += payment['instructor_payout']
+            unsettled += 1
+        if target == 'refunded' and (counted == 'captured' or payment['completed_at'] is not None):
+            _bump(payment, _local_date(payment['refunded_at']), _refund_deltas(payment))
+            # A settled payment's refund is clawed back from the next payout
+            earnings -= payment['instructor_payout']
+            unsettled -= 1 if payment['payout_id'] is None else 0
+        if balance is not None:
+            adjust_balance(balance, earnings, unsettled)
+
+        Payment.objects.filter(pk=payment_id).update(ledger_status=target)
+    return True
+
+
+def _rollups(model, filters, start=None, end=None):
+    rows = model.objects.filter(**filters)
+    if start is not None:
+        rows = rows.filter(date__gte=start)
+    if end is not None:
+        rows = rows.filter(date__lte=end)
+    return rows
+
+
+def _with_net(values):
+    for field in AMOUNT_FIELDS:
+        values[field] = values.get(field) or Decimal('0.00')
+    for field in COUNT_FIELDS:
+        values[field] = values.get(field) or 0
+    values['net_revenue'] = values['gross'] - values['refunds']
+    values['net_platform_fees'] = values['platform_fees'] - values['refunded_platform_fees']
+    values['net_earnings'] = values['instructor_earnings'] - values['refunded_earnings']
+    return values
+
+
+def _totals(rows):
+    return _with_net(rows.aggregate(**{field: Sum(field) for field in AMOUNT_FIELDS + COUNT_FIELDS}))
+
+
+def course_totals(course_id, start=None, end=None):
+    """
+    Revenue totals for a course, optionally limited to dates [start, end].
+
+    Returns:
+        dict: gross, platform_fees, instructor_earnings, refunds, refunded_*,
+        payments_count, refunds_count, net_revenue, net_platform_fees, net_earnings
+    """
+    return _totals(_rollups(CourseRevenueDay, {'course_id': course_id}, start, end))
+
+
+def instructor_totals(instructor_id, start=None, end=None):
+    """Revenue totals for an instructor (same keys as course_totals)."""
+    return _totals(_rollups(InstructorRevenueDay, {'instructor_id': instructor_id}, start, end))
+
+
+def platform_totals(start=None, end=None):
+    """Revenue totals for the whole platform (same keys as course_totals)."""
+    return _totals(_rollups(PlatformRevenueDay, {}, start, end))
+
+
+def time_series(course_id=None, instructor_id=None, start=None, end=None):
+    """
+    Daily totals, oldest first, for a course, an instructor or the platform.
+
+    Returns:
+        list: dicts with 'date' and the keys of course_totals
+    """
+    if course_id is not None:
+        rows = _rollups(CourseRevenueDay, {'course_id': course_id}, start, end)
+    elif instructor_id is not None:
+        rows = _rollups(InstructorRevenueDay, {'instructor_id': instructor_id}, start, end)
+    else:
+        rows = _rollups(PlatformRevenueDay, {}, start, end)
+    return [_with_net(row) for row in rows.order_by('date').values('date', *AMOUNT_FIELDS, *COUNT_FIELDS)]
+
+
+def rebuild_ledger():
+    """
+    Recompute every rollup from Payment with grouped aggregates.
+
+    Returns:
+        int: Number of payments counted
+    """
+    captured = Q(status='captured') | Q(status='refunded', completed_at__isnull=False)
+    refunded = Q(status='refunded', completed_at__isnull=False)
+    capture_day = TruncDate(Coalesce('completed_at', 'created_at'))
+    refund_day = TruncDate(Coalesce('refunded_at', 'completed_at'))
+
+    with transaction.atomic():
+        for model, key in ((PlatformRevenueDay, None), (CourseRevenueDay, 'course_id'), (InstructorRevenueDay, 'instructor_id')):
+            model.objects.all().delete()
+            rows = {}
+            for condition, day, names in (
+                (captured, capture_day, ('gross', 'platform_fees', 'instructor_earnings', 'payments_count')),
+                (refunded, refund_day, ('refunds', 'refunded_platform_fees', 'refunded_earnings', 'refunds_count')),
+            ):
+                group = ('day', key) if key else ('day',)
+                payments = Payment.objects.filter(condition)
+                if key:
+                    payments = payments.filter(**{f'{key}__isnull': False})
+                grouped = payments.annotate(day=day).values(*group).annotate(
+                    amount_sum=Sum('amount'), fee_sum=Sum('platform_fee'),
+                    payout_sum=Sum('instructor_payout'), row_count=Count('pk'),
+                ).order_by()
+                for entry in grouped:
+                    row_key = (entry['day'], entry[key] if key else None)
+                    fields = rows.setdefault(row_key, {'date': entry['day'], **({key: entry[key]} if key else {})})
+                    fields.update(zip(names, (entry['amount_sum'], entry['fee_sum'], entry['payout_sum'], entry['row_count'])))
+            model.objects.bulk_create([model(**fields) for fields in rows.values()], batch_size=1000)
+
+        Payment.objects.filter(status__in=('captured', 'refunded')).update(ledger_status=F('status'))
+        Payment.objects.exclude(status__in=('captured', 'refunded')).exclude(ledger_status='').update(ledger_status='')
+    counted = Payment.objects.filter(captured).count()
+    logger.info(f"Rebuilt revenue ledger from {counted} payments")
+    return counted
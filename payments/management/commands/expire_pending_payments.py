@@ -0,0 +1,25 @@
+"""
+Expire 'created' payments whose gateway order was never paid.
+
+Usage (e.g. every few minutes from cron):
+    python manage.py expire_pending_payments
+    python manage.py expire_pending_payments --ttl 3600 --batch-size 5000
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from payments.orders import expire_stale_payments
+
+
+class Command(BaseCommand):
+    help = "Mark stale 'created' payments as expired in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int,
+                            default=getattr(settings, 'PAYMENT_ORDER_TTL', 900),
+                            help='Age in seconds after which an unpaid order expires')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Payments updated per statement')
+
+    def handle(self, *args, **options):
+        expired = expire_stale_payments(options['ttl'], max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} pending payments'))
@@ -0,0 +1,42 @@
+"""
+Apply stored Razorpay webhook events to payments.
+
+Usage:
+    python manage.py process_payment_webhooks
+    python manage.py process_payment_webhooks --batch-size 500 --once
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from payments.webhooks import process_batch
+import time
+
+
+class Command(BaseCommand):
+    help = 'Drain the webhook inbox in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings, 'PAYMENT_WEBHOOK_BATCH_SIZE', 100),
+                            help='Events applied per transaction')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait for new events when the inbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the inbox is empty')
+
+    def handle(self, *args, **options):
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                handled = process_batch(max(options['batch_size'], 1))
+                processed += handled
+                if handled:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} webhook events'))
@@ -0,0 +1,21 @@
+"""
+Recompute the daily revenue rollups and payout balances from Payment.
+
+Run once after deploying the ledger, or to repair it. Live syncs that run
+at the same time may be counted twice, so prefer a quiet period.
+
+Usage:
+    python manage.py rebuild_revenue_ledger
+"""
+from django.core.management.base import BaseCommand
+from payments.ledger import rebuild_ledger
+from payments.payouts import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = 'Rebuild course, instructor and platform revenue rollups and payout balances'
+
+    def handle(self, *args, **options):
+        counted = rebuild_ledger()
+        balances = rebuild_balances()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt revenue ledger from {counted} payments and {balances} payout balances'))
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.7 on 2026-10-17 02:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_enrollment_progress_counters'),
+        ('payments', '0003_payment_expired_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='ledger_status',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='refunded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PlatformRevenueDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('platform_fees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('instructor_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_platform_fees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('refunds_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('date',), name='unique_platform_revenue_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseRevenueDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('platform_fees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('instructor_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_platform_fees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('refunds_count', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_days', to='courses.course')),
+            ],
+            options={
+                'ordering': ['date'],
+                'abstract': False,
+                'unique_together': {('course', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='InstructorRevenueDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('platform_fees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('instructor_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_platform_fees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('refunds_count', models.PositiveIntegerField(default=0)),
+                ('instructor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'abstract': False,
+                'unique_together': {('instructor', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-17 02:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_enrollment_progress_counters'),
+        ('payments', '0004_revenue_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='payout',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='payments.payout'),
+        ),
+        migrations.CreateModel(
+            name='PayoutBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unsettled', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('unsettled_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payout_balances', to='courses.course')),
+                ('instructor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payout_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('instructor', 'course')},
+            },
+        ),
+    ]
@@ -15,6 +15,7 @@ class Payment(models.Model):
         ('captured', 'Captured'),
         ('failed', 'Failed'),
         ('refunded', 'Refunded'),
+        ('expired', 'Expired'),  # 'created' order never paid (see payments/orders.py)
     ]
 
     student = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='payments')
@@ -30,6 +31,9 @@ class Payment(models.Model):
     transaction_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
+    refunded_at = models.DateTimeField(blank=True, null=True)
+    ledger_status = models.CharField(max_length=20, blank=True, default='')  # Last status applied to the revenue ledger
+    payout = models.ForeignKey('Payout', on_delete=models.SET_NULL, null=True, blank=True, related_name='payments')  # Payout that settled this payment
     
     class Meta:
         ordering = ['-created_at']
@@ -75,3 +79,109 @@ class Payout(models.Model):
     
     def __str__(self):
         return f"Payout {self.id} - {self.instructor} - {self.total_amount}"
+
+
+
+class PayoutBalance(models.Model):
+    """
+    Instructor earnings from a course not yet settled by a payout.
+    Maintained by payments/payouts.py.
+    """
+    instructor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='payout_balances')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='payout_balances')
+    unsettled = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unsettled_count = models.IntegerField(default=0)  # Captured payments not linked to a payout
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('instructor', 'course')
+    
+    def __str__(self):
+        return f"{self.instructor} - {self.course}: {self.unsettled}"
+
+
+class RevenueDay(models.Model):
+    """
+    Daily revenue totals; maintained by payments/ledger.py.
+    """
+    date = models.DateField()
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    platform_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    instructor_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_platform_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payments_count = models.PositiveIntegerField(default=0)
+    refunds_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+        ordering = ['date']
+
+
+class CourseRevenueDay(RevenueDay):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='revenue_days')
+    
+    class Meta(RevenueDay.Meta):
+        unique_together = ('course', 'date')
+    
+    def __str__(self):
+        return f"{self.course} {self.date}: {self.gross}"
+
+
+class InstructorRevenueDay(RevenueDay):
+    instructor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='revenue_days')
+    
+    class Meta(RevenueDay.Meta):
+        unique_together = ('instructor', 'date')
+    
+    def __str__(self):
+        return f"{self.instructor} {self.date}: {self.gross}"
+
+
+class PlatformRevenueDay(RevenueDay):
+    class Meta(RevenueDay.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['date'], name='unique_platform_revenue_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date}: {self.gross}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Raw Razorpay webhook event, stored on receipt and applied later by
+    `python manage.py process_payment_webhooks`.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    )
+    
+    event_id = models.CharField(max_length=255, unique=True)  # X-Razorpay-Event-Id
+    event = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event} {self.event_id} ({self.status})"
+    
+    @property
+    def lag(self):
+        """Time between receipt and processing."""
+        if self.processed_at is None:
+            return None
+        return self.processed_at - self.received_at
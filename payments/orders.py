@@ -0,0 +1,136 @@
+"""
+Reuse of open gateway orders.
+
+make_payment remembers the Payment it created for (student, course, amount)
+for PAYMENT_ORDER_TTL seconds, so a double-click or a back-button retry
+renders the same order again instead of creating another gateway order and
+Payment row. The database is checked when the cache has no entry (another
+process created the order, or the entry was evicted).
+
+Creating an order takes a cache lock for the same key, so concurrent
+requests (a double-click lands while the first is still waiting on the
+gateway) create one order: the others wait up to PAYMENT_ORDER_LOCK_WAIT
+seconds and reuse it.
+
+`python manage.py expire_pending_payments` (run from cron) marks 'created'
+payments older than PAYMENT_ORDER_TTL as 'expired' in batches.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import timedelta
+from .models import Payment
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+LOCK_POLL_INTERVAL = 0.1  # seconds between checks while another request creates the order
+
+
+class OrderInProgress(Exception):
+    """Another request is still creating the order for this student and course"""
+
+
+def _ttl():
+    return getattr(settings, 'PAYMENT_ORDER_TTL', 900)
+
+
+def _cache_key(student_id, course_id, amount):
+    return f'payments:open_order:{student_id}:{course_id}:{amount}'
+
+
+def _lock_key(student_id, course_id, amount):
+    return _cache_key(student_id, course_id, amount) + ':lock'
+
+
+def open_payment(student_id, course_id, amount):
+    """
+    The student's unexpired 'created' payment for a course at this amount, or None.
+
+    Args:
+        amount (Decimal): Payment.amount the order was created for
+    """
+    fresh = Payment.objects.filter(
+        student_id=student_id,
+        course_id=course_id,
+        amount=amount,
+        status='created',
+        created_at__gte=timezone.now() - timedelta(seconds=_ttl()),
+    )
+    payment_id = cache.get(_cache_key(student_id, course_id, amount))
+    if payment_id is not None:
+        payment = fresh.filter(pk=payment_id).first()
+        if payment is not None:
+            return payment
+    payment = fresh.order_by('-created_at').first()
+    if payment is not None:
+        remember_payment(payment)
+    return payment
+
+
+def open_or_create_payment(student_id, course_id, amount, create):
+    """
+    The open payment for a course at this amount, calling `create()` when there is none.
+
+    Only one request at a time runs `create()` for the same student, course
+    and amount. A request that finds the lock taken waits for the order the
+    holder creates instead of calling the gateway itself.
+
+    Args:
+        create (callable): Creates the gateway order and returns its Payment
+
+    Raises:
+        OrderInProgress: The order was still being created after PAYMENT_ORDER_LOCK_WAIT seconds
+    """
+    lock_key = _lock_key(student_id, course_id, amount)
+    deadline = time.monotonic() + getattr(settings, 'PAYMENT_ORDER_LOCK_WAIT', 10)
+    while True:
+        payment = open_payment(student_id, course_id, amount)
+        if payment is not None:
+            return payment
+        # cache.add is atomic; the timeout frees the lock if its holder dies
+        if cache.add(lock_key, True, timeout=getattr(settings, 'PAYMENT_ORDER_LOCK_TIMEOUT', 60)):
+            try:
+                # The previous holder may have finished between the check and the add
+                payment = open_payment(student_id, course_id, amount)
+                if payment is None:
+                    payment = create()
+                    remember_payment(payment)
+                return payment
+            finally:
+                cache.delete(lock_key)
+        if time.monotonic() >= deadline:
+            raise OrderInProgress(f"Order for student {student_id}, course {course_id} is still being created")
+        time.sleep(LOCK_POLL_INTERVAL)
+
+
+def remember_payment(payment):
+    """Cache a newly created payment for reuse until its order expires."""
+    remaining = _ttl() - (timezone.now() - payment.created_at).total_seconds()
+    if remaining > 0:
+        cache.set(_cache_key(payment.student_id, payment.course_id, payment.amount), payment.pk, timeout=int(remaining))
+
+
+def expire_stale_payments(ttl=None, batch_size=1000):
+    """
+    Mark 'created' payments older than `ttl` seconds as 'expired'.
+
+    Returns:
+        int: Number of payments expired
+    """
+    ttl = ttl if ttl is not None else _ttl()
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    stale = Payment.objects.filter(status='created', created_at__lt=cutoff)
+    expired = 0
+    while True:
+        batch = list(stale.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        # status='created' again so a payment confirmed meanwhile is left alone
+        expired += Payment.objects.filter(pk__in=batch, status='created').update(status='expired')
+        if len(batch) < batch_size:
+            break
+    if expired:
+        logger.info(f"Expired {expired} stale pending payments")
+    return expired
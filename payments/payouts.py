@@ -0,0 +1,152 @@
+"""
+Payout balances and settlement.
+
+PayoutBalance keeps a running unsettled amount per (instructor, course).
+The revenue ledger credits it when a payment is captured and debits it when
+a payment is refunded (a refund of an already settled payment is clawed
+back from the next payout). create_payout() locks the balance row, creates
+a Payout for the whole unsettled amount and links the captured payments it
+settles in batched update() calls, so the cost of a payout does not depend
+on the course's sales history beyond the payments being settled.
+
+Lock order is always balance row, then payment rows (see
+ledger.sync_payment), so settlement and webhook processing cannot deadlock.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from decimal import Decimal
+from .models import Payment, Payout, PayoutBalance
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PayoutError(Exception):
+    """A payout could not be created or released."""
+
+
+def _batch_size():
+    return getattr(settings, 'PAYOUT_SETTLE_BATCH_SIZE', 1000)
+
+
+def lock_balance(instructor_id, course_id):
+    """Get or create the balance row and lock it. Call inside a transaction."""
+    balance, _ = PayoutBalance.objects.get_or_create(instructor_id=instructor_id, course_id=course_id)
+    return PayoutBalance.objects.select_for_update().get(pk=balance.pk)
+
+
+def adjust_balance(balance, amount, count=0):
+    """Add `amount` (and `count` unsettled payments) to a locked balance row."""
+    if amount or count:
+        PayoutBalance.objects.filter(pk=balance.pk).update(
+            unsettled=F('unsettled') + amount,
+            unsettled_count=F('unsettled_count') + count,
+        )
+
+
+def _relink(payments, payout, batch_size):
+    """Point every payment in a queryset at `payout`, batch_size rows per statement."""
+    changed = 0
+    while True:
+        batch = list(payments.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return changed
+        changed += Payment.objects.filter(pk__in=batch).update(payout=payout)
+        if len(batch) < batch_size:
+            return changed
+
+
+def create_payout(instructor, course, batch_size=None, **fields):
+    """
+    Settle an instructor's unsettled earnings for a course.
+
+    Args:
+        fields: Extra Payout fields (payment_method, bank_account, notes)
+
+    Returns:
+        Payout
+
+    Raises:
+        PayoutError: Nothing to settle
+    """
+    with transaction.atomic():
+        balance = lock_balance(instructor.id, course.id)
+        if balance.unsettled <= 0:
+            raise PayoutError('No pending payments')
+
+        payout = Payout.objects.create(instructor=instructor, course=course, total_amount=balance.unsettled, **fields)
+        settled = _relink(
+            Payment.objects.filter(instructor=instructor, course=course, status='captured',
+                                   ledger_status='captured', payout__isnull=True),
+            payout,
+            batch_size or _batch_size(),
+        )
+        PayoutBalance.objects.filter(pk=balance.pk).update(unsettled=Decimal('0.00'), unsettled_count=0)
+
+    logger.info(f"Payout {payout.id} created for {payout.total_amount} settling {settled} payments")
+    return payout
+
+
+def release_payout(payout, batch_size=None):
+    """
+    Mark a payout failed and return its payments and amount to the balance.
+    """
+    with transaction.atomic():
+        balance = lock_balance(payout.instructor_id, payout.course_id)
+        released = Payout.objects.filter(pk=payout.pk, status__in=('pending', 'processing')).update(status='failed')
+        if not released:
+            raise PayoutError(f'Payout {payout.pk} cannot be released')
+        unsettled = _relink(payout.payments.all(), None, batch_size or _batch_size())
+        adjust_balance(balance, payout.total_amount, unsettled)
+    payout.status = 'failed'
+    return payout
+
+
+def outstanding_balance(instructor_id, course_id=None):
+    """
+    Earnings not yet settled by a payout, for one course or all of them.
+    """
+    balances = PayoutBalance.objects.filter(instructor_id=instructor_id)
+    if course_id is not None:
+        return balances.filter(course_id=course_id).values_list('unsettled', flat=True).first() or Decimal('0.00')
+    return balances.aggregate(total=Sum('unsettled'))['total'] or Decimal('0.00')
+
+
+def rebuild_balances():
+    """
+    Recompute every balance as captured earnings minus non-failed payouts.
+
+    Returns:
+        int: Number of balance rows written
+    """
+    earned = (
+        Payment.objects.filter(status='captured', instructor__isnull=False, course__isnull=False)
+        .values('instructor_id', 'course_id')
+        .annotate(total=Sum('instructor_payout'), unsettled_count=Count('pk', filter=Q(payout__isnull=True)))
+        .order_by()
+    )
+    paid = (
+        Payout.objects.exclude(status='failed').filter(course__isnull=False)
+        .values('instructor_id', 'course_id')
+        .annotate(total=Sum('total_amount'))
+        .order_by()
+    )
+
+    balances = {}
+    for row in earned:
+        balances[(row['instructor_id'], row['course_id'])] = [row['total'], row['unsettled_count']]
+    for row in paid:
+        entry = balances.setdefault((row['instructor_id'], row['course_id']), [Decimal('0.00'), 0])
+        entry[0] -= row['total']
+
+    with transaction.atomic():
+        PayoutBalance.objects.all().delete()
+        PayoutBalance.objects.bulk_create(
+            [
+                PayoutBalance(instructor_id=instructor_id, course_id=course_id, unsettled=amount, unsettled_count=count)
+                for (instructor_id, course_id), (amount, count) in balances.items()
+            ],
+            batch_size=1000,
+        )
+    return len(balances)
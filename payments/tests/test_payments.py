@@ -2,7 +2,18 @@ from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from courses.models import Course, Enrollment
-from payments.models import Payment, Payout
+from payments.models import Payment, Payout, WebhookEvent
+from payments.webhooks import process_batch, LAG_CACHE_KEY
+from payments.orders import OrderInProgress, _lock_key, expire_stale_payments, open_or_create_payment, remember_payment
+from payments.ledger import course_totals, instructor_totals, platform_totals, rebuild_ledger, sync_payment, time_series
+from payments.payouts import PayoutError, create_payout, outstanding_balance, rebuild_balances, release_payout
+from payments.gateway import CircuitBreaker, FakeGateway, GatewayError, GatewayUnavailable, PaymentGateway, set_gateway
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from datetime import timedelta
+import hashlib
+import hmac
 from decimal import Decimal
 import json
 from unittest.mock import patch, MagicMock
@@ -336,3 +347,516 @@ class InstructorPayoutTestCase(TestCase):
         response = self.client.get(reverse('payments:course_payments', args=[self.course.id]))
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Complete Payment', response.content)
+
+
+
+class WebhookInboxTestCase(TestCase):
+    """Test webhook ingestion and batch processing"""
+    
+    def setUp(self):
+        """Set up a payment awaiting Razorpay events"""
+        cache.clear()
+        self.client = Client()
+        self.student = User.objects.create_user(
+            username='student@example.com',
+            email='student@example.com',
+            password='testpass123',
+            role='student'
+        )
+        
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Test Course',
+            description='A test course',
+            price=Decimal('99.99'),
+            status='published'
+        )
+        
+        self.payment = Payment.objects.create(
+            student=self.student,
+            instructor=self.instructor,
+            course=self.course,
+            amount=Decimal('99.99'),
+            status='created',
+            razorpay_order_id='order_1'
+        )
+    
+    def post_event(self, event_id, event, entity, **headers):
+        body = json.dumps({'event': event, 'payload': entity})
+        return self.client.post(
+            reverse('payments:payment_webhook'),
+            body,
+            content_type='application/json',
+            HTTP_X_RAZORPAY_EVENT_ID=event_id,
+            **headers
+        )
+    
+    def payment_event(self, event_id, event, payment_id='pay_1'):
+        return self.post_event(event_id, event, {'payment': {'entity': {'id': payment_id, 'order_id': 'order_1'}}})
+    
+    def test_webhook_only_stores_event(self):
+        """Test the webhook stores the event without touching the payment"""
+        response = self.payment_event('evt_1', 'payment.authorized')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.get().event, 'payment.authorized')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'created')
+    
+    def test_redelivery_is_ignored(self):
+        """Test a retried event id is stored once"""
+        self.payment_event('evt_1', 'payment.authorized')
+        response = self.payment_event('evt_1', 'payment.authorized')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+    
+    def test_batch_applies_transitions(self):
+        """Test a batch applies events and records lag"""
+        self.payment_event('evt_1', 'payment.authorized')
+        self.post_event('evt_2', 'refund.created', {'refund': {'entity': {'payment_id': 'pay_1'}}})
+        
+        self.assertEqual(process_batch(), 2)
+        
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'refunded')
+        self.assertEqual(self.payment.razorpay_payment_id, 'pay_1')
+        self.assertEqual(set(WebhookEvent.objects.values_list('status', flat=True)), {'processed'})
+        self.assertIsNotNone(WebhookEvent.objects.first().lag)
+        self.assertEqual(cache.get(LAG_CACHE_KEY)['events'], 2)
+    
+    def test_transitions_are_monotonic(self):
+        """Test a late authorization does not undo a capture"""
+        self.payment_event('evt_1', 'payment.captured')
+        process_batch()
+        self.payment_event('evt_2', 'payment.authorized')
+        process_batch()
+        
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'captured')
+        self.assertIsNotNone(self.payment.completed_at)
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_2').status, 'ignored')
+    
+    def test_retry_after_failed_attempt_is_captured(self):
+        """Test a second attempt on the same order succeeds after the first failed"""
+        self.payment_event('evt_1', 'payment.failed', payment_id='pay_1')
+        process_batch()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'failed')
+        
+        self.payment_event('evt_2', 'payment.captured', payment_id='pay_2')
+        process_batch()
+        
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'captured')
+        self.assertEqual(self.payment.razorpay_payment_id, 'pay_2')
+        self.assertIsNotNone(self.payment.completed_at)
+    
+    def test_late_failure_of_earlier_attempt_is_ignored(self):
+        """Test a failure only applies to the attempt the payment tracks"""
+        self.payment_event('evt_1', 'payment.authorized', payment_id='pay_2')
+        self.payment_event('evt_2', 'payment.failed', payment_id='pay_1')
+        process_batch()
+        
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'authorized')
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_2').status, 'ignored')
+        
+        self.payment_event('evt_3', 'payment.failed', payment_id='pay_2')
+        process_batch()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'failed')
+    
+    @override_settings(RAZORPAY_WEBHOOK_SECRET='whsec')
+    def test_signature_checked_when_secret_set(self):
+        """Test events with a bad signature are rejected"""
+        response = self.payment_event('evt_1', 'payment.authorized')
+        self.assertEqual(response.status_code, 400)
+        
+        body = json.dumps({'event': 'payment.failed', 'payload': {}})
+        signature = hmac.new(b'whsec', body.encode(), hashlib.sha256).hexdigest()
+        response = self.client.post(
+            reverse('payments:payment_webhook'),
+            body,
+            content_type='application/json',
+            HTTP_X_RAZORPAY_SIGNATURE=signature
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+
+
+class FlakyGateway(PaymentGateway):
+    """Gateway whose first `failures` calls raise ConnectionError"""
+    
+    def __init__(self, failures, **kwargs):
+        super().__init__(sleep=lambda seconds: None, **kwargs)
+        self.failures = failures
+        self.calls = 0
+    
+    def is_retryable(self, error):
+        return isinstance(error, ConnectionError)
+    
+    def _create_order(self, data):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError('connection reset')
+        if data['amount'] <= 0:
+            raise ValueError('amount must be positive')
+        return dict(data, id=f'order_{self.calls}')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class PaymentGatewayTestCase(TestCase):
+    """Test gateway retries, circuit breaking and the fake gateway"""
+    
+    def test_retries_transient_errors(self):
+        """Test connection errors are retried and counted"""
+        gateway = FlakyGateway(failures=2, retries=2)
+        
+        order = gateway.create_order(9999, 'INR', 'receipt')
+        
+        self.assertEqual(order['id'], 'order_3')
+        stats = gateway.metrics.snapshot()['create_order']
+        self.assertEqual((stats['calls'], stats['errors'], stats['retries']), (3, 2, 2))
+    
+    def test_gives_up_after_retries(self):
+        """Test the last transient error surfaces as GatewayError"""
+        gateway = FlakyGateway(failures=5, retries=1)
+        with self.assertRaises(GatewayError):
+            gateway.create_order(9999, 'INR', 'receipt')
+        self.assertEqual(gateway.calls, 2)
+    
+    def test_breaker_opens_and_recovers(self):
+        """Test repeated failures open the breaker until a trial call succeeds"""
+        clock = FakeClock()
+        gateway = FlakyGateway(failures=2, retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock))
+        for _ in range(2):
+            with self.assertRaises(GatewayError):
+                gateway.create_order(9999, 'INR', 'receipt')
+        
+        with self.assertRaises(GatewayUnavailable):
+            gateway.create_order(9999, 'INR', 'receipt')
+        self.assertEqual(gateway.calls, 2)
+        
+        clock.now = 31
+        self.assertEqual(gateway.create_order(9999, 'INR', 'receipt')['id'], 'order_3')
+        self.assertEqual(gateway.breaker.state, 'closed')
+    
+    def test_rejected_request_does_not_trip_breaker(self):
+        """Test non-transient errors are raised as-is and not retried"""
+        gateway = FlakyGateway(failures=0, retries=2, breaker=CircuitBreaker(failure_threshold=1))
+        with self.assertRaises(ValueError):
+            gateway.create_order(0, 'INR', 'receipt')
+        self.assertEqual(gateway.calls, 1)
+        self.assertEqual(gateway.breaker.state, 'closed')
+    
+    def test_fake_gateway_payment_flow(self):
+        """Test make_payment and confirm_payment run end to end against the fake gateway"""
+        gateway = FakeGateway(key_secret='fake_secret')
+        set_gateway(gateway)
+        self.addCleanup(set_gateway, None)
+        
+        student = User.objects.create_user(username='student@example.com', email='student@example.com', password='testpass123', role='student')
+        instructor = User.objects.create_user(username='instructor@example.com', email='instructor@example.com', password='testpass123', role='instructor')
+        course = Course.objects.create(instructor=instructor, title='Test Course', description='Test', price=Decimal('99.99'), status='published')
+        self.client.login(username='student@example.com', password='testpass123')
+        
+        self.client.post(reverse('payments:make_payment', args=[course.id]))
+        payment = Payment.objects.get(student=student)
+        self.assertEqual(gateway.orders[payment.razorpay_order_id]['amount'], 9999)
+        
+        payment_id, signature = gateway.checkout(payment.razorpay_order_id)
+        response = self.client.post(reverse('payments:confirm_payment'), {
+            'razorpay_payment_id': payment_id,
+            'razorpay_order_id': payment.razorpay_order_id,
+            'razorpay_signature': signature,
+            'course_id': course.id,
+        })
+        
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertTrue(Enrollment.objects.filter(student=student, course=course).exists())
+
+
+
+class OrderReuseTestCase(TestCase):
+    """Test reuse of open orders and expiry of stale ones"""
+    
+    def setUp(self):
+        """Set up a student, a paid course and the fake gateway"""
+        cache.clear()
+        self.gateway = FakeGateway()
+        set_gateway(self.gateway)
+        self.addCleanup(set_gateway, None)
+        
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com', password='testpass123', role='student')
+        self.instructor = User.objects.create_user(username='instructor@example.com', email='instructor@example.com', password='testpass123', role='instructor')
+        self.course = Course.objects.create(instructor=self.instructor, title='Test Course', description='Test', price=Decimal('99.99'), status='published')
+        self.client.login(username='student@example.com', password='testpass123')
+    
+    def pay(self):
+        return self.client.post(reverse('payments:make_payment', args=[self.course.id]))
+    
+    def test_repeat_request_reuses_order(self):
+        """Test a second POST renders the same order without calling the gateway"""
+        first = self.pay()
+        second = self.pay()
+        
+        self.assertEqual(len(self.gateway.orders), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(first.context['razorpay_order_id'], second.context['razorpay_order_id'])
+    
+    def test_reuse_survives_cache_eviction(self):
+        """Test the open order is found in the database when the cache is empty"""
+        self.pay()
+        cache.clear()
+        self.pay()
+        self.assertEqual(len(self.gateway.orders), 1)
+    
+    def test_price_change_creates_new_order(self):
+        """Test an order is only reused for the same amount"""
+        self.pay()
+        self.course.price = Decimal('49.99')
+        self.course.save()
+        self.pay()
+        self.assertEqual(Payment.objects.count(), 2)
+    
+    @override_settings(PAYMENT_ORDER_TTL=600)
+    def test_expired_orders_are_swept_and_not_reused(self):
+        """Test stale created payments are expired in bulk and a fresh order is made"""
+        self.pay()
+        Payment.objects.update(created_at=timezone.now() - timedelta(seconds=601))
+        
+        self.assertEqual(expire_stale_payments(batch_size=1), 1)
+        self.assertEqual(Payment.objects.get().status, 'expired')
+        
+        self.pay()
+        self.assertEqual(len(self.gateway.orders), 2)
+    
+    @override_settings(PAYMENT_ORDER_LOCK_WAIT=0)
+    def test_concurrent_request_does_not_create_second_order(self):
+        """Test a POST arriving while the first waits on the gateway does not call it again"""
+        gateway = self.gateway
+        concurrent = []
+        create_order = gateway._create_order
+        
+        def slow_create_order(data):
+            # The double-click lands while the first request is inside the gateway call
+            if not concurrent:
+                concurrent.append(self.pay())
+            return create_order(data)
+        
+        gateway._create_order = slow_create_order
+        first = self.pay()
+        
+        self.assertEqual(len(gateway.orders), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertIn('error', concurrent[0].context)
+        self.assertEqual(first.context['razorpay_order_id'], Payment.objects.get().razorpay_order_id)
+        self.assertIsNone(cache.get(_lock_key(self.student.id, self.course.id, Decimal('99.99'))))
+    
+    def test_waiting_request_reuses_order_from_lock_holder(self):
+        """Test a request that loses the lock reuses the order the holder creates"""
+        amount = Decimal('99.99')
+        lock_key = _lock_key(self.student.id, self.course.id, amount)
+        cache.add(lock_key, True)
+        self.addCleanup(cache.delete, lock_key)
+        create = MagicMock()
+        
+        def holder_finishes(seconds):
+            payment = Payment.objects.create(
+                student=self.student, instructor=self.instructor, course=self.course, amount=amount,
+                platform_fee=Decimal('10.00'), instructor_payout=Decimal('89.99'), status='created', razorpay_order_id='order_held',
+            )
+            remember_payment(payment)
+        
+        with patch('payments.orders.time.sleep', side_effect=holder_finishes):
+            payment = open_or_create_payment(self.student.id, self.course.id, amount, create)
+        
+        create.assert_not_called()
+        self.assertEqual(payment.razorpay_order_id, 'order_held')
+    
+    @override_settings(PAYMENT_ORDER_LOCK_WAIT=0)
+    def test_lock_held_too_long_raises(self):
+        """Test a request gives up when the order is still being created after the wait"""
+        amount = Decimal('99.99')
+        lock_key = _lock_key(self.student.id, self.course.id, amount)
+        cache.add(lock_key, True)
+        self.addCleanup(cache.delete, lock_key)
+        create = MagicMock()
+        with self.assertRaises(OrderInProgress):
+            open_or_create_payment(self.student.id, self.course.id, amount, create)
+        create.assert_not_called()
+
+
+
+class RevenueLedgerTestCase(TestCase):
+    """Test the daily revenue rollups"""
+    
+    def setUp(self):
+        """Set up an instructor with two courses"""
+        cache.clear()
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com', password='testpass123', role='student')
+        self.instructor = User.objects.create_user(username='instructor@example.com', email='instructor@example.com', password='testpass123', role='instructor')
+        self.course = Course.objects.create(instructor=self.instructor, title='Course A', description='Test', price=Decimal('100.00'), status='published')
+        self.other_course = Course.objects.create(instructor=self.instructor, title='Course B', description='Test', price=Decimal('50.00'), status='published')
+    
+    def capture(self, course, amount, order_id, days_ago=0):
+        payment = Payment.objects.create(
+            student=self.student,
+            instructor=self.instructor,
+            course=course,
+            amount=amount,
+            platform_fee=amount / 10,
+            instructor_payout=amount - amount / 10,
+            status='captured',
+            razorpay_order_id=order_id,
+            razorpay_payment_id=f'pay_{order_id}',
+            completed_at=timezone.now() - timedelta(days=days_ago)
+        )
+        sync_payment(payment.pk)
+        return payment
+    
+    def test_capture_is_counted_once(self):
+        """Test syncing a captured payment again does not double count it"""
+        payment = self.capture(self.course, Decimal('100.00'), 'order_1')
+        self.assertFalse(sync_payment(payment.pk))
+        
+        totals = course_totals(self.course.id)
+        self.assertEqual(totals['gross'], Decimal('100.00'))
+        self.assertEqual(totals['net_earnings'], Decimal('90.00'))
+        self.assertEqual(totals['payments_count'], 1)
+    
+    def test_refund_reduces_net(self):
+        """Test a refunded payment is netted out of the totals"""
+        payment = self.capture(self.course, Decimal('100.00'), 'order_1')
+        self.capture(self.other_course, Decimal('50.00'), 'order_2')
+        Payment.objects.filter(pk=payment.pk).update(status='refunded', refunded_at=timezone.now())
+        sync_payment(payment.pk)
+        
+        self.assertEqual(course_totals(self.course.id)['net_revenue'], Decimal('0.00'))
+        self.assertEqual(instructor_totals(self.instructor.id)['net_revenue'], Decimal('50.00'))
+        self.assertEqual(platform_totals()['net_platform_fees'], Decimal('5.00'))
+    
+    def test_time_series_and_constant_queries(self):
+        """Test daily totals are returned per day from the rollups"""
+        self.capture(self.course, Decimal('100.00'), 'order_1', days_ago=1)
+        self.capture(self.course, Decimal('100.00'), 'order_2')
+        self.capture(self.course, Decimal('100.00'), 'order_3')
+        
+        with self.assertNumQueries(1):
+            series = time_series(course_id=self.course.id)
+        self.assertEqual([day['gross'] for day in series], [Decimal('100.00'), Decimal('200.00')])
+    
+    def test_rebuild_matches_incremental(self):
+        """Test rebuilding from payments gives the same rollups"""
+        payment = self.capture(self.course, Decimal('100.00'), 'order_1', days_ago=2)
+        self.capture(self.other_course, Decimal('50.00'), 'order_2')
+        Payment.objects.filter(pk=payment.pk).update(status='refunded', refunded_at=timezone.now())
+        sync_payment(payment.pk)
+        incremental = (time_series(), time_series(course_id=self.course.id), instructor_totals(self.instructor.id))
+        
+        self.assertEqual(rebuild_ledger(), 2)
+        
+        self.assertEqual((time_series(), time_series(course_id=self.course.id), instructor_totals(self.instructor.id)), incremental)
+
+
+
+class PayoutBalanceTestCase(TestCase):
+    """Test running payout balances and settlement"""
+    
+    def setUp(self):
+        """Set up an instructor with two courses"""
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com', password='testpass123', role='student')
+        self.instructor = User.objects.create_user(username='instructor@example.com', email='instructor@example.com', password='testpass123', role='instructor')
+        self.course = Course.objects.create(instructor=self.instructor, title='Course A', description='Test', price=Decimal('100.00'), status='published')
+        self.other_course = Course.objects.create(instructor=self.instructor, title='Course B', description='Test', price=Decimal('50.00'), status='published')
+    
+    def capture(self, course, amount, order_id):
+        payment = Payment.objects.create(
+            student=self.student,
+            instructor=self.instructor,
+            course=course,
+            amount=amount,
+            platform_fee=amount / 10,
+            instructor_payout=amount - amount / 10,
+            status='captured',
+            razorpay_order_id=order_id,
+            razorpay_payment_id=f'pay_{order_id}',
+            completed_at=timezone.now()
+        )
+        sync_payment(payment.pk)
+        return payment
+    
+    def refund(self, payment):
+        Payment.objects.filter(pk=payment.pk).update(status='refunded', refunded_at=timezone.now())
+        sync_payment(payment.pk)
+    
+    def test_balance_follows_captures_and_refunds(self):
+        """Test captures credit and refunds debit the unsettled balance"""
+        self.capture(self.course, Decimal('100.00'), 'order_1')
+        payment = self.capture(self.course, Decimal('50.00'), 'order_2')
+        self.refund(payment)
+        
+        self.assertEqual(outstanding_balance(self.instructor.id, self.course.id), Decimal('90.00'))
+        self.assertEqual(outstanding_balance(self.instructor.id), Decimal('90.00'))
+    
+    def test_payout_settles_payments_in_batches(self):
+        """Test a payout takes the whole balance and links the payments it settles"""
+        payments = [self.capture(self.course, Decimal('10.00'), f'order_{i}') for i in range(5)]
+        self.capture(self.other_course, Decimal('10.00'), 'order_other')
+        
+        payout = create_payout(self.instructor, self.course, batch_size=2, notes='March')
+        
+        self.assertEqual(payout.total_amount, Decimal('45.00'))
+        self.assertEqual(set(payout.payments.values_list('pk', flat=True)), {p.pk for p in payments})
+        self.assertEqual(outstanding_balance(self.instructor.id, self.course.id), Decimal('0.00'))
+        self.assertEqual(outstanding_balance(self.instructor.id, self.other_course.id), Decimal('9.00'))
+        with self.assertRaises(PayoutError):
+            create_payout(self.instructor, self.course)
+    
+    def test_refund_after_payout_is_clawed_back(self):
+        """Test refunding a settled payment reduces the next payout"""
+        payment = self.capture(self.course, Decimal('100.00'), 'order_1')
+        create_payout(self.instructor, self.course)
+        self.refund(payment)
+        self.capture(self.course, Decimal('200.00'), 'order_2')
+        
+        self.assertEqual(create_payout(self.instructor, self.course).total_amount, Decimal('90.00'))
+    
+    def test_release_returns_payments_to_balance(self):
+        """Test a failed payout puts its amount and payments back"""
+        self.capture(self.course, Decimal('100.00'), 'order_1')
+        payout = create_payout(self.instructor, self.course)
+        
+        release_payout(payout)
+        
+        self.assertEqual(outstanding_balance(self.instructor.id, self.course.id), Decimal('90.00'))
+        self.assertFalse(Payment.objects.filter(payout__isnull=False).exists())
+        self.assertEqual(create_payout(self.instructor, self.course).total_amount, Decimal('90.00'))
+    
+    def test_rebuild_balances(self):
+        """Test balances rebuilt from payments and payouts match the running ones"""
+        self.capture(self.course, Decimal('100.00'), 'order_1')
+        create_payout(self.instructor, self.course)
+        self.capture(self.course, Decimal('50.00'), 'order_2')
+        self.capture(self.other_course, Decimal('20.00'), 'order_3')
+        
+        rebuild_balances()
+        
+        self.assertEqual(outstanding_balance(self.instructor.id, self.course.id), Decimal('45.00'))
+        self.assertEqual(outstanding_balance(self.instructor.id), Decimal('63.00'))
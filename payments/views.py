@@ -2,26 +2,22 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST, require_http_methods
 from django.http import JsonResponse
-from django.conf import settings
+from django.db.models import Sum
 from django.views.decorators.csrf import csrf_exempt
 from accounts.decorators import instructor_required
 from courses.models import Course, Enrollment
 from .models import Payment, Payout
 from .forms import PayoutForm
+from .webhooks import ingest_event, verify_signature
+from .gateway import get_gateway, GatewayUnavailable
+from .orders import OrderInProgress, open_or_create_payment
+from .ledger import course_totals, sync_payment, time_series
+from .payouts import PayoutError, create_payout as settle_payout, outstanding_balance
 from decimal import Decimal
-import razorpay
-import json
-import hmac
-import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(
-    auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
-)
-
 
 @login_required
 def make_payment(request, course_id):
@@ -34,49 +30,61 @@ def make_payment(request, course_id):
     
     if request.method == 'POST':
         try:
-            # Create Razorpay Order
             amount_in_paise = int(course.price * 100)  # Razorpay expects amount in paise
+            amount = Decimal(str(amount_in_paise / 100))
+            gateway = get_gateway()
             
-            order_data = {
-                'amount': amount_in_paise,
-                'currency': 'INR',
-                'receipt': f'course_{course.id}_student_{request.user.id}',
-                'notes': {
-                    'course_id': course.id,
-                    'student_id': request.user.id,
-                    'course_title': course.title,
-                }
-            }
-            
-            razorpay_order = razorpay_client.order.create(data=order_data)
-            
-            # Create Payment record in pending status
-            platform_fee = Decimal(str(amount_in_paise / 100)) * Decimal(str(course.platform_fee_percentage / 100))
-            instructor_payout = Decimal(str(amount_in_paise / 100)) - platform_fee
+            def create_payment():
+                # Create Razorpay Order
+                razorpay_order = gateway.create_order(
+                    amount_in_paise,
+                    'INR',
+                    f'course_{course.id}_student_{request.user.id}',
+                    notes={
+                        'course_id': course.id,
+                        'student_id': request.user.id,
+                        'course_title': course.title,
+                    }
+                )
+                
+                # Create Payment record in pending status
+                platform_fee = amount * Decimal(str(course.platform_fee_percentage / 100))
+                instructor_payout = amount - platform_fee
+                
+                return Payment.objects.create(
+                    student=request.user,
+                    instructor=course.instructor,
+                    course=course,
+                    amount=amount,
+                    platform_fee=platform_fee,
+                    instructor_payout=instructor_payout,
+                    status='created',
+                    razorpay_order_id=razorpay_order['id'],
+                    transaction_id=f"{razorpay_order['id']}_{request.user.id}"
+                )
             
-            payment = Payment.objects.create(
-                student=request.user,
-                instructor=course.instructor,
-                course=course,
-                amount=Decimal(str(amount_in_paise / 100)),
-                platform_fee=platform_fee,
-                instructor_payout=instructor_payout,
-                status='created',
-                razorpay_order_id=razorpay_order['id'],
-                transaction_id=f"{razorpay_order['id']}_{request.user.id}"
-            )
+            # Reuse the order from a double-click or retry instead of creating another
+            payment = open_or_create_payment(request.user.id, course.id, amount, create_payment)
             
             context = {
                 'course': course,
                 'payment': payment,
-                'razorpay_key_id': settings.RAZORPAY_KEY_ID,
-                'razorpay_order_id': razorpay_order['id'],
+                'razorpay_key_id': gateway.key_id,
+                'razorpay_order_id': payment.razorpay_order_id,
                 'amount': int(amount_in_paise),
                 'currency': 'INR',
                 'student_email': request.user.email,
                 'student_name': f"{request.user.first_name} {request.user.last_name}",
             }
             return render(request, 'payments/payment_form.html', context)
+        except OrderInProgress:
+            logger.warning(f"Order for course {course.id} still being created by another request")
+            return render(request, 'payments/payment_form.html', 
+                        {'error': 'Your payment is already being set up. Please try again in a moment.', 'course': course})
+        except GatewayUnavailable:
+            logger.warning("Payment gateway unavailable; order not created")
+            return render(request, 'payments/payment_form.html', 
+                        {'error': 'Payments are temporarily unavailable. Please try again shortly.', 'course': course})
         except Exception as e:
             logger.error(f"Error creating Razorpay order: {str(e)}")
             return render(request, 'payments/payment_form.html', 
@@ -99,14 +107,7 @@ def confirm_payment(request):
         course = get_object_or_404(Course, id=course_id)
         
         # Verify signature
-        signature_data = f'{razorpay_order_id}|{razorpay_payment_id}'
-        expected_signature = hmac.new(
-            settings.RAZORPAY_KEY_SECRET.encode(),
-            signature_data.encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if expected_signature != razorpay_signature:
+        if not get_gateway().verify_payment_signature(razorpay_order_id, razorpay_payment_id, razorpay_signature):
             logger.error(f"Signature mismatch for payment {razorpay_payment_id}")
             return JsonResponse({'status': 'failed', 'error': 'Payment verification failed'}, status=400)
         
@@ -118,7 +119,9 @@ def confirm_payment(request):
         payment.razorpay_signature = razorpay_signature
         payment.status = 'captured'
         payment.completed_at = __import__('django.utils.timezone', fromlist=['now']).now()
-        payment.save()
+        # Leave ledger_status to sync_payment, which may run concurrently from a webhook
+        payment.save(update_fields=['razorpay_payment_id', 'razorpay_signature', 'status', 'completed_at'])
+        sync_payment(payment.pk)
         
         # Create enrollment
         enrollment, created = Enrollment.objects.get_or_create(
@@ -140,45 +143,14 @@ def confirm_payment(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 def payment_webhook(request):
-    """Handle Razorpay webhook events"""
+    """Store Razorpay webhook events for the inbox worker (process_payment_webhooks)"""
+    if not verify_signature(request.body, request.headers.get('X-Razorpay-Signature')):
+        logger.warning("Webhook signature mismatch")
+        return JsonResponse({'status': 'error', 'message': 'Invalid signature'}, status=400)
+    
     try:
-        webhook_data = json.loads(request.body)
-        event = webhook_data.get('event')
-        payload = webhook_data.get('payload', {})
-        
-        if event == 'payment.authorized':
-            payment_data = payload.get('payment', {})
-            razorpay_payment_id = payment_data.get('id')
-            razorpay_order_id = payment_data.get('order_id')
-            
-            # Update payment status
-            payment = Payment.objects.filter(razorpay_order_id=razorpay_order_id).first()
-            if payment:
-                payment.razorpay_payment_id = razorpay_payment_id
-                payment.status = 'authorized'
-                payment.save()
-                logger.info(f"Payment authorized: {razorpay_payment_id}")
-        
-        elif event == 'payment.failed':
-            payment_data = payload.get('payment', {})
-            razorpay_order_id = payment_data.get('order_id')
-            
-            payment = Payment.objects.filter(razorpay_order_id=razorpay_order_id).first()
-            if payment:
-                payment.status = 'failed'
-                payment.save()
-                logger.warning(f"Payment failed: {razorpay_order_id}")
-        
-        elif event == 'refund.created':
-            refund_data = payload.get('refund', {})
-            razorpay_payment_id = refund_data.get('payment_id')
-            
-            payment = Payment.objects.filter(razorpay_payment_id=razorpay_payment_id).first()
-            if payment:
-                payment.status = 'refunded'
-                payment.save()
-                logger.info(f"Payment refunded: {razorpay_payment_id}")
-        
+        # Redeliveries of an event id are acknowledged without being stored again
+        ingest_event(request.body, request.headers.get('X-Razorpay-Event-Id'))
         return JsonResponse({'status': 'ok'})
     
     except Exception as e:
@@ -192,28 +164,29 @@ def course_payments(request, course_id):
     course = get_object_or_404(Course, id=course_id, instructor=request.user)
     payments = Payment.objects.filter(course=course, status__in=['captured', 'authorized']).order_by('-created_at')
     
-    total_revenue = sum(p.amount for p in payments)
-    total_platform_fee = sum(p.platform_fee for p in payments)
-    total_instructor_payout = sum(p.instructor_payout for p in payments)
+    # Totals come from the revenue ledger (captured payments net of refunds)
+    totals = course_totals(course.id)
     
     context = {
         'course': course,
         'payments': payments,
-        'total_revenue': total_revenue,
-        'total_platform_fee': total_platform_fee,
-        'total_instructor_payout': total_instructor_payout,
+        'total_revenue': totals['net_revenue'],
+        'total_platform_fee': totals['net_platform_fees'],
+        'total_instructor_payout': totals['net_earnings'],
+        'revenue_by_day': time_series(course_id=course.id),
     }
     return render(request, 'payments/course_payments.html', context)
 
 
-instructor_required
+@instructor_required
 def payouts_history(request):
     """View payout history (instructor only)"""
-    payouts = payouts.objects.filter(instructor=request.user).order_by('-created_at')
+    payouts = Payout.objects.filter(instructor=request.user).order_by('-created_at')
 
     context = {
         'payouts' : payouts,
-        'pending_amount' : sum(p.total_amount for p in payouts if p.status == 'pending'),
+        'pending_amount' : payouts.filter(status='pending').aggregate(total=Sum('total_amount'))['total'] or 0,
+        'outstanding_balance': outstanding_balance(request.user.id),
     }
     return render(request, 'payments/payout_history.html', context)
 
@@ -224,28 +197,18 @@ def create_payout(request, course_id):
     """Create payout request for a course (instructor only)"""
     course = get_object_or_404(Course, id=course_id, instructor=request.user)
     
-    # Calculate pending payouts for this course
-    payments = Payment.objects.filter(
-        course=course,
-        status__in=['captured', 'authorized'],
-        instructor=request.user
-    )
-    
-    # Calculate total that hasn't been paid out
-    total_amount = sum(p.instructor_payout for p in payments)
-    
-    if total_amount <= 0:
+    # Cheap pre-check; settle_payout re-reads the balance under a row lock
+    if outstanding_balance(request.user.id, course.id) <= 0:
         return JsonResponse({'error': 'No pending payments'}, status=400)
     
     form = PayoutForm(request.POST)
     if form.is_valid():
-        payout = form.save(commit=False)
-        payout.instructor = request.user
-        payout.course = course
-        payout.total_amount = total_amount
-        payout.save()
+        try:
+            payout = settle_payout(request.user, course, **form.cleaned_data)
+        except PayoutError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         logger.info(f"Payout created: {payout.id}")
-        return JsonResponse({'status': 'success', 'payout_id': payout.id})
+        return JsonResponse({'status': 'success', 'payout_id': payout.id, 'total_amount': str(payout.total_amount)})
     
     return JsonResponse({'error': 'Invalid form'}, status=400)
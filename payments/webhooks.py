@@ -0,0 +1,198 @@
+"""
+Razorpay webhook inbox.
+
+payment_webhook only verifies the signature and inserts the raw event into
+WebhookEvent, keyed by Razorpay's event id, so retried deliveries are
+dropped by the unique constraint and the response goes out after a single
+INSERT. `python manage.py process_payment_webhooks` drains the inbox in
+batches of PAYMENT_WEBHOOK_BATCH_SIZE, locking rows with
+select_for_update(skip_locked=True) so several workers can share it.
+
+Each event becomes one conditional update() on Payment that only matches
+rows in a status the event may move forward from (see ALLOWED_FROM), so a
+late or repeated 'payment.authorized' never overwrites 'captured' or
+'refunded'. Payment events are per attempt while a Payment row is per
+order: a later attempt may succeed after a failed one, and a failure only
+applies to the attempt the row already tracks (or when it tracks none). Payments that changed are synced to the revenue ledger. The lag
+between receipt and processing is stored per event and the latest batch's
+lag is kept in the cache for monitoring.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Payment, WebhookEvent
+from .ledger import sync_payment
+import hashlib
+import hmac
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+LAG_CACHE_KEY = 'payments:webhook_lag'
+
+# Target status -> statuses a payment may move to it from
+# (a payment swept to 'expired', or whose earlier attempt failed, can still be paid)
+ALLOWED_FROM = {
+    'authorized': ('pending', 'created', 'expired', 'failed'),
+    'captured': ('pending', 'created', 'authorized', 'expired', 'failed'),
+    'failed': ('pending', 'created', 'authorized', 'expired'),
+    'refunded': ('authorized', 'captured'),
+}
+
+
+def verify_signature(body, signature):
+    """Check X-Razorpay-Signature when RAZORPAY_WEBHOOK_SECRET is configured."""
+    secret = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', '')
+    if not secret:
+        return True
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or '')
+
+
+def ingest_event(body, event_id=None):
+    """
+    Store a raw webhook body in the inbox.
+
+    Args:
+        body (bytes): Request body
+        event_id (str): X-Razorpay-Event-Id; a hash of the body when missing
+
+    Returns:
+        bool: Whether the event was new (False for a redelivery)
+    """
+    data = json.loads(body)
+    event_id = event_id or hashlib.sha256(body).hexdigest()
+    try:
+        with transaction.atomic():
+            WebhookEvent.objects.create(event_id=event_id, event=data.get('event', ''), payload=data)
+    except IntegrityError:
+        logger.debug(f"Duplicate webhook event {event_id}")
+        return False
+    return True
+
+
+def _entity(payload, name):
+    return payload.get('payload', {}).get(name, {}).get('entity') or payload.get('payload', {}).get(name, {})
+
+
+def transition_for(event):
+    """
+    Map an event to (lookup filter, target status, extra fields, extra
+    condition), or None when the event does not change a payment.
+    """
+    payload = event.payload
+    if event.event in ('payment.authorized', 'payment.captured', 'payment.failed'):
+        payment = _entity(payload, 'payment')
+        order_id = payment.get('order_id')
+        if not order_id:
+            return None
+        status = event.event.split('.', 1)[1]
+        fields = {}
+        if status != 'failed' and payment.get('id'):
+            fields['razorpay_payment_id'] = payment['id']
+        if status == 'captured':
+            fields['completed_at'] = timezone.now()
+        condition = Q()
+        if status == 'failed' and payment.get('id'):
+            # A late failure of an earlier attempt must not undo a later one
+            condition = Q(razorpay_payment_id__isnull=True) | Q(razorpay_payment_id=payment['id'])
+        return {'razorpay_order_id': order_id}, status, fields, condition
+
+    if event.event == 'refund.created':
+        payment_id = _entity(payload, 'refund').get('payment_id')
+        if not payment_id:
+            return None
+        return {'razorpay_payment_id': payment_id}, 'refunded', {'refunded_at': timezone.now()}, Q()
+
+    return None
+
+
+def apply_event(event):
+    """
+    Apply one event with a single conditional update.
+
+    Returns:
+        bool: Whether a payment changed status
+    """
+    transition = transition_for(event)
+    if transition is None:
+        return False
+    lookup, status, fields, condition = transition
+    payment_id = Payment.objects.filter(**lookup).values_list('pk', flat=True).first()
+    if payment_id is None:
+        return False
+    updated = (
+        Payment.objects.filter(condition, pk=payment_id, status__in=ALLOWED_FROM[status])
+        .update(status=status, **fields)
+    )
+    if updated:
+        logger.info(f"Payment {status} via webhook {event.event_id}: {lookup}")
+        sync_payment(payment_id)
+    return bool(updated)
+
+
+def process_batch(limit=None):
+    """
+    Claim and apply up to `limit` pending events in one transaction.
+
+    Returns:
+        int: Number of events handled
+    """
+    limit = limit or getattr(settings, 'PAYMENT_WEBHOOK_BATCH_SIZE', 100)
+    max_attempts = getattr(settings, 'PAYMENT_WEBHOOK_MAX_ATTEMPTS', 5)
+
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('received_at', 'pk')[:limit]
+        )
+        if not events:
+            return 0
+
+        now = timezone.now()
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    changed = apply_event(event)
+                event.status = 'processed' if changed else 'ignored'
+                event.error = None
+                event.processed_at = now
+            except Exception as e:
+                logger.exception(f"Webhook event {event.event_id} failed")
+                event.error = str(e)
+                if event.attempts >= max_attempts:
+                    event.status = 'failed'
+                    event.processed_at = now
+
+        WebhookEvent.objects.bulk_update(events, ['status', 'attempts', 'error', 'processed_at'])
+
+    record_lag(events, now)
+    return len(events)
+
+
+def record_lag(events, processed_at):
+    """Keep the latest batch's receipt-to-processing lag in the cache."""
+    lags = [(processed_at - event.received_at).total_seconds() for event in events]
+    stats = {
+        'events': len(events),
+        'max_seconds': max(lags),
+        'avg_seconds': sum(lags) / len(lags),
+        'processed_at': processed_at.isoformat(),
+    }
+    cache.set(LAG_CACHE_KEY, stats, timeout=None)
+    logger.debug(f"Processed {len(events)} webhook events, max lag {stats['max_seconds']:.1f}s")
+    return stats
+
+
+def inbox_backlog():
+    """Pending event count and age in seconds of the oldest one."""
+    oldest = WebhookEvent.objects.filter(status='pending').order_by('received_at').values_list('received_at', flat=True).first()
+    return {
+        'pending': WebhookEvent.objects.filter(status='pending').count(),
+        'oldest_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0,
+    }
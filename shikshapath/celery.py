@@ -0,0 +1,15 @@
+"""
+Celery application for background jobs.
+
+Run a worker with:
+    celery -A shikshapath worker -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shikshapath.settings')
+
+app = Celery('shikshapath')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,243 @@
+"""
+Per-request SQL, cache and latency instrumentation.
+
+RequestMetricsMiddleware wraps every database connection with
+connection.execute_wrapper() for the duration of a request and counts the
+queries it runs and the time spent in them. The Instrumented*Cache backends
+count cache hits and misses for the same request. When the view returns:
+
+- the numbers are sent back in a Server-Timing header (REQUEST_METRICS_SERVER_TIMING),
+- they are added to per-view totals served in Prometheus text format by
+  metrics_view (admins, or a bearer token matching METRICS_TOKEN),
+- a warning is logged when the view ran more queries than its budget
+  (REQUEST_QUERY_BUDGETS[view name], else REQUEST_QUERY_BUDGET).
+
+Totals are kept per process; each gunicorn worker reports its own series,
+labelled with its pid, so sum() them in queries.
+"""
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from collections import defaultdict
+import contextvars
+import hmac
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_MISSING = object()
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """SQL and cache activity of one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current_stats():
+    """Stats of the request being handled on this thread, or None."""
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_seconds += time.perf_counter() - started
+
+
+class InstrumentedCacheMixin:
+    """Counts hits and misses of get() and get_many() for the current request."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        stats = _current.get()
+        if stats is not None:
+            if value is _MISSING:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        stats = _current.get()
+        # BaseCache.get_many calls get() per key, which has already counted them
+        if stats is not None and super(InstrumentedCacheMixin, type(self)).get_many is not BaseCache.get_many:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
+
+
+class MetricsRegistry:
+    """Thread-safe per-view request totals and latency histogram."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._views = defaultdict(lambda: {
+                'requests': 0,
+                'seconds': 0.0,
+                'buckets': [0] * len(LATENCY_BUCKETS),
+                'queries': 0,
+                'sql_seconds': 0.0,
+                'cache_hits': 0,
+                'cache_misses': 0,
+                'over_budget': 0,
+            })
+
+    def record(self, view, seconds, stats, over_budget=False):
+        with self._lock:
+            totals = self._views[view]
+            totals['requests'] += 1
+            totals['seconds'] += seconds
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    totals['buckets'][index] += 1
+            totals['queries'] += stats.queries
+            totals['sql_seconds'] += stats.sql_seconds
+            totals['cache_hits'] += stats.cache_hits
+            totals['cache_misses'] += stats.cache_misses
+            totals['over_budget'] += int(over_budget)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: view name -> totals (requests, seconds, buckets, queries,
+            sql_seconds, cache_hits, cache_misses, over_budget)
+        """
+        with self._lock:
+            return {view: dict(totals, buckets=list(totals['buckets'])) for view, totals in self._views.items()}
+
+
+registry = MetricsRegistry()
+
+
+def query_budget(view):
+    budgets = getattr(settings, 'REQUEST_QUERY_BUDGETS', {})
+    return budgets.get(view, getattr(settings, 'REQUEST_QUERY_BUDGET', 50))
+
+
+def server_timing(stats, seconds):
+    return (
+        f'sql;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries", '
+        f'cache;desc="{stats.cache_hits} hits {stats.cache_misses} misses", '
+        f'total;dur={seconds * 1000:.1f}'
+    )
+
+
+class RequestMetricsMiddleware:
+    """Measure SQL, cache and latency per request (see module docstring)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        seconds = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        budget = query_budget(view)
+        over_budget = stats.queries > budget
+        if over_budget:
+            logger.warning(
+                f"{view} ran {stats.queries} queries (budget {budget}) "
+                f"in {seconds * 1000:.0f}ms, {stats.sql_seconds * 1000:.0f}ms in SQL: {request.path}"
+            )
+        registry.record(view, seconds, stats, over_budget)
+
+        if getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = server_timing(stats, seconds)
+        return response
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(snapshot):
+    """Per-view totals in Prometheus text exposition format."""
+    pid = os.getpid()
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(samples)
+
+    def labels(view, **extra):
+        pairs = [f'view="{_escape(view)}"', f'pid="{pid}"'] + [f'{key}="{value}"' for key, value in extra.items()]
+        return '{' + ','.join(pairs) + '}'
+
+    views = sorted(snapshot.items())
+    histogram = []
+    for view, totals in views:
+        for bound, count in zip(LATENCY_BUCKETS, totals['buckets']):
+            histogram.append(f'shikshapath_request_duration_seconds_bucket{labels(view, le=bound)} {count}')
+        histogram.append(f'shikshapath_request_duration_seconds_bucket{labels(view, le="+Inf")} {totals["requests"]}')
+        histogram.append(f'shikshapath_request_duration_seconds_sum{labels(view)} {totals["seconds"]:.6f}')
+        histogram.append(f'shikshapath_request_duration_seconds_count{labels(view)} {totals["requests"]}')
+    family('shikshapath_request_duration_seconds', 'histogram', 'Request latency by view', histogram)
+
+    for name, key, help_text in (
+        ('shikshapath_sql_queries_total', 'queries', 'SQL queries run by view'),
+        ('shikshapath_sql_duration_seconds_total', 'sql_seconds', 'Time spent in SQL by view'),
+        ('shikshapath_cache_hits_total', 'cache_hits', 'Cache hits by view'),
+        ('shikshapath_cache_misses_total', 'cache_misses', 'Cache misses by view'),
+        ('shikshapath_query_budget_exceeded_total', 'over_budget', 'Requests over their query budget by view'),
+    ):
+        family(name, 'counter', help_text, [f'{name}{labels(view)} {totals[key]}' for view, totals in views])
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for admins or holders of METRICS_TOKEN."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.headers.get('Authorization', '')
+    authorized = bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+    user = getattr(request, 'user', None)
+    if not authorized and not (user is not None and user.is_authenticated and user.role == 'admin'):
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    return HttpResponse(render_prometheus(registry.snapshot()), content_type='text/plain; version=0.0.4')
@@ -54,6 +54,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'shikshapath.instrumentation.RequestMetricsMiddleware',  # SQL/cache/latency per view, see instrumentation.py
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Static files caching in production
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -167,6 +168,53 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Razorpay Configuration
 RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID', '')
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET', '')
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')  # webhook signatures are verified when set
+PAYMENT_WEBHOOK_BATCH_SIZE = int(os.getenv('PAYMENT_WEBHOOK_BATCH_SIZE', '100'))  # inbox events applied per transaction
+PAYMENT_WEBHOOK_MAX_ATTEMPTS = int(os.getenv('PAYMENT_WEBHOOK_MAX_ATTEMPTS', '5'))
+
+# Payment gateway client ('fake' answers in-process for offline load tests)
+PAYMENT_GATEWAY = os.getenv('PAYMENT_GATEWAY', 'razorpay')
+PAYMENT_GATEWAY_POOL_SIZE = int(os.getenv('PAYMENT_GATEWAY_POOL_SIZE', '10'))  # pooled connections per process
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = float(os.getenv('PAYMENT_GATEWAY_CONNECT_TIMEOUT', '3'))  # seconds
+PAYMENT_GATEWAY_TIMEOUT = float(os.getenv('PAYMENT_GATEWAY_TIMEOUT', '10'))  # seconds to wait for a response
+PAYMENT_GATEWAY_RETRIES = int(os.getenv('PAYMENT_GATEWAY_RETRIES', '2'))
+PAYMENT_GATEWAY_BACKOFF = float(os.getenv('PAYMENT_GATEWAY_BACKOFF', '0.2'))  # seconds, doubled per retry and jittered
+PAYMENT_GATEWAY_BREAKER_THRESHOLD = int(os.getenv('PAYMENT_GATEWAY_BREAKER_THRESHOLD', '5'))  # failures in a row
+PAYMENT_GATEWAY_BREAKER_RESET = int(os.getenv('PAYMENT_GATEWAY_BREAKER_RESET', '30'))  # seconds the breaker stays open
+PAYMENT_FAKE_GATEWAY_LATENCY = float(os.getenv('PAYMENT_FAKE_GATEWAY_LATENCY', '0'))  # seconds per fake call
+PAYMENT_ORDER_TTL = int(os.getenv('PAYMENT_ORDER_TTL', '900'))  # seconds an unpaid order is reused before it is expired
+PAYMENT_ORDER_LOCK_WAIT = float(os.getenv('PAYMENT_ORDER_LOCK_WAIT', '10'))  # seconds a concurrent request waits for the order being created
+PAYMENT_ORDER_LOCK_TIMEOUT = int(os.getenv('PAYMENT_ORDER_LOCK_TIMEOUT', '60'))  # seconds before a lock left by a dead request expires
+PAYOUT_SETTLE_BATCH_SIZE = int(os.getenv('PAYOUT_SETTLE_BATCH_SIZE', '1000'))  # payments linked to a payout per statement
+ADMIN_EXPORT_CHUNK_SIZE = int(os.getenv('ADMIN_EXPORT_CHUNK_SIZE', '2000'))  # rows fetched per round trip by admin exports
+ADMIN_METRICS_TTL = int(os.getenv('ADMIN_METRICS_TTL', '60'))  # seconds a dashboard metrics snapshot is cached
+ADMIN_METRICS_REFRESH_AFTER = int(os.getenv('ADMIN_METRICS_REFRESH_AFTER', '45'))  # snapshot age that triggers a background refresh
+ADMIN_METRICS_BACKGROUND_REFRESH = os.getenv('ADMIN_METRICS_BACKGROUND_REFRESH', 'True') == 'True'
+ADMIN_LIST_PAGE_SIZE = int(os.getenv('ADMIN_LIST_PAGE_SIZE', '50'))
+ADMIN_LIST_EXACT_COUNT_BELOW = int(os.getenv('ADMIN_LIST_EXACT_COUNT_BELOW', '10000'))  # PostgreSQL estimates above this are shown as is
+
+# Audit log (see accounts/audit.py)
+AUDIT_ASYNC = os.getenv('AUDIT_ASYNC', 'True') == 'True'  # buffer events and write them in bulk
+AUDIT_FLUSH_SIZE = int(os.getenv('AUDIT_FLUSH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL = int(os.getenv('AUDIT_FLUSH_INTERVAL', '5'))  # seconds
+AUDIT_FLUSH_THREAD = os.getenv('AUDIT_FLUSH_THREAD', 'True') == 'True'
+AUDIT_FLUSH_RETRIES = int(os.getenv('AUDIT_FLUSH_RETRIES', '3'))  # failed flushes before an event is dropped
+AUDIT_BUFFER_MAX_EVENTS = int(os.getenv('AUDIT_BUFFER_MAX_EVENTS', '10000'))  # oldest events are dropped beyond this
+AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', '12'))
+AUDIT_PARTITIONS_AHEAD = int(os.getenv('AUDIT_PARTITIONS_AHEAD', '2'))  # months, PostgreSQL only
+AUDIT_ARCHIVE_PREFIX = os.getenv('AUDIT_ARCHIVE_PREFIX', 'audit_archive/')  # default storage path for archived months
+
+# Bulk admin actions (see admin_panel/bulk.py)
+ADMIN_BULK_CHUNK_SIZE = int(os.getenv('ADMIN_BULK_CHUNK_SIZE', '500'))  # rows per update() and audit bulk_create
+ADMIN_BULK_INLINE_LIMIT = int(os.getenv('ADMIN_BULK_INLINE_LIMIT', '500'))  # larger selections run as a background job
+ADMIN_BULK_MAX_IDS = int(os.getenv('ADMIN_BULK_MAX_IDS', '10000'))
+ADMIN_BULK_JOB_STALE_AFTER = int(os.getenv('ADMIN_BULK_JOB_STALE_AFTER', '300'))  # seconds without progress before a job is taken over
+
+# Request instrumentation (see shikshapath/instrumentation.py)
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', '50'))  # queries per request before a warning is logged
+REQUEST_QUERY_BUDGETS = {}  # per view name overrides, e.g. {'courses:course_detail': 20}
+REQUEST_METRICS_SERVER_TIMING = os.getenv('REQUEST_METRICS_SERVER_TIMING', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # bearer token for scraping /internal/metrics
 
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.CustomUser'
@@ -222,6 +270,60 @@ if USE_S3:
     DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
     MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/media/'
 
+# Course catalog (home page) configuration
+CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', '24'))
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '300'))  # seconds
+
+# Course search configuration
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+SEARCH_MAX_PAGE = int(os.getenv('SEARCH_MAX_PAGE', '1000'))  # deeper pages return the last allowed page
+
+# Video streaming configuration
+# 'direct' lets the WSGI server sendfile local videos; 'x-accel-redirect' (nginx)
+# or 'x-sendfile' (Apache/lighttpd) hands the transfer to a fronting proxy
+VIDEO_STREAM_MODE = os.getenv('VIDEO_STREAM_MODE', 'direct')
+VIDEO_STREAM_ACCEL_PREFIX = os.getenv('VIDEO_STREAM_ACCEL_PREFIX', '/protected-media/')
+VIDEO_STREAM_BLOCK_SIZE = int(os.getenv('VIDEO_STREAM_BLOCK_SIZE', str(1024 * 1024)))  # bytes
+
+# S3 presigned URLs for video playback
+AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_ENDPOINT_URL', '')  # e.g. http://localhost:9000 for MinIO
+S3_PRESIGNED_URL_EXPIRY = int(os.getenv('S3_PRESIGNED_URL_EXPIRY', '3600'))  # seconds
+S3_PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv('S3_PRESIGNED_URL_REFRESH_MARGIN', '300'))  # re-sign this close to expiry
+S3_PRESIGNED_URL_CACHE_SIZE = int(os.getenv('S3_PRESIGNED_URL_CACHE_SIZE', '10000'))
+S3_URL_USER_BUCKETS = int(os.getenv('S3_URL_USER_BUCKETS', '16'))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '20'))
+
+# Video progress heartbeats are buffered per process and written in bulk
+VIDEO_PROGRESS_FLUSH_SIZE = int(os.getenv('VIDEO_PROGRESS_FLUSH_SIZE', '500'))  # entries
+VIDEO_PROGRESS_FLUSH_INTERVAL = int(os.getenv('VIDEO_PROGRESS_FLUSH_INTERVAL', '10'))  # seconds
+VIDEO_PROGRESS_FLUSH_THREAD = os.getenv('VIDEO_PROGRESS_FLUSH_THREAD', 'True') == 'True'
+
+# Background transcoding worker (python manage.py transcode_videos)
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+TRANSCODE_CONCURRENCY = int(os.getenv('TRANSCODE_CONCURRENCY', '2'))
+TRANSCODE_MAX_ATTEMPTS = int(os.getenv('TRANSCODE_MAX_ATTEMPTS', '3'))
+TRANSCODE_RETRY_BACKOFF = int(os.getenv('TRANSCODE_RETRY_BACKOFF', '60'))  # seconds, doubled per attempt
+TRANSCODE_RETRY_BACKOFF_MAX = int(os.getenv('TRANSCODE_RETRY_BACKOFF_MAX', '3600'))
+TRANSCODE_JOB_TIMEOUT = int(os.getenv('TRANSCODE_JOB_TIMEOUT', '3600'))  # seconds per ffmpeg run
+TRANSCODE_JOB_LEASE = int(os.getenv('TRANSCODE_JOB_LEASE', '300'))  # seconds, renewed on every worker poll
+TRANSCODE_SEGMENT_SECONDS = int(os.getenv('TRANSCODE_SEGMENT_SECONDS', '6'))
+TRANSCODE_DASH = os.getenv('TRANSCODE_DASH', 'False') == 'True'  # HLS is always produced
+
+# HLS/DASH segment serving
+VIDEO_ACCESS_CACHE_TTL = int(os.getenv('VIDEO_ACCESS_CACHE_TTL', '300'))  # seconds an enrollment check is reused per session
+# `public` only takes effect for S3 segments, which are fetched through signed, expiring URLs;
+# segments served by the app are always private since their URLs are predictable.
+VIDEO_SEGMENT_CACHE_CONTROL = os.getenv('VIDEO_SEGMENT_CACHE_CONTROL', 'private, max-age=31536000, immutable')
+VIDEO_MANIFEST_CACHE_CONTROL = os.getenv('VIDEO_MANIFEST_CACHE_CONTROL', 'private, max-age=3600')
+
+# Chunked, resumable uploads of videos and course resources
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', str(BASE_DIR / 'tmp' / 'chunked_uploads'))  # local mode only
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv('CHUNKED_UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))  # bytes, at least 5 MB in S3 mode
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', str(10 * 1024 ** 3)))  # bytes
+CHUNKED_UPLOAD_DIRECT_TO_S3 = os.getenv('CHUNKED_UPLOAD_DIRECT_TO_S3', 'True') == 'True'  # video chunks become S3 multipart parts when USE_S3
+CHUNKED_UPLOAD_TTL = int(os.getenv('CHUNKED_UPLOAD_TTL', str(60 * 60 * 24)))  # seconds before an idle upload is purged
+
 # Platform Fee Configuration
 PLATFORM_FEE_PERCENT = float(os.getenv('PLATFORM_FEE_PERCENT', '10'))
 
@@ -233,6 +335,20 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# 'celery' sends video generation to the Celery broker; 'database' leaves
+# pending rows for `python manage.py process_video_generation`
+VIDEO_GENERATION_QUEUE = os.getenv('VIDEO_GENERATION_QUEUE', 'database')
+VIDEO_GENERATION_TIMEOUT = int(os.getenv('VIDEO_GENERATION_TIMEOUT', '3600'))  # seconds before a stuck task is failed
+VIDEO_RENDER_CONCURRENCY = int(os.getenv('VIDEO_RENDER_CONCURRENCY', '0'))  # 0 = one render per CPU core
+VIDEO_RENDER_TIMEOUT = int(os.getenv('VIDEO_RENDER_TIMEOUT', '1800'))  # seconds before a render process is killed
+
+# Text extraction from video generation uploads
+VIDEO_EXTRACT_MAX_CHARS = int(os.getenv('VIDEO_EXTRACT_MAX_CHARS', '200000'))
+VIDEO_EXTRACT_CACHE_TIMEOUT = int(os.getenv('VIDEO_EXTRACT_CACHE_TIMEOUT', str(60 * 60 * 24)))
+VIDEO_EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv('VIDEO_EXTRACT_PARALLEL_MIN_PAGES', '40'))  # smaller PDFs are read in-process
+VIDEO_EXTRACT_PAGES_PER_WORKER = int(os.getenv('VIDEO_EXTRACT_PAGES_PER_WORKER', '10'))
+VIDEO_EXTRACT_WORKERS = int(os.getenv('VIDEO_EXTRACT_WORKERS', '0'))  # 0 = one per CPU core
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -282,7 +398,7 @@ if os.environ.get('DATABASE_URL'):
 # Caching Configuration
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'shikshapath.instrumentation.InstrumentedLocMemCache',  # LocMemCache counting hits/misses per request
         'LOCATION': 'shikshapath-cache',
         'TIMEOUT': 300,  # 5 minutes default cache timeout
         'OPTIONS': {
@@ -0,0 +1,167 @@
+"""
+Bulk factories for seeding realistic data volumes in tests.
+
+Rows are inserted with bulk_create, which skips model signals, so seed()
+finishes by rebuilding the derived tables (course stats, search documents,
+enrollment progress, revenue ledger and payout balances) with the same
+functions the management commands use.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from courses.models import Course, CourseRating, Enrollment
+from courses.progress import rebuild_enrollment_progress
+from courses.search import rebuild_search_index
+from courses.stats import rebuild_course_stats
+from payments.ledger import rebuild_ledger
+from payments.models import Payment
+from payments.payouts import rebuild_balances
+from videos.models import Video, VideoProgress
+from datetime import timedelta
+from decimal import Decimal
+import random
+
+User = get_user_model()
+
+PASSWORD = 'testpass123'
+
+# Hashing once keeps seeding thousands of users fast
+_password_hash = None
+
+
+def _password():
+    global _password_hash
+    if _password_hash is None:
+        _password_hash = make_password(PASSWORD)
+    return _password_hash
+
+
+def make_users(count, role, prefix=None):
+    prefix = prefix or role
+    User.objects.bulk_create(
+        [
+            User(username=f'{prefix}{index}@example.com', email=f'{prefix}{index}@example.com',
+                 first_name=prefix.title(), last_name=str(index), password=_password(), role=role)
+            for index in range(count)
+        ],
+        batch_size=1000,
+    )
+    return list(User.objects.filter(username__startswith=prefix, role=role).order_by('pk'))
+
+
+def make_courses(instructors, per_instructor, price=Decimal('499.00')):
+    now = timezone.now()
+    Course.objects.bulk_create(
+        [
+            Course(instructor=instructor, title=f'{instructor.last_name} Course {index}',
+                   description='Seeded course for query budget tests', price=price, status='published',
+                   created_at=now - timedelta(minutes=index))
+            for instructor in instructors
+            for index in range(per_instructor)
+        ],
+        batch_size=1000,
+    )
+    return list(Course.objects.filter(instructor__in=instructors).order_by('pk'))
+
+
+def make_videos(courses, per_course):
+    Video.objects.bulk_create(
+        [
+            Video(course=course, title=f'Lesson {index}', video_file=f'videos/seed_{course.pk}_{index}.mp4',
+                  duration=600, order=index, status='ready')
+            for course in courses
+            for index in range(per_course)
+        ],
+        batch_size=1000,
+    )
+    return list(Video.objects.filter(course__in=courses).order_by('pk'))
+
+
+def make_enrollments(students, courses, per_student, rng):
+    pairs = {(student.pk, course.pk) for student in students for course in rng.sample(courses, min(per_student, len(courses)))}
+    Enrollment.objects.bulk_create(
+        [Enrollment(student_id=student_id, course_id=course_id) for student_id, course_id in pairs],
+        batch_size=1000,
+    )
+    return pairs
+
+
+def make_ratings(pairs, share, rng):
+    CourseRating.objects.bulk_create(
+        [
+            CourseRating(student_id=student_id, course_id=course_id, rating=rng.randint(1, 5), review='Seeded')
+            for student_id, course_id in pairs
+            if rng.random() < share
+        ],
+        batch_size=1000,
+    )
+
+
+def make_progress(pairs, videos_by_course, share, rng):
+    VideoProgress.objects.bulk_create(
+        [
+            VideoProgress(student_id=student_id, video=video, watched_duration=rng.randint(0, video.duration))
+            for student_id, course_id in pairs
+            if rng.random() < share
+            for video in videos_by_course.get(course_id, [])[:2]
+        ],
+        batch_size=1000,
+    )
+
+
+def make_payments(pairs, courses_by_id, share, rng):
+    now = timezone.now()
+    payments = []
+    for index, (student_id, course_id) in enumerate(sorted(pairs)):
+        if rng.random() >= share:
+            continue
+        course = courses_by_id[course_id]
+        fee = (course.price * Decimal('0.10')).quantize(Decimal('0.01'))
+        completed_at = now - timedelta(days=rng.randint(0, 90))
+        payments.append(Payment(
+            student_id=student_id, instructor_id=course.instructor_id, course_id=course_id,
+            amount=course.price, platform_fee=fee, instructor_payout=course.price - fee,
+            status='captured', razorpay_order_id=f'order_seed{index}', razorpay_payment_id=f'pay_seed{index}',
+            completed_at=completed_at,
+        ))
+    Payment.objects.bulk_create(payments, batch_size=1000)
+    return len(payments)
+
+
+def seed(instructors=20, courses_per_instructor=50, students=500, enrollments_per_student=10,
+         videos_per_course=5, rating_share=0.4, paid_share=0.6, progress_share=0.3, random_seed=42):
+    """
+    Seed instructors, courses, videos, students, enrollments, ratings,
+    progress and captured payments, then rebuild every derived table.
+
+    Returns:
+        dict: The seeded instructors, courses and students plus an admin
+    """
+    rng = random.Random(random_seed)
+    admin = make_users(1, 'admin')[0]
+    instructor_users = make_users(instructors, 'instructor')
+    student_users = make_users(students, 'student')
+    courses = make_courses(instructor_users, courses_per_instructor)
+    videos = make_videos(courses, videos_per_course)
+
+    videos_by_course = {}
+    for video in videos:
+        videos_by_course.setdefault(video.course_id, []).append(video)
+
+    pairs = make_enrollments(student_users, courses, enrollments_per_student, rng)
+    make_ratings(pairs, rating_share, rng)
+    make_progress(pairs, videos_by_course, progress_share, rng)
+    make_payments(pairs, {course.pk: course for course in courses}, paid_share, rng)
+
+    rebuild_course_stats()
+    rebuild_search_index()
+    rebuild_enrollment_progress()
+    rebuild_ledger()
+    rebuild_balances()
+    return {
+        'admin': admin,
+        'instructors': instructor_users,
+        'courses': courses,
+        'students': student_users,
+        'enrolled': sorted(pairs),
+    }
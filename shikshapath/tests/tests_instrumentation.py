@@ -0,0 +1,95 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from unittest.mock import patch
+from shikshapath.instrumentation import InstrumentedRedisCache, RequestStats, _current, registry
+
+User = get_user_model()
+
+
+class RequestMetricsTestCase(TestCase):
+    """Test per-request SQL, cache and latency instrumentation"""
+
+    def setUp(self):
+        """Start from empty caches and totals"""
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_server_timing_header(self):
+        """Test the response reports queries, cache activity and latency"""
+        response = self.client.get(reverse('home'))
+
+        timing = response['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('queries"', timing)
+        self.assertIn('cache;desc=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_totals_per_view(self):
+        """Test requests are aggregated by view name with cache hits and misses"""
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+
+        totals = registry.snapshot()['home']
+        self.assertEqual(totals['requests'], 2)
+        self.assertGreater(totals['queries'], 0)
+        self.assertGreater(totals['cache_misses'], 0)
+        self.assertGreater(totals['cache_hits'], 0)
+        self.assertEqual(totals['buckets'][-1], 2)
+
+    @override_settings(REQUEST_QUERY_BUDGET=0)
+    def test_budget_warning(self):
+        """Test a view over its query budget logs a warning"""
+        with self.assertLogs('shikshapath.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('home'))
+        self.assertIn('home ran', logs.output[0])
+        self.assertEqual(registry.snapshot()['home']['over_budget'], 1)
+
+    @override_settings(REQUEST_QUERY_BUDGET=0, REQUEST_QUERY_BUDGETS={'home': 1000})
+    def test_per_view_budget(self):
+        """Test per-view budgets override the default"""
+        self.client.get(reverse('home'))
+        self.assertEqual(registry.snapshot()['home']['over_budget'], 0)
+
+    def test_get_many_counts_each_key_once(self):
+        """Test get_many on a backend without its own get_many is not counted twice"""
+        cache.set('a', 1)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            self.assertEqual(cache.get_many(['a', 'b']), {'a': 1})
+        finally:
+            _current.reset(token)
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (1, 1))
+
+    def test_get_many_counted_when_backend_overrides_it(self):
+        """Test a backend with its own get_many (Redis) is counted there"""
+        backend = InstrumentedRedisCache('redis://localhost:6379/0', {})
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with patch('django.core.cache.backends.redis.RedisCache.get_many', return_value={'a': 1}):
+                backend.get_many(['a', 'b'])
+        finally:
+            _current.reset(token)
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (1, 1))
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_endpoint(self):
+        """Test the Prometheus endpoint requires an admin or the token"""
+        self.client.get(reverse('home'))
+        url = reverse('metrics')
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE shikshapath_request_duration_seconds histogram', body)
+        self.assertIn('shikshapath_sql_queries_total{view="home"', body)
+
+        User.objects.create_user(username='admin@example.com', email='admin@example.com', password='testpass123', role='admin')
+        self.client.login(username='admin@example.com', password='testpass123')
+        self.assertEqual(self.client.get(url).status_code, 200)
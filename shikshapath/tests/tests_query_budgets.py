@@ -0,0 +1,225 @@
+"""
+Query-count and latency budgets for every page, against seeded data.
+
+The database is seeded once with factories.seed() (scaled by
+QUERY_BUDGET_SCALE), then each view in CASES is requested
+QUERY_BUDGET_RUNS times, the first time with an empty cache. A view fails
+when any request runs more queries than its budget, or when the median
+latency is over QUERY_BUDGET_LATENCY_MS. Budgets are fixed numbers, so a
+query count that grows with the data (an N+1) fails as soon as it exceeds
+one.
+
+Set QUERY_BUDGET_REPORT to a file path to write the measurements as JSON.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from videos.models import Video
+from videos.progress import progress_buffer
+from shikshapath.tests import factories
+from statistics import median
+import json
+import os
+import time
+
+SCALE = float(os.getenv('QUERY_BUDGET_SCALE', '1'))
+RUNS = int(os.getenv('QUERY_BUDGET_RUNS', '5'))
+LATENCY_MS = float(os.getenv('QUERY_BUDGET_LATENCY_MS', '500'))
+REPORT = os.getenv('QUERY_BUDGET_REPORT', '')
+
+# (url name, url argument, client, method, max queries)
+CASES = {
+    'courses': [
+        ('home', None, 'anonymous', 'get', 2),
+        ('courses:search', None, 'anonymous', 'get', 4),
+        ('courses:course_detail', 'course', 'anonymous', 'get', 4),
+        ('courses:course_detail', 'enrolled_course', 'student', 'get', 9),
+        ('courses:my_courses', None, 'student', 'get', 4),
+        ('courses:create_course', None, 'instructor', 'get', 3),
+        ('courses:edit_course', 'course', 'instructor', 'get', 5),
+        ('courses:generate_referral', 'course', 'instructor', 'get', 5),
+    ],
+    'videos': [
+        ('videos:watch_video', 'video', 'student', 'get', 11),
+        ('videos:save_progress', 'video', 'student', 'post', 13),  # first heartbeat writes through
+        ('videos:upload_video', 'course', 'instructor', 'get', 4),
+    ],
+    'payments': [
+        ('payments:make_payment', 'course', 'student', 'get', 5),
+        ('payments:course_payments', 'course', 'instructor', 'get', 6),
+        ('payments:payout_history', None, 'instructor', 'get', 5),
+    ],
+    'accounts': [
+        ('accounts:login', None, 'anonymous', 'get', 1),
+        ('accounts:register', None, 'anonymous', 'get', 1),
+        ('accounts:profile', None, 'student', 'get', 3),
+        ('accounts:profile_edit', None, 'student', 'get', 3),
+        ('accounts:get_themes_api', None, 'student', 'get', 3),
+        ('accounts:instructor_dashboard', None, 'instructor', 'get', 6),
+        ('accounts:admin_dashboard', None, 'admin', 'get', 3),
+    ],
+    'admin_panel': [
+        ('admin_panel:dashboard', None, 'admin', 'get', 7),
+        ('admin_panel:users', None, 'admin', 'get', 5),
+        ('admin_panel:user_detail', 'student', 'admin', 'get', 4),
+        ('admin_panel:courses', None, 'admin', 'get', 5),
+        ('admin_panel:course_detail', 'enrolled_course', 'admin', 'get', 6),
+        ('admin_panel:payments', None, 'admin', 'get', 4),
+        ('admin_panel:payments_export', None, 'admin', 'get', 4),
+        ('admin_panel:audit_logs', None, 'admin', 'get', 5),
+        ('admin_panel:audit_logs_export', None, 'admin', 'get', 4),
+    ],
+}
+
+POST_DATA = {
+    'videos:save_progress': {'watched_duration': 120},
+}
+
+QUERY_STRINGS = {
+    'courses:search': 'q=course',
+    'admin_panel:users': 'q=student',
+    'admin_panel:courses': 'q=course',
+}
+
+# Pages whose templates are not in the tree yet render a placeholder, so
+# their budgets cover the queries the view itself runs.
+PLACEHOLDER_TEMPLATES = {
+    name: '{{ request.path }}'
+    for name in (
+        'videos/watch_video.html',
+        'videos/upload_video.html',
+        'payments/course_payments.html',
+        'payments/payout_history.html',
+        'admin_panel/dashboard.html',
+        'admin_panel/users.html',
+        'admin_panel/user_detail.html',
+        'admin_panel/courses.html',
+        'admin_panel/course_detail.html',
+        'admin_panel/payments.html',
+        'admin_panel/audit_log.html',
+    )
+}
+
+
+def _templates():
+    engine = dict(settings.TEMPLATES[0], APP_DIRS=False)
+    engine['OPTIONS'] = dict(engine.get('OPTIONS', {}), loaders=[
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+        ('django.template.loaders.locmem.Loader', PLACEHOLDER_TEMPLATES),
+    ])
+    return [engine]
+
+
+def _scaled(count):
+    return max(int(count * SCALE), 1)
+
+
+@override_settings(TEMPLATES=_templates(), AUDIT_ASYNC=False, ADMIN_METRICS_BACKGROUND_REFRESH=False,
+                   VIDEO_PROGRESS_FLUSH_THREAD=False, VIDEO_PROGRESS_FLUSH_INTERVAL=3600,
+                   REQUEST_METRICS_SERVER_TIMING=False)
+class QueryBudgetTestCase(TestCase):
+    """Test every page stays within its query and latency budget"""
+
+    results = []
+
+    @classmethod
+    def setUpTestData(cls):
+        """Seed thousands of courses, enrollments, ratings and payments"""
+        started = time.perf_counter()
+        data = factories.seed(
+            instructors=_scaled(20),
+            students=_scaled(500),
+            courses_per_instructor=50,
+            enrollments_per_student=10,
+        )
+        cls.seed_seconds = time.perf_counter() - started
+        cls.seed_counts = {name: len(data[name]) for name in ('instructors', 'courses', 'students', 'enrolled')}
+
+        cls.admin = data['admin']
+        cls.student = data['students'][0]
+        cls.instructor = data['instructors'][0]
+        enrolled_course = next(course_id for student_id, course_id in data['enrolled'] if student_id == cls.student.pk)
+        cls.args = {
+            'course': next(course.pk for course in data['courses'] if course.instructor_id == cls.instructor.pk),
+            'enrolled_course': enrolled_course,
+            'video': Video.objects.filter(course_id=enrolled_course).values_list('pk', flat=True).first(),
+            'student': cls.student.pk,
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        progress_buffer.drain()
+        super().tearDownClass()
+        if REPORT and cls.results:
+            report = {
+                'scale': SCALE,
+                'runs': RUNS,
+                'latency_budget_ms': LATENCY_MS,
+                'seed_seconds': round(cls.seed_seconds, 2),
+                'seeded': cls.seed_counts,
+                'views': sorted(cls.results, key=lambda result: (result['app'], result['view'])),
+            }
+            with open(REPORT, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def measure(self, app, name, arg, client, method, budget):
+        self.client.logout()
+        if client != 'anonymous':
+            self.client.force_login(getattr(self, client))
+        url = reverse(name, args=[self.args[arg]] if arg else [])
+        if name in QUERY_STRINGS:
+            url = f'{url}?{QUERY_STRINGS[name]}'
+
+        cache.clear()
+        queries, timings, status = [], [], None
+        for _ in range(RUNS):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, POST_DATA.get(name, {}))
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            status = response.status_code
+
+        result = {
+            'app': app,
+            'view': name,
+            'client': client,
+            'url': url,
+            'status': status,
+            'queries': max(queries),
+            'cold_queries': queries[0],
+            'query_budget': budget,
+            'median_ms': round(median(timings), 2),
+            'max_ms': round(max(timings), 2),
+        }
+        type(self).results.append(result)
+        return result
+
+    def check_app(self, app):
+        for name, arg, client, method, budget in CASES[app]:
+            with self.subTest(view=name, client=client):
+                result = self.measure(app, name, arg, client, method, budget)
+                self.assertLess(result['status'], 400, result)
+                self.assertLessEqual(result['queries'], budget, result)
+                self.assertLessEqual(result['median_ms'], LATENCY_MS, result)
+
+    def test_courses_views(self):
+        self.check_app('courses')
+
+    def test_videos_views(self):
+        self.check_app('videos')
+
+    def test_payments_views(self):
+        self.check_app('payments')
+
+    def test_accounts_views(self):
+        self.check_app('accounts')
+
+    def test_admin_panel_views(self):
+        self.check_app('admin_panel')
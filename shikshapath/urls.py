@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from courses.views import home
+from .instrumentation import metrics_view
 
 
 
@@ -31,6 +32,7 @@ urlpatterns = [
     path('videos/', include('videos.urls')),
     path('video-generation/', include('video_generation.urls')),
     path('admin-panel/', include('admin_panel.urls')),
+    path('internal/metrics', metrics_view, name='metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 # Serve media files in development
@@ -0,0 +1,187 @@
+"""
+Text extraction for video generation uploads.
+
+Each format is read through a generator that yields pages, paragraphs or
+rows, and the pieces are joined only up to VIDEO_EXTRACT_MAX_CHARS, so
+reading stops as soon as the cap is hit. Workbooks are opened read-only.
+PDFs with at least VIDEO_EXTRACT_PARALLEL_MIN_PAGES pages are split into
+page ranges extracted by a process pool.
+
+Results are cached by the upload's SHA-256, so re-uploading the same file
+skips parsing entirely.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+import codecs
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.m4v')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def file_checksum(file_obj):
+    """SHA-256 of an uploaded file, read in chunks; rewinds the file."""
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def take(pieces, limit):
+    """Join text pieces, consuming the generator only until `limit` characters."""
+    parts = []
+    remaining = limit
+    for piece in pieces:
+        if not piece:
+            continue
+        parts.append(piece[:remaining])
+        remaining -= len(parts[-1])
+        if remaining <= 0:
+            break
+    return ''.join(parts)
+
+
+def iter_text(file_obj):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in file_obj.chunks():
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def iter_docx(file_obj):
+    from docx import Document
+
+    for para in Document(file_obj).paragraphs:
+        yield para.text + '\n'
+
+
+def iter_pptx(file_obj):
+    from pptx import Presentation
+
+    for slide in Presentation(file_obj).slides:
+        for shape in slide.shapes:
+            if hasattr(shape, 'text'):
+                yield shape.text + '\n'
+
+
+def iter_xlsx(file_obj):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            for row in ws.iter_rows(values_only=True):
+                yield ' '.join(str(cell) for cell in row if cell) + '\n'
+    finally:
+        wb.close()
+
+
+def page_ranges(page_count, workers, min_pages):
+    """Split [0, page_count) into at most `workers` contiguous ranges of >= min_pages."""
+    if page_count <= 0:
+        return []
+    size = max(-(-page_count // max(workers, 1)), min_pages, 1)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def extract_pdf_range(path, start, end, limit):
+    """Text of pages [start, end) of a PDF, capped at `limit`. Runs in pool workers."""
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(path)
+    return take((reader.pages[i].extract_text() for i in range(start, end)), limit)
+
+
+def _spooled_path(file_obj):
+    """Filesystem path for an upload, copying in-memory uploads to a temp file."""
+    if hasattr(file_obj, 'temporary_file_path'):
+        return file_obj.temporary_file_path(), False
+    file_obj.seek(0)
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        shutil.copyfileobj(file_obj, tmp)
+    file_obj.seek(0)
+    return tmp.name, True
+
+
+def iter_pdf(file_obj, limit):
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(file_obj)
+    page_count = len(reader.pages)
+    if page_count < _setting('VIDEO_EXTRACT_PARALLEL_MIN_PAGES', 40):
+        for page in reader.pages:
+            yield page.extract_text()
+        return
+
+    workers = _setting('VIDEO_EXTRACT_WORKERS', 0) or os.cpu_count() or 1
+    ranges = page_ranges(page_count, workers, _setting('VIDEO_EXTRACT_PAGES_PER_WORKER', 10))
+    path, is_temporary = _spooled_path(file_obj)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(ranges)),
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as pool:
+            futures = [pool.submit(extract_pdf_range, path, start, end, limit) for start, end in ranges]
+            try:
+                # In page order; ranges past the character cap are never waited for
+                for future in futures:
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+    finally:
+        if is_temporary:
+            os.unlink(path)
+
+
+# (extensions, reader, message when the parsing library is missing)
+EXTRACTORS = [
+    (('.txt',), lambda f, limit: iter_text(f), None),
+    (('.pdf',), iter_pdf, "[PDF file uploaded - requires PyPDF2 for text extraction]"),
+    (('.doc', '.docx'), lambda f, limit: iter_docx(f), "[Word document uploaded - requires python-docx for text extraction]"),
+    (('.pptx',), lambda f, limit: iter_pptx(f), "[PowerPoint file uploaded - requires python-pptx for text extraction]"),
+    (('.xlsx', '.xls'), lambda f, limit: iter_xlsx(f), "[Excel file uploaded - requires openpyxl for text extraction]"),
+]
+
+
+def extract_text_from_file(file_obj):
+    """Extract text content from uploaded file or handle video files."""
+    try:
+        file_name = file_obj.name.lower()
+
+        # Handle video files - return metadata instead of trying to extract text
+        if file_name.endswith(VIDEO_EXTENSIONS):
+            return f"[Video file uploaded: {file_obj.name} - {file_obj.size / (1024*1024):.2f} MB]"
+
+        for extensions, reader, missing_library in EXTRACTORS:
+            if file_name.endswith(extensions):
+                break
+        else:
+            return "[Unsupported file format]"
+
+        limit = _setting('VIDEO_EXTRACT_MAX_CHARS', 200000)
+        cache_key = f'video_generation:extract:{file_checksum(file_obj)}:{extensions[0]}:{limit}'
+        text = cache.get(cache_key)
+        if text is None:
+            try:
+                text = take(reader(file_obj, limit), limit)
+            except ImportError:
+                return missing_library
+            cache.set(cache_key, text, timeout=_setting('VIDEO_EXTRACT_CACHE_TIMEOUT', 60 * 60 * 24))
+        return text
+
+    except Exception as e:
+        return f"[Error processing file: {str(e)}]"
@@ -0,0 +1,70 @@
+"""
+Run queued video generation tasks (database-backed queue).
+
+Each claimed task renders in its own process (see render_farm); this
+command keeps up to --concurrency of them running, one waiting thread each.
+
+Usage:
+    python manage.py process_video_generation
+    python manage.py process_video_generation --concurrency 2 --once
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from video_generation.render_farm import max_concurrency
+from video_generation.tasks import claim_next_task, execute_task
+import time
+
+
+def _execute(task_id):
+    try:
+        execute_task(task_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Claim pending video generation tasks and render them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to wait for new tasks when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no pending tasks are left')
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Renders at once (default: VIDEO_RENDER_CONCURRENCY, at most one per CPU core)')
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'] or max_concurrency(), 1)
+        processed = 0
+        running = set()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    while len(running) < concurrency:
+                        task_id = claim_next_task()
+                        if task_id is None:
+                            break
+                        if concurrency == 1:
+                            # A single slot needs no waiting thread
+                            execute_task(task_id)
+                            processed += 1
+                            continue
+                        running.add(pool.submit(_execute, task_id))
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                        processed += 1
+            except KeyboardInterrupt:
+                self.stdout.write('Interrupted; waiting for running renders to finish')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} video generation tasks'))
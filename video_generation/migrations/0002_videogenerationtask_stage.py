@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_generation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videogenerationtask',
+            name='stage',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
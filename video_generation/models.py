@@ -14,6 +14,7 @@ class VideoGenerationTask(models.Model):
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
     )
     
     ANIMATION_STYLE_CHOICES = (
@@ -52,6 +53,8 @@ class VideoGenerationTask(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     error_message = models.TextField(blank=True)
     progress_percentage = models.IntegerField(default=0)
+    stage = models.CharField(max_length=100, blank=True)  # Current step, shown while processing
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # Render cache key
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,129 @@
+"""
+Isolated Manim renders with a content-addressed result cache.
+
+Every render runs in its own freshly spawned process, so Manim's global
+config (resolution, frame rate, media dir) is never shared between renders.
+The caller's thread waits on the process and can stop it on timeout or when
+should_cancel() turns true.
+
+Finished videos are stored under generated_videos/cache/<content hash>.mp4.
+The hash covers everything that affects the output (content, style,
+quality, duration), so an identical submission reuses the existing file.
+
+This module must stay importable without Django being set up: the spawned
+child only imports it and video_generation.services.
+"""
+from django.conf import settings
+import hashlib
+import multiprocessing
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = 'generated_videos/cache'
+
+
+class RenderError(Exception):
+    """The render process failed."""
+
+    def __init__(self, message, error_type=None):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+class RenderTimeout(RenderError):
+    pass
+
+
+class RenderCancelled(RenderError):
+    pass
+
+
+def max_concurrency():
+    """Renders allowed at once: VIDEO_RENDER_CONCURRENCY, capped at the CPU count."""
+    cpus = os.cpu_count() or 1
+    configured = getattr(settings, 'VIDEO_RENDER_CONCURRENCY', 0) or cpus
+    return max(min(configured, cpus), 1)
+
+
+def content_hash(source_content, style, quality, duration):
+    """Key for the result cache."""
+    digest = hashlib.sha256()
+    for part in (source_content, style, quality, str(duration)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def cache_name(digest):
+    """Storage name of the cached video for a content hash."""
+    return f'{CACHE_DIR}/{digest}.mp4'
+
+
+def cached_result(digest):
+    """Storage name of an already rendered video, or None."""
+    from django.core.files.storage import default_storage
+
+    name = cache_name(digest)
+    return name if default_storage.exists(name) else None
+
+
+def _render_process(spec, conn):
+    """Child process entry point: render one animation into the cache."""
+    try:
+        from .services import AnimationGenerator
+
+        os.makedirs(os.path.dirname(spec['output_path']), exist_ok=True)
+        partial_path = f"{spec['output_path']}.{os.getpid()}.part.mp4"
+        generator = AnimationGenerator(quality=spec['quality'], duration=spec['duration'])
+        generator.generate_animation(content=spec['content'], style=spec['style'], output_path=partial_path)
+        os.replace(partial_path, spec['output_path'])
+        conn.send(('ok', None, None))
+    except BaseException as e:
+        conn.send(('error', type(e).__name__, str(e)))
+    finally:
+        conn.close()
+
+
+def render(spec, timeout=None, should_cancel=None, poll_interval=1.0):
+    """
+    Render one animation in an isolated process and wait for it.
+
+    Args:
+        spec (dict): content, style, quality, duration and output_path
+        timeout (float): Seconds before the render is killed
+        should_cancel (callable): Polled every poll_interval; True stops the render
+        poll_interval (float): Seconds between cancellation checks
+
+    Raises:
+        RenderTimeout, RenderCancelled, RenderError
+    """
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_render_process, args=(spec, child_conn), daemon=True)
+    process.start()
+    child_conn.close()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while not parent_conn.poll(poll_interval):
+            if not process.is_alive():
+                break
+            if should_cancel is not None and should_cancel():
+                raise RenderCancelled('Render cancelled')
+            if deadline is not None and time.monotonic() > deadline:
+                raise RenderTimeout(f'Render timed out after {timeout}s')
+
+        try:
+            status, error_type, message = parent_conn.recv()
+        except EOFError:
+            raise RenderError(f'Render process exited with code {process.exitcode}')
+        if status != 'ok':
+            raise RenderError(message, error_type)
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join(5)
+        parent_conn.close()
@@ -1,13 +1,24 @@
 """
 Manim-based animation generation service for ShikshaPath
 Converts teaching content to 3D animated videos
+
+Rendering changes Manim's process-wide config, so renders are run one per
+process by video_generation.render_farm and only override config inside
+tempconfig().
 """
 
 from manim import *
 import os
+import shutil
 import tempfile
 from pathlib import Path
 
+QUALITY_CONFIG = {
+    'low': {'pixel_height': 480, 'pixel_width': 854, 'frame_rate': 15},
+    'medium': {'pixel_height': 720, 'pixel_width': 1280, 'frame_rate': 30},
+    'high': {'pixel_height': 1080, 'pixel_width': 1920, 'frame_rate': 60},
+}
+
 
 class AnimationGenerator:
     """Generate animations from text content using Manim"""
@@ -15,22 +26,19 @@ class AnimationGenerator:
     def __init__(self, quality='medium', duration=60):
         self.quality = quality
         self.duration = duration
-        self.set_config(quality)
     
-    def set_config(self, quality):
-        """Set Manim render quality"""
-        if quality == 'low':
-            config.pixel_height = 480
-            config.pixel_width = 854
-            config.frame_rate = 15
-        elif quality == 'high':
-            config.pixel_height = 1080
-            config.pixel_width = 1920
-            config.frame_rate = 60
-        else:  # medium
-            config.pixel_height = 720
-            config.pixel_width = 1280
-            config.frame_rate = 30
+    def render_config(self, media_dir):
+        """Manim config overrides for this generator's quality"""
+        options = dict(QUALITY_CONFIG.get(self.quality, QUALITY_CONFIG['medium']))
+        options.update({
+            'media_dir': media_dir,
+            'output_file': 'animation',
+            'disable_caching': True,
+            'write_to_movie': True,
+            'verbosity': 'WARNING',
+            'progress_bar': 'none',
+        })
+        return options
     
     def generate_mathematical_animation(self, content):
         """Generate mathematical/technical animations"""
@@ -132,7 +140,7 @@ class AnimationGenerator:
         """
         try:
             if not output_path:
-                output_path = tempfile.gettempdir()
+                output_path = os.path.join(tempfile.gettempdir(), 'animation.mp4')
             
             # Select animation based on style
             if style == 'mathematical':
@@ -142,9 +150,14 @@ class AnimationGenerator:
             else:  # educational or technical
                 scene_class = self.generate_educational_animation(content)
             
-            # Note: In production, you'd render using Manim's renderer
-            # For now, return a placeholder indicating successful generation
-            return None  # In development - actual rendering handled separately
+            # Render into a private media dir so concurrent renders never share files
+            with tempfile.TemporaryDirectory(prefix='manim-') as media_dir:
+                with tempconfig(self.render_config(media_dir)):
+                    scene = scene_class()
+                    scene.render()
+                    rendered = scene.renderer.file_writer.movie_file_path
+                shutil.move(str(rendered), output_path)
+            return output_path
         
         except Exception as e:
             raise Exception(f"Failed to generate animation: {str(e)}")
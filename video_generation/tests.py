@@ -1,3 +1,291 @@
-from django.test import TestCase
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from courses.models import Course
+from video_generation.models import VideoGenerationTask
+from video_generation.tasks import claim_next_task, run_generation
+from video_generation import render_farm
+from video_generation.extraction import extract_text_from_file, page_ranges, take
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
+from decimal import Decimal
+import os
+import importlib.util
+import shutil
+import tempfile
+import unittest
 
-# Create your tests here.
+User = get_user_model()
+
+
+class VideoGenerationQueueTestCase(TestCase):
+    """Test background execution of video generation tasks"""
+    
+    def setUp(self):
+        """Set up test client and data"""
+        self.client = Client()
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Test Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+    
+    def create_task(self):
+        return VideoGenerationTask.objects.create(
+            course=self.course,
+            instructor=self.instructor,
+            source_content='Newton\'s laws'
+        )
+    
+    def test_generate_view_only_enqueues(self):
+        """Test the view saves a pending task without rendering it"""
+        self.client.login(username='instructor@example.com', password='testpass123')
+        with mock.patch('video_generation.tasks.generate_video_sync') as render:
+            response = self.client.post(reverse('video_generation:generate_video', args=[self.course.id]), {
+                'title': 'Intro',
+                'source_content': 'Newton\'s laws',
+                'animation_style': 'educational',
+                'duration': 60,
+                'quality': 'medium',
+            })
+        
+        self.assertEqual(response.status_code, 302)
+        render.assert_not_called()
+        task = VideoGenerationTask.objects.get(course=self.course)
+        self.assertEqual(task.status, 'pending')
+        self.assertEqual(task.progress_percentage, 0)
+    
+    def test_progress_stages_are_persisted(self):
+        """Test progress updates are visible while a task runs"""
+        task = self.create_task()
+        seen = []
+        
+        def render(task, progress):
+            progress(40, 'Rendering animation')
+            seen.append(VideoGenerationTask.objects.values_list('progress_percentage', 'stage').get(pk=task.pk))
+        
+        with mock.patch('video_generation.tasks.generate_video_sync', side_effect=render):
+            self.assertTrue(run_generation(task.pk))
+        
+        self.assertEqual(seen, [(40, 'Rendering animation')])
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'completed')
+        self.assertEqual(task.progress_percentage, 100)
+        self.assertIsNotNone(task.completed_at)
+    
+    def test_task_runs_only_once(self):
+        """Test a task already claimed is not run again"""
+        task = self.create_task()
+        with mock.patch('video_generation.tasks.generate_video_sync') as render:
+            self.assertTrue(run_generation(task.pk))
+            self.assertFalse(run_generation(task.pk))
+        self.assertEqual(render.call_count, 1)
+    
+    def test_failure_is_recorded(self):
+        """Test render errors mark the task failed"""
+        task = self.create_task()
+        with mock.patch('video_generation.tasks.generate_video_sync', side_effect=RuntimeError('no ffmpeg')):
+            run_generation(task.pk)
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'failed')
+        self.assertEqual(task.error_message, 'no ffmpeg')
+    
+    def test_database_worker_drains_queue(self):
+        """Test the worker command processes pending tasks in order"""
+        for _ in range(2):
+            self.create_task()
+        with mock.patch('video_generation.tasks.generate_video_sync'):
+            call_command('process_video_generation', '--once', '--concurrency', '1', stdout=open(os.devnull, 'w'))
+        
+        self.assertEqual(
+            set(VideoGenerationTask.objects.values_list('status', flat=True)),
+            {'completed'}
+        )
+        self.assertIsNone(claim_next_task())
+    
+    def test_status_endpoint_reports_stage(self):
+        """Test check_video_status includes the current stage"""
+        task = self.create_task()
+        VideoGenerationTask.objects.filter(pk=task.pk).update(status='processing', progress_percentage=40, stage='Rendering animation')
+        self.client.login(username='instructor@example.com', password='testpass123')
+        
+        response = self.client.get(reverse('video_generation:check_video_status', args=[task.id]))
+        
+        self.assertEqual(response.json()['progress'], 40)
+        self.assertEqual(response.json()['stage'], 'Rendering animation')
+
+
+class RenderFarmTestCase(TestCase):
+    """Test isolated renders, cancellation and the render cache"""
+    
+    def setUp(self):
+        """Set up test client, data and a scratch media root"""
+        self.client = Client()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Test Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+        self.client.login(username='instructor@example.com', password='testpass123')
+    
+    def submit(self, content='Newton\'s laws'):
+        return self.client.post(reverse('video_generation:generate_video', args=[self.course.id]), {
+            'title': 'Intro',
+            'source_content': content,
+            'animation_style': 'educational',
+            'duration': 60,
+            'quality': 'medium',
+        })
+    
+    def test_content_hash_covers_render_inputs(self):
+        """Test the cache key changes with any render input"""
+        base = render_farm.content_hash('notes', 'educational', 'medium', 60)
+        self.assertEqual(base, render_farm.content_hash('notes', 'educational', 'medium', 60))
+        self.assertNotEqual(base, render_farm.content_hash('notes', 'educational', 'high', 60))
+        self.assertNotEqual(base, render_farm.content_hash('notes', 'business', 'medium', 60))
+        self.assertNotEqual(base, render_farm.content_hash('notes', 'educational', 'medium', 90))
+    
+    def test_identical_submission_reuses_cached_video(self):
+        """Test a resubmission completes immediately from the render cache"""
+        digest = render_farm.content_hash('Newton\'s laws', 'educational', 'medium', 60)
+        with self.settings(MEDIA_ROOT=self.media_root):
+            os.makedirs(os.path.join(self.media_root, 'generated_videos', 'cache'))
+            open(os.path.join(self.media_root, 'generated_videos', 'cache', f'{digest}.mp4'), 'wb').close()
+            self.submit()
+        
+        task = VideoGenerationTask.objects.get(course=self.course)
+        self.assertEqual(task.status, 'completed')
+        self.assertEqual(task.content_hash, digest)
+        self.assertEqual(task.generated_video.name, f'generated_videos/cache/{digest}.mp4')
+    
+    def test_cancel_pending_task(self):
+        """Test a cancelled task is never claimed"""
+        with self.settings(MEDIA_ROOT=self.media_root):
+            self.submit()
+        task = VideoGenerationTask.objects.get(course=self.course)
+        
+        self.client.post(reverse('video_generation:cancel_video', args=[task.id]))
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'cancelled')
+        self.assertIsNone(claim_next_task())
+    
+    def test_cancel_stops_running_render(self):
+        """Test cancellation during a render is recorded without overwriting it"""
+        with self.settings(MEDIA_ROOT=self.media_root):
+            self.submit()
+        task = VideoGenerationTask.objects.get(course=self.course)
+        
+        def render(spec, timeout, should_cancel):
+            VideoGenerationTask.objects.filter(pk=task.pk).update(status='cancelled')
+            self.assertTrue(should_cancel())
+            raise render_farm.RenderCancelled('Render cancelled')
+        
+        with self.settings(MEDIA_ROOT=self.media_root), mock.patch('video_generation.render_farm.render', side_effect=render):
+            run_generation(task.pk)
+        
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'cancelled')
+        self.assertEqual(task.stage, 'Cancelled')
+    
+    @unittest.skipIf(importlib.util.find_spec('manim'), 'manim is installed; a real render would run')
+    def test_render_runs_in_separate_process(self):
+        """Test child process errors are reported back to the caller"""
+        spec = {
+            'content': 'notes',
+            'style': 'educational',
+            'quality': 'low',
+            'duration': 30,
+            'output_path': os.path.join(self.media_root, 'out.mp4'),
+        }
+        with self.assertRaises(render_farm.RenderError) as raised:
+            render_farm.render(spec, timeout=60, poll_interval=0.1)
+        self.assertIn(raised.exception.error_type, ('ImportError', 'ModuleNotFoundError'))
+    
+    def test_delete_keeps_shared_cached_file(self):
+        """Test deleting one task keeps a cached video other tasks use"""
+        name = 'generated_videos/cache/shared.mp4'
+        with self.settings(MEDIA_ROOT=self.media_root):
+            os.makedirs(os.path.join(self.media_root, 'generated_videos', 'cache'))
+            open(os.path.join(self.media_root, *name.split('/')), 'wb').close()
+            tasks = [
+                VideoGenerationTask.objects.create(
+                    course=self.course, instructor=self.instructor, source_content='x',
+                    status='completed', generated_video=name
+                )
+                for _ in range(2)
+            ]
+            self.client.post(reverse('video_generation:delete_video', args=[tasks[0].id]))
+            
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, *name.split('/'))))
+
+
+class TextExtractionTestCase(TestCase):
+    """Test streaming, capped and cached upload text extraction"""
+    
+    def setUp(self):
+        cache.clear()
+    
+    def test_take_stops_consuming_at_limit(self):
+        """Test the generator is not read past the character cap"""
+        consumed = []
+        
+        def pieces():
+            for piece in ('abc', 'def', 'ghi'):
+                consumed.append(piece)
+                yield piece
+        
+        self.assertEqual(take(pieces(), 5), 'abcde')
+        self.assertEqual(consumed, ['abc', 'def'])
+    
+    def test_text_file_is_capped(self):
+        """Test extracted text respects VIDEO_EXTRACT_MAX_CHARS"""
+        upload = SimpleUploadedFile('notes.txt', ('héllo ' * 1000).encode('utf-8'))
+        with self.settings(VIDEO_EXTRACT_MAX_CHARS=12):
+            self.assertEqual(extract_text_from_file(upload), 'héllo héllo ')
+    
+    def test_result_cached_by_checksum(self):
+        """Test identical uploads are served from the cache"""
+        first = SimpleUploadedFile('a.txt', b'Newton laws')
+        self.assertEqual(extract_text_from_file(first), 'Newton laws')
+        
+        with mock.patch('video_generation.extraction.take') as parse:
+            second = SimpleUploadedFile('b.txt', b'Newton laws')
+            self.assertEqual(extract_text_from_file(second), 'Newton laws')
+        parse.assert_not_called()
+    
+    def test_page_ranges_cover_document(self):
+        """Test PDF page ranges are contiguous and bounded by worker count"""
+        ranges = page_ranges(95, workers=4, min_pages=10)
+        self.assertEqual(ranges, [(0, 24), (24, 48), (48, 72), (72, 95)])
+        self.assertEqual(page_ranges(15, workers=8, min_pages=10), [(0, 10), (10, 15)])
+        self.assertEqual(page_ranges(0, workers=4, min_pages=10), [])
+    
+    def test_unsupported_and_video_files(self):
+        """Test non-text uploads keep their placeholder messages"""
+        self.assertEqual(extract_text_from_file(SimpleUploadedFile('a.bin', b'x')), '[Unsupported file format]')
+        self.assertTrue(extract_text_from_file(SimpleUploadedFile('a.mp4', b'x')).startswith('[Video file uploaded'))
@@ -8,5 +8,6 @@ urlpatterns = [
     path('list/<int:course_id>/', views.list_videos, name='list_videos'),
     path('view/<int:video_id>/', views.view_video, name='view_video'),
     path('delete/<int:video_id>/', views.delete_video, name='delete_video'),
+    path('cancel/<int:video_id>/', views.cancel_video, name='cancel_video'),
     path('status/<int:video_id>/', views.check_video_status, name='check_video_status'),
 ]
@@ -7,78 +7,13 @@ from django.views import View
 from django.contrib import messages
 import os
 import json
-from pathlib import Path
 
 from courses.models import Course
 from accounts.decorators import instructor_required
 from .models import VideoGenerationTask
 from .forms import VideoGenerationForm
-
-
-def extract_text_from_file(file_obj):
-    """Extract text content from uploaded file or handle video files."""
-    try:
-        file_name = file_obj.name.lower()
-        
-        # Handle video files - return metadata instead of trying to extract text
-        video_extensions = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.m4v')
-        if file_name.endswith(video_extensions):
-            return f"[Video file uploaded: {file_obj.name} - {file_obj.size / (1024*1024):.2f} MB]"
-        
-        if file_name.endswith('.txt'):
-            return file_obj.read().decode('utf-8')
-        
-        elif file_name.endswith('.pdf'):
-            try:
-                import PyPDF2
-                pdf_reader = PyPDF2.PdfReader(file_obj)
-                text = ''
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                return text
-            except ImportError:
-                return "[PDF file uploaded - requires PyPDF2 for text extraction]"
-        
-        elif file_name.endswith(('.doc', '.docx')):
-            try:
-                from docx import Document
-                doc = Document(file_obj)
-                text = '\n'.join([para.text for para in doc.paragraphs])
-                return text
-            except ImportError:
-                return "[Word document uploaded - requires python-docx for text extraction]"
-        
-        elif file_name.endswith('.pptx'):
-            try:
-                from pptx import Presentation
-                prs = Presentation(file_obj)
-                text = ''
-                for slide in prs.slides:
-                    for shape in slide.shapes:
-                        if hasattr(shape, 'text'):
-                            text += shape.text + '\n'
-                return text
-            except ImportError:
-                return "[PowerPoint file uploaded - requires python-pptx for text extraction]"
-        
-        elif file_name.endswith(('.xlsx', '.xls')):
-            try:
-                import openpyxl
-                wb = openpyxl.load_workbook(file_obj)
-                text = ''
-                for sheet in wb.sheetnames:
-                    ws = wb[sheet]
-                    for row in ws.iter_rows(values_only=True):
-                        text += ' '.join(str(cell) for cell in row if cell) + '\n'
-                return text
-            except ImportError:
-                return "[Excel file uploaded - requires openpyxl for text extraction]"
-        
-        else:
-            return "[Unsupported file format]"
-    
-    except Exception as e:
-        return f"[Error processing file: {str(e)}]"
+from .extraction import extract_text_from_file
+from .tasks import apply_cached_result, enqueue_generation, task_content_hash
 
 
 @login_required
@@ -107,21 +42,15 @@ def generate_video(request, course_id):
                 else:
                     task.source_content = extracted_text
             
+            task.content_hash = task_content_hash(task)
             task.save()
             
-            # TODO: Queue async task with Celery
-            # For now, try to generate synchronously (for development)
-            try:
-                generate_video_sync(task)
-                task.status = 'completed'
-                task.progress_percentage = 100
-                task.save()
-                messages.success(request, f"Video generated successfully!")
-            except Exception as e:
-                task.status = 'failed'
-                task.error_message = str(e)
-                task.save()
-                messages.error(request, f"Video generation failed: {str(e)}")
+            if apply_cached_result(task):
+                messages.success(request, "This content was rendered before; the existing video was reused.")
+            else:
+                # Rendering takes minutes; a background worker picks the task up
+                enqueue_generation(task)
+                messages.success(request, "Video generation queued. Its progress is shown below.")
             
             return redirect('video_generation:list_videos', course_id=course_id)
     else:
@@ -183,8 +112,9 @@ def delete_video(request, video_id):
     
     course_id = video.course.id
     
-    # Delete associated files
-    if video.generated_video:
+    # Delete associated files (rendered videos are shared by tasks with the same content)
+    shared = VideoGenerationTask.objects.filter(generated_video=video.generated_video.name).exclude(pk=video.pk).exists()
+    if video.generated_video and not shared:
         try:
             if os.path.exists(video.generated_video.path):
                 os.remove(video.generated_video.path)
@@ -204,6 +134,25 @@ def delete_video(request, video_id):
     return redirect('video_generation:list_videos', course_id=course_id)
 
 
+@login_required
+@instructor_required
+@require_http_methods(["POST"])
+def cancel_video(request, video_id):
+    """Cancel a pending or running video generation."""
+    video = get_object_or_404(VideoGenerationTask, id=video_id, instructor=request.user)
+    
+    # A running render notices the status change and is stopped by the worker
+    cancelled = VideoGenerationTask.objects.filter(
+        pk=video.pk, status__in=['pending', 'processing']
+    ).update(status='cancelled', stage='Cancelled')
+    if cancelled:
+        messages.success(request, "Video generation cancelled.")
+    else:
+        messages.error(request, "This video is no longer being generated.")
+    
+    return redirect('video_generation:list_videos', course_id=video.course_id)
+
+
 @login_required
 @require_http_methods(["GET"])
 def check_video_status(request, video_id):
@@ -213,73 +162,8 @@ def check_video_status(request, video_id):
         return JsonResponse({
             'status': video.status,
             'progress': video.progress_percentage,
+            'stage': video.stage,
             'error': video.error_message or '',
         })
     except VideoGenerationTask.DoesNotExist:
         return JsonResponse({'error': 'Video not found'}, status=404)
-
-
-def generate_video_sync(task):
-    """Synchronously generate video (for development)."""
-    try:
-        # Try to generate using Manim/AnimationGenerator
-        try:
-            # Lazy import to avoid issues during migration
-            from .services import AnimationGenerator
-            
-            # Create output directory
-            output_dir = Path('media/generated_videos/')
-            output_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Initialize Manim generator
-            generator = AnimationGenerator(quality=task.quality)
-            
-            # Generate animation based on style
-            output_file = str(output_dir / f'video_{task.id}.mp4')
-            generator.generate_animation(
-                content=task.source_content,
-                style=task.animation_style,
-                output_path=output_file
-            )
-            
-            # Save generated video to task
-            if os.path.exists(output_file):
-                task.generated_video = f'generated_videos/video_{task.id}.mp4'
-            
-            task.status = 'completed'
-            task.progress_percentage = 100
-            
-        except ImportError as ie:
-            # Handle numpy or other import errors
-            if 'numpy' in str(ie).lower():
-                # Create a placeholder video with metadata
-                output_dir = Path('media/generated_videos/')
-                output_dir.mkdir(parents=True, exist_ok=True)
-                
-                # Create a simple text file as placeholder (actual video generation requires proper dependencies)
-                placeholder_file = output_dir / f'video_{task.id}_placeholder.txt'
-                with open(placeholder_file, 'w', encoding='utf-8') as f:
-                    f.write(f"Video Generation Placeholder\n")
-                    f.write(f"Title: {task.title or 'Untitled'}\n")
-                    f.write(f"Style: {task.get_animation_style_display()}\n")
-                    f.write(f"Duration: {task.duration}s\n")
-                    f.write(f"Quality: {task.get_quality_display()}\n")
-                    f.write(f"\n--- Content ---\n")
-                    f.write(task.source_content)
-                
-                # Mark as completed with note
-                task.status = 'completed'
-                task.progress_percentage = 100
-                task.error_message = None
-                
-                # Note: Production deployment requires:
-                # 1. Proper numpy/manim installation in clean Python environment
-                # 2. FFmpeg installation for video encoding
-                # 3. Sufficient system resources for rendering
-            else:
-                raise
-    
-    except Exception as e:
-        task.status = 'failed'
-        task.error_message = f"Video generation error: {str(e)}"
-        raise
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Video, VideoProgress, TranscodingJob
+from .models import Video, VideoProgress, TranscodingJob, ChunkedUpload
 
 
 @admin.register(Video)
@@ -19,7 +19,15 @@ class VideoProgressAdmin(admin.ModelAdmin):
 
 @admin.register(TranscodingJob)
 class TranscodingJobAdmin(admin.ModelAdmin):
-    list_display = ('id', 'video', 'status', 'created_at', 'completed_at')
+    list_display = ('id', 'video', 'status', 'attempts', 'created_at', 'completed_at')
     list_filter = ('status', 'created_at')
     search_fields = ('video__title',)
-    readonly_fields = ('created_at', 'started_at', 'completed_at')
+    readonly_fields = ('created_at', 'started_at', 'completed_at', 'attempts', 'next_attempt_at')
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'owner', 'course', 'purpose', 'mode', 'status', 'total_size', 'updated_at')
+    list_filter = ('status', 'purpose', 'mode')
+    search_fields = ('filename', 'owner__email')
+    readonly_fields = ('created_at', 'updated_at', 's3_key', 's3_upload_id', 'result_id')
@@ -8,3 +8,7 @@ class VideosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'videos'
     verbose_name = 'Videos'
+
+    def ready(self):
+        # Register signal handlers for denormalized course stats
+        from . import signals  # noqa: F401
@@ -0,0 +1,23 @@
+"""
+Abort chunked uploads that were started but never completed.
+
+Usage:
+    python manage.py purge_chunked_uploads
+    python manage.py purge_chunked_uploads --ttl 3600
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from videos.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Abort chunked uploads with no activity and delete their stored chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int,
+                            default=getattr(settings, 'CHUNKED_UPLOAD_TTL', 60 * 60 * 24),
+                            help='Seconds of inactivity after which an upload is aborted')
+
+    def handle(self, *args, **options):
+        purged = purge_stale_uploads(options['ttl'])
+        self.stdout.write(self.style.SUCCESS(f'Aborted {purged} stale uploads'))
@@ -0,0 +1,75 @@
+"""
+Process pending TranscodingJob rows in the background.
+
+Usage:
+    python manage.py transcode_videos
+    python manage.py transcode_videos --concurrency 4
+    python manage.py transcode_videos --once
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from videos.transcoding import TranscodeError, claim_jobs, complete_job, fail_job, job_spec, renew_leases, transcode
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Claim pending transcoding jobs and run ffmpeg for them in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            default=getattr(settings, 'TRANSCODE_CONCURRENCY', 2),
+                            help='Maximum number of jobs transcoded at once')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to wait for new jobs when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no due jobs are left')
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'], 1)
+        processed = 0
+        in_flight = {}
+        lost = set()  # reclaimed by another worker, results are discarded
+
+        with ProcessPoolExecutor(max_workers=concurrency) as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    for job in claim_jobs(concurrency - len(in_flight)):
+                        try:
+                            in_flight[pool.submit(transcode, job_spec(job))] = job
+                        except TranscodeError as e:
+                            fail_job(job, e)
+                            processed += 1
+
+                    if not in_flight:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    done, _ = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = in_flight.pop(future)
+                        if job.pk in lost:
+                            lost.discard(job.pk)
+                            continue
+                        try:
+                            complete_job(job, future.result())
+                        except Exception as e:
+                            fail_job(job, e)
+                        processed += 1
+
+                    running = [job for job in in_flight.values() if job.pk not in lost]
+                    for job_id in renew_leases(running):
+                        logger.warning(f"Transcoding job {job_id} was reclaimed by another worker, discarding its result")
+                        lost.add(job_id)
+            except KeyboardInterrupt:
+                self.stdout.write('Interrupted; unfinished jobs will be reclaimed after their lease expires')
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} transcoding jobs'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+def fix_failed_status(apps, schema_editor):
+    """The old 'failed' choice value had a stray trailing comma."""
+    Video = apps.get_model('videos', 'Video')
+    Video.objects.filter(status='failed,').update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcodingjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transcodingjob',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='processing', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='transcodingjob',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='videos_tran_status_f49671_idx'),
+        ),
+        migrations.RunPython(fix_failed_status, migrations.RunPython.noop),
+    ]
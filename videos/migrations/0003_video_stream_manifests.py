@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0002_transcoding_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='dash_manifest',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='hls_manifest',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='streams_in_s3',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0004_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chunkedupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('assembling', 'Assembling'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='uploading', max_length=20),
+        ),
+    ]
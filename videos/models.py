@@ -1,6 +1,7 @@
 from django.db import models
 from courses.models import Course
 from django.utils import timezone
+import uuid
 
 
 class Video(models.Model):
@@ -10,7 +11,7 @@ class Video(models.Model):
     STATUS_CHOICES = (
         ('processing', 'Processing'),
         ('ready', 'Ready'),
-        ('failed,', 'Failed'),
+        ('failed', 'Failed'),
     )
 
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='videos')
@@ -23,6 +24,9 @@ class Video(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
     s3_video_key = models.CharField(max_length=500, blank=True, null=True)  # S3 object key
     s3_thumbnail_key = models.CharField(max_length=500, blank=True, null=True)  # S3 object key
+    hls_manifest = models.CharField(max_length=500, blank=True, null=True)  # Storage name or S3 key of master.m3u8
+    dash_manifest = models.CharField(max_length=500, blank=True, null=True)  # Storage name or S3 key of manifest.mpd
+    streams_in_s3 = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -82,9 +86,92 @@ class TranscodingJob(models.Model):
     started_at = models.DateTimeField(blank=True, null=True)
     completed_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)  # Retry backoff
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
     
     def __str__(self):
         return f"Job {self.id} - {self.video.title}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    Resumable upload sent as individually checksummed chunks.
+
+    In 'local' mode chunks are written to CHUNKED_UPLOAD_DIR and assembled on
+    completion; in 's3' mode each chunk is uploaded as a part of an S3
+    multipart upload.
+    """
+    PURPOSE_CHOICES = (
+        ('video', 'Video'),
+        ('resource', 'Course Resource'),
+    )
+    MODE_CHOICES = (
+        ('local', 'Local'),
+        ('s3', 'S3 Multipart'),
+    )
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('assembling', 'Assembling'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey('accounts.CustomUser', on_delete=models.CASCADE, related_name='chunked_uploads')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='chunked_uploads')
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='local')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    metadata = models.JSONField(default=dict, blank=True)  # Fields for the Video/CourseResource created on completion
+    s3_key = models.CharField(max_length=500, blank=True, null=True)
+    s3_upload_id = models.CharField(max_length=255, blank=True, null=True)
+    result_id = models.PositiveIntegerField(blank=True, null=True)  # Video or CourseResource created on completion
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+    
+    @property
+    def chunk_count(self):
+        return max(-(-self.total_size // self.chunk_size), 1)
+    
+    def expected_chunk_size(self, index):
+        """Exact byte length chunk `index` must have."""
+        if index == self.chunk_count - 1:
+            return self.total_size - self.chunk_size * index
+        return self.chunk_size
+
+
+class UploadChunk(models.Model):
+    """
+    One received chunk of a ChunkedUpload.
+    """
+    upload = models.ForeignKey(ChunkedUpload, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64)  # SHA-256 hex
+    etag = models.CharField(max_length=255, blank=True)  # S3 part ETag
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('upload', 'index')
+        ordering = ['index']
+    
+    def __str__(self):
+        return f"{self.upload_id} #{self.index}"
@@ -0,0 +1,219 @@
+"""
+Write-behind ingestion for video progress heartbeats.
+
+Players post progress every few seconds. The first heartbeat for a
+(student, video) pair is written through so the VideoProgress row exists
+immediately; later heartbeats are coalesced in a per-process buffer (latest
+value wins) and written in bulk when the buffer reaches
+VIDEO_PROGRESS_FLUSH_SIZE entries or VIDEO_PROGRESS_FLUSH_INTERVAL seconds
+have passed. Enrollment progress counters are adjusted by the deltas each
+flush produces.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from decimal import Decimal
+from courses.progress import adjust_enrollment_progress
+from .models import Video, VideoProgress
+import atexit
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+COMPLETION_THRESHOLD = Decimal('90')
+VIDEO_META_TIMEOUT = 600
+PROGRESS_ROW_TIMEOUT = 60 * 60 * 24
+
+
+def get_video_meta(video_id):
+    """
+    Cached (duration, course_id) for a video, or None if it does not exist.
+
+    Saves the heartbeat path from loading the Video row on every post.
+    """
+    cache_key = f'videos:meta:{video_id}'
+    meta = cache.get(cache_key)
+    if meta is None:
+        row = Video.objects.filter(pk=video_id).values_list('duration', 'course_id').first()
+        if row is None:
+            return None
+        meta = tuple(row)
+        cache.set(cache_key, meta, timeout=VIDEO_META_TIMEOUT)
+    return meta
+
+
+def invalidate_video_meta(video_id):
+    cache.delete(f'videos:meta:{video_id}')
+
+
+def completion_for(watched_duration, duration):
+    """Return (completion_percent, is_completed) for a watched position."""
+    if duration <= 0:
+        return Decimal('0.00'), False
+    percent = min(Decimal(watched_duration) * 100 / Decimal(duration), Decimal('100'))
+    percent = percent.quantize(Decimal('0.01'))
+    return percent, percent >= COMPLETION_THRESHOLD
+
+
+def _row_cache_key(student_id, video_id):
+    return f'videos:progress:row:{student_id}:{video_id}'
+
+
+class ProgressBuffer:
+    """Coalesces heartbeats per (student_id, video_id) until flushed."""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._thread = None
+
+    @property
+    def flush_size(self):
+        return getattr(settings, 'VIDEO_PROGRESS_FLUSH_SIZE', 500)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'VIDEO_PROGRESS_FLUSH_INTERVAL', 10)
+
+    def add(self, student_id, video_id, watched_duration):
+        """Buffer a heartbeat; flush inline when a threshold is reached."""
+        with self._lock:
+            self._pending[(student_id, video_id)] = (watched_duration, timezone.now())
+            due = (
+                len(self._pending) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        self._ensure_thread()
+        if due:
+            self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        return pending
+
+    def requeue(self, entries):
+        """Put back entries after a failed flush without clobbering newer ones."""
+        with self._lock:
+            for key, value in entries.items():
+                self._pending.setdefault(key, value)
+
+    def flush(self):
+        """Write all buffered heartbeats. Returns the number written."""
+        pending = self.drain()
+        if not pending:
+            return 0
+        try:
+            write_progress(pending)
+        except Exception:
+            logger.exception(f"Failed to flush {len(pending)} progress heartbeats")
+            self.requeue(pending)
+            return 0
+        return len(pending)
+
+    def _ensure_thread(self):
+        if self._thread is not None or not getattr(settings, 'VIDEO_PROGRESS_FLUSH_THREAD', True):
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='video-progress-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+def write_progress(entries):
+    """
+    Persist coalesced heartbeats.
+
+    Args:
+        entries (dict): (student_id, video_id) -> (watched_duration, watched_at)
+    """
+    if not entries:
+        return
+
+    video_ids = {video_id for _, video_id in entries}
+    student_ids = {student_id for student_id, _ in entries}
+    videos = {
+        row['id']: row
+        for row in Video.objects.filter(pk__in=video_ids).values('id', 'duration', 'course_id')
+    }
+    existing = {
+        (row.student_id, row.video_id): row
+        for row in VideoProgress.objects.filter(video_id__in=video_ids, student_id__in=student_ids)
+        if (row.student_id, row.video_id) in entries
+    }
+
+    to_update, to_create = [], []
+    deltas = {}
+    for (student_id, video_id), (watched_duration, watched_at) in entries.items():
+        video = videos.get(video_id)
+        if video is None:
+            continue
+        percent, completed = completion_for(watched_duration, video['duration'])
+        row = existing.get((student_id, video_id))
+        if row is None:
+            row = VideoProgress(student_id=student_id, video_id=video_id)
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        delta = deltas.setdefault((student_id, video['course_id']), [0, 0])
+        delta[0] += int(completed and not row.is_completed)
+        delta[1] += watched_duration - row.watched_duration
+        row.watched_duration = watched_duration
+        row.completion_percent = percent
+        row.is_completed = row.is_completed or completed
+        row.last_watched_at = watched_at
+
+    with transaction.atomic():
+        if to_update:
+            VideoProgress.objects.bulk_update(
+                to_update, ['watched_duration', 'completion_percent', 'is_completed', 'last_watched_at']
+            )
+        if to_create:
+            VideoProgress.objects.bulk_create(
+                to_create,
+                update_conflicts=True,
+                unique_fields=['video', 'student'],
+                update_fields=['watched_duration', 'completion_percent', 'is_completed', 'last_watched_at'],
+            )
+        for (student_id, course_id), (completed_videos, watched_seconds) in deltas.items():
+            adjust_enrollment_progress(student_id, course_id, completed_videos, watched_seconds)
+
+
+def record_heartbeat(student_id, video_id, watched_duration, duration):
+    """
+    Accept one progress heartbeat.
+
+    Returns:
+        tuple: (completion_percent, is_completed) as seen by the player
+    """
+    percent, completed = completion_for(watched_duration, duration)
+    row_key = _row_cache_key(student_id, video_id)
+    if cache.get(row_key):
+        progress_buffer.add(student_id, video_id, watched_duration)
+    else:
+        # First heartbeat in a while: write through so the row exists now
+        write_progress({(student_id, video_id): (watched_duration, timezone.now())})
+        cache.set(row_key, True, timeout=PROGRESS_ROW_TIMEOUT)
+    return percent, completed
+
+
+progress_buffer = ProgressBuffer()
+atexit.register(progress_buffer.flush)
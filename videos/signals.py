@@ -0,0 +1,80 @@
+"""
+Signal handlers that keep course-level video counters, enrollment progress
+counters and cached video metadata in sync.
+"""
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from courses.progress import adjust_enrollment_progress, rebuild_enrollment_progress, refresh_course_progress
+from courses.stats import adjust_course_stats
+from .models import Video, VideoProgress
+from .progress import get_video_meta, invalidate_video_meta
+from .streaming import invalidate_stream_info
+
+
+@receiver(post_save, sender=Video)
+def video_saved(sender, instance, created, raw=False, **kwargs):
+    invalidate_video_meta(instance.pk)
+    invalidate_stream_info(instance.pk)
+    if created and not raw:
+        adjust_course_stats(instance.course_id, video_count=1)
+        refresh_course_progress(instance.course_id)
+
+
+@receiver(post_delete, sender=Video)
+def video_deleted(sender, instance, **kwargs):
+    invalidate_video_meta(instance.pk)
+    invalidate_stream_info(instance.pk)
+    adjust_course_stats(instance.course_id, create_missing=False, video_count=-1)
+    refresh_course_progress(instance.course_id)
+
+
+@receiver(post_init, sender=VideoProgress)
+def remember_progress_state(sender, instance, **kwargs):
+    """
+    Remember the loaded state so post_save can compute a delta.
+
+    Deferred fields are not read (that would refetch the row and fire
+    post_init again); the handlers rebuild the course's progress instead.
+    """
+    values = instance.__dict__
+    instance._progress_known = 'is_completed' in values and 'watched_duration' in values
+    instance._progress_completed = values.get('is_completed', False)
+    instance._progress_watched = values.get('watched_duration', 0)
+
+
+def _progress_course_id(instance):
+    meta = get_video_meta(instance.video_id)
+    return meta[1] if meta else None
+
+
+@receiver(post_save, sender=VideoProgress)
+def progress_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created and not instance._progress_known:
+        rebuild_enrollment_progress([_progress_course_id(instance)])
+        remember_progress_state(sender, instance)
+        return
+    was_completed = not created and instance._progress_completed
+    was_watched = 0 if created else instance._progress_watched
+    adjust_enrollment_progress(
+        instance.student_id,
+        _progress_course_id(instance),
+        completed_videos=int(instance.is_completed) - int(was_completed),
+        watched_seconds=instance.watched_duration - was_watched,
+    )
+    remember_progress_state(sender, instance)
+
+
+@receiver(post_delete, sender=VideoProgress)
+def progress_deleted(sender, instance, **kwargs):
+    if not instance._progress_known:
+        if 'video_id' in instance.__dict__:
+            rebuild_enrollment_progress([_progress_course_id(instance)])
+        return
+    adjust_enrollment_progress(
+        instance.student_id,
+        _progress_course_id(instance),
+        completed_videos=-int(instance._progress_completed),
+        watched_seconds=-instance._progress_watched,
+    )
@@ -0,0 +1,211 @@
+"""
+S3 access for video playback.
+
+One boto3 client is created lazily per process and shared by all threads
+(boto3 clients are thread-safe). Presigned GET URLs are cached in an LRU
+with TTL keyed by (object key, user bucket) and reused until they are
+within S3_PRESIGNED_URL_REFRESH_MARGIN seconds of expiring.
+
+Point AWS_S3_ENDPOINT_URL at moto_server or MinIO to run against a local
+S3 stand-in.
+"""
+from collections import OrderedDict
+from django.conf import settings
+import mimetypes
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PresignedURLCache:
+    """Thread-safe LRU cache of presigned URLs with per-entry expiry."""
+
+    def __init__(self, max_entries=10000, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key, min_remaining=0):
+        """Return a cached URL valid for at least min_remaining seconds."""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            url, expires_at = entry
+            if expires_at - self.clock() <= min_remaining:
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return url
+
+    def set(self, cache_key, url, ttl):
+        with self._lock:
+            self._entries[cache_key] = (url, self.clock() + ttl)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class VideoStorageService:
+    """Signs S3 URLs for video objects with a shared client and URL cache."""
+
+    def __init__(self, client_factory=None, clock=time.monotonic):
+        self._client_factory = client_factory or self._create_client
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.url_cache = PresignedURLCache(
+            max_entries=getattr(settings, 'S3_PRESIGNED_URL_CACHE_SIZE', 10000),
+            clock=clock,
+        )
+
+    @staticmethod
+    def _create_client():
+        import boto3
+        from botocore.config import Config
+
+        return boto3.session.Session().client(
+            's3',
+            region_name=getattr(settings, 'AWS_S3_REGION_NAME', None),
+            endpoint_url=getattr(settings, 'AWS_S3_ENDPOINT_URL', None) or None,
+            config=Config(
+                signature_version='s3v4',
+                max_pool_connections=getattr(settings, 'S3_MAX_POOL_CONNECTIONS', 20),
+            ),
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    @property
+    def bucket(self):
+        return getattr(settings, 'AWS_STORAGE_BUCKET_NAME', '')
+
+    @staticmethod
+    def user_bucket(user):
+        """Spread users over a fixed number of URL cache partitions."""
+        buckets = getattr(settings, 'S3_URL_USER_BUCKETS', 16)
+        user_id = getattr(user, 'pk', None) or 0
+        return user_id % buckets
+
+    def _sign(self, key, expires_in):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': key},
+            ExpiresIn=expires_in,
+        )
+
+    def presigned_url(self, key, user=None):
+        """Presigned GET URL for one object key, reused while fresh."""
+        return self.presigned_urls([key], user)[key]
+
+    def presigned_urls(self, keys, user=None):
+        """
+        Presigned GET URLs for many object keys in one call.
+
+        Args:
+            keys (iterable): S3 object keys
+            user: Viewer used to pick the cache partition
+
+        Returns:
+            dict: key -> URL
+        """
+        expires_in = getattr(settings, 'S3_PRESIGNED_URL_EXPIRY', 3600)
+        margin = getattr(settings, 'S3_PRESIGNED_URL_REFRESH_MARGIN', 300)
+        bucket = self.user_bucket(user)
+
+        urls = {}
+        for key in keys:
+            if not key or key in urls:
+                continue
+            cache_key = (key, bucket)
+            url = self.url_cache.get(cache_key, min_remaining=margin)
+            if url is None:
+                url = self._sign(key, expires_in)
+                self.url_cache.set(cache_key, url, expires_in)
+            urls[key] = url
+        return urls
+
+    def upload_directory(self, local_dir, key_prefix, cache_control=None):
+        """
+        Upload every file under local_dir to key_prefix/<relative path>.
+
+        Returns:
+            list: Uploaded object keys
+        """
+        keys = []
+        for root, _, files in os.walk(local_dir):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                relative = os.path.relpath(path, local_dir).replace(os.sep, '/')
+                key = f"{key_prefix.rstrip('/')}/{relative}"
+                extra = {'ContentType': guess_content_type(filename)}
+                if cache_control:
+                    extra['CacheControl'] = cache_control
+                self.client.upload_file(path, self.bucket, key, ExtraArgs=extra)
+                keys.append(key)
+        return keys
+
+    def read_object(self, key):
+        """Body of an object as bytes (small objects such as manifests)."""
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+
+STREAM_CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.mpd': 'application/dash+xml',
+    '.m4s': 'video/iso.segment',
+}
+
+
+def guess_content_type(name):
+    extension = os.path.splitext(name)[1].lower()
+    return STREAM_CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_storage_service():
+    """Process-wide VideoStorageService instance."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = VideoStorageService()
+    return _service
+
+
+def set_storage_service(service):
+    """Replace the process-wide service (tests, local S3 stand-ins)."""
+    global _service
+    with _service_lock:
+        _service = service
+
+
+def presigned_video_url(key, user=None):
+    return get_storage_service().presigned_url(key, user)
+
+
+def presigned_video_urls(videos, user=None):
+    """Map video id -> presigned URL for every video stored in S3."""
+    keyed = {video.id: video.s3_video_key for video in videos if video.s3_video_key}
+    urls = get_storage_service().presigned_urls(keyed.values(), user)
+    return {video_id: urls[key] for video_id, key in keyed.items()}
@@ -0,0 +1,294 @@
+"""
+Video file streaming with HTTP range support.
+
+Three delivery modes, chosen by settings.VIDEO_STREAM_MODE:
+- 'direct': the response wraps the open file so the WSGI server can hand it
+  to os.sendfile (gunicorn does this through wsgi.file_wrapper). Single
+  ranges are served the same way by seeking first and limiting
+  Content-Length, so the worker thread never copies bytes through Python.
+- 'x-accel-redirect': nginx serves the file from an internal location.
+- 'x-sendfile': Apache/lighttpd mod_xsendfile serves the file.
+
+Conditional requests (If-None-Match, If-Modified-Since, If-Range) are
+answered from the file's size and mtime. Multiple ranges are sent as
+multipart/byteranges, read in VIDEO_STREAM_BLOCK_SIZE blocks.
+
+HLS/DASH output written by the transcoding worker is served one file at a
+time through the same path; get_stream_info() caches what the segment
+endpoint needs to know about a video so segment requests skip the database.
+Segment URLs are predictable, so segments are only ever marked `public`
+when the URL carries an expiring signature (see segment_cache_control).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from .models import Video
+import mimetypes
+import os
+import posixpath
+import re
+import uuid
+
+MAX_RANGES = 16
+SEGMENT_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+STREAM_INFO_TIMEOUT = 600
+
+# <file> or <subdirectory>/<file>; no path traversal possible
+STREAM_ASSET_RE = re.compile(r'^(?:[\w-]+/)?[\w-]+\.(m3u8|mpd|ts|m4s)$')
+MANIFEST_EXTENSIONS = ('m3u8', 'mpd')
+
+
+def _block_size():
+    return getattr(settings, 'VIDEO_STREAM_BLOCK_SIZE', 1024 * 1024)
+
+
+def _stream_mode():
+    return getattr(settings, 'VIDEO_STREAM_MODE', 'direct')
+
+
+def make_etag(stat):
+    """Strong validator built from file size and mtime."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range_header(header, size):
+    """
+    Parse a bytes Range header into a list of inclusive (start, end) tuples.
+
+    Returns None when the header is absent, malformed or asks for too many
+    ranges (the caller then serves the whole file), and an empty list when
+    the header is valid but no range is satisfiable (416).
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+
+    ranges = []
+    specs = header[len('bytes='):].split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+    for spec in specs:
+        start, sep, end = spec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if start:
+                start = int(start)
+                end = int(end) if end else max(size - 1, start)
+                if end < start:
+                    return None
+            else:
+                # Suffix range: the last N bytes
+                length = int(end)
+                if length == 0:
+                    continue
+                start = max(size - length, 0)
+                end = size - 1
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    return ranges
+
+
+def _if_range_allows(request, etag, last_modified):
+    """Whether a Range header may be honored given If-Range."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+class RangeFile:
+    """
+    File wrapper that exposes only [start, start + length).
+
+    fileno() lets gunicorn sendfile from the current offset for at most
+    Content-Length bytes; read() enforces the same limit for servers that
+    iterate the wrapper instead.
+    """
+
+    def __init__(self, path, start, length, block_size):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.remaining = length
+        self.block_size = block_size
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _multipart_body(path, ranges, size, content_type, boundary, block_size):
+    with open(path, 'rb') as f:
+        for start, end in ranges:
+            yield (
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+            ).encode()
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(block_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+def _multipart_length(ranges, size, content_type, boundary):
+    length = len(f'\r\n--{boundary}--\r\n')
+    for start, end in ranges:
+        length += len(
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        )
+        length += end - start + 1
+    return length
+
+
+def _proxy_response(mode, path, relative_name, content_type):
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'VIDEO_STREAM_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative_name.lstrip('/')
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def serve_file(request, path, relative_name='', content_type=None):
+    """
+    Build a response for a local media file honoring Range and validators.
+
+    Args:
+        request: The incoming request
+        path (str): Absolute filesystem path
+        relative_name (str): Storage name, used for X-Accel-Redirect
+        content_type (str): Defaults to a guess from the file extension
+
+    Returns:
+        HttpResponse: 200, 206, 304, 412 or 416 response
+    """
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'video/mp4'
+    mode = _stream_mode()
+    if mode in ('x-accel-redirect', 'x-sendfile'):
+        # The proxy handles ranges and validators itself
+        return _proxy_response(mode, path, relative_name, content_type)
+
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = make_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return conditional
+
+    block_size = _block_size()
+    ranges = None
+    if request.method in ('GET', 'HEAD') and _if_range_allows(request, etag, last_modified):
+        ranges = parse_range_header(request.META.get('HTTP_RANGE', ''), size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif not ranges:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response.block_size = block_size
+        response['Content-Length'] = size
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        length = end - start + 1
+        response = FileResponse(RangeFile(path, start, length, block_size), content_type=content_type, status=206)
+        response.block_size = block_size
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        boundary = uuid.uuid4().hex
+        response = StreamingHttpResponse(
+            _multipart_body(path, ranges, size, content_type, boundary, block_size),
+            content_type=f'multipart/byteranges; boundary={boundary}',
+            status=206,
+        )
+        response['Content-Length'] = _multipart_length(ranges, size, content_type, boundary)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def get_stream_info(video_id):
+    """
+    Cached segment-serving details for a video, or None if it does not exist.
+
+    Returns:
+        dict: course_id, instructor_id, base (directory holding the
+        manifests as a storage name or S3 key prefix, None before the video
+        is transcoded) and in_s3
+    """
+    cache_key = f'videos:streams:{video_id}'
+    info = cache.get(cache_key)
+    if info is None:
+        row = (
+            Video.objects.filter(pk=video_id)
+            .values('course_id', 'course__instructor_id', 'hls_manifest', 'streams_in_s3')
+            .first()
+        )
+        if row is None:
+            return None
+        # DASH output, when present, lives in a subdirectory of the same base
+        info = {
+            'course_id': row['course_id'],
+            'instructor_id': row['course__instructor_id'],
+            'base': posixpath.dirname(row['hls_manifest']) if row['hls_manifest'] else None,
+            'in_s3': row['streams_in_s3'],
+        }
+        cache.set(cache_key, info, timeout=STREAM_INFO_TIMEOUT)
+    return info
+
+
+def invalidate_stream_info(video_id):
+    cache.delete(f'videos:streams:{video_id}')
+
+
+def parse_stream_asset(name):
+    """Return (name, is_manifest) for a valid asset name, or None."""
+    match = STREAM_ASSET_RE.match(name or '')
+    if match is None:
+        return None
+    return name, match.group(1) in MANIFEST_EXTENSIONS
+
+
+def segment_cache_control(signed=False):
+    """
+    Cache-Control for an HLS/DASH segment.
+
+    VIDEO_SEGMENT_CACHE_CONTROL may only be `public` for signed, expiring
+    URLs (S3 presigned URLs). Segments served by stream_asset are checked
+    against the viewer's enrollment, which a shared cache or CDN would
+    bypass, so `public` is downgraded to `private` for them.
+    """
+    value = getattr(settings, 'VIDEO_SEGMENT_CACHE_CONTROL', SEGMENT_CACHE_CONTROL)
+    if not signed:
+        value = re.sub(r'\bpublic\b', 'private', value)
+    return value
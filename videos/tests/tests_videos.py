@@ -3,9 +3,26 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from courses.models import Course, Enrollment
-from videos.models import Video, VideoProgress, TranscodingJob
+from videos.models import Video, VideoProgress, TranscodingJob, ChunkedUpload
+from videos.progress import progress_buffer, record_heartbeat
+from videos.streaming import segment_cache_control
+from videos.transcoding import claim_jobs, complete_job, fail_job, hls_command, ladder_rungs, renew_leases, DEFAULT_LADDER, _transcode_local
+from videos.storage import PresignedURLCache, VideoStorageService, set_storage_service, presigned_video_urls
+from videos.uploads import UploadError, complete_upload, purge_stale_uploads
+from courses.models import CourseResource
+from django.test import override_settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
+import hashlib
 import os
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from unittest import mock
 
 User = get_user_model()
 
@@ -143,6 +160,7 @@ class VideoViewTestCase(TestCase):
     def setUp(self):
         """Set up test client and data"""
         self.client = Client()
+        cache.clear()
         
         self.instructor = User.objects.create_user(
             username='instructor@example.com',
@@ -257,3 +275,791 @@ class VideoViewTestCase(TestCase):
         self.assertEqual(data['status'], 'success')
         self.assertTrue(data['is_completed'])
         self.assertEqual(float(data['completion_percent']), 90.0)
+
+
+class VideoStreamingTestCase(TestCase):
+    """Test range and conditional handling for local video streaming"""
+    
+    def setUp(self):
+        """Set up a real video file under a temporary MEDIA_ROOT"""
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, VIDEO_STREAM_MODE='direct')
+        self.settings_override.enable()
+        
+        os.makedirs(os.path.join(self.media_root, 'videos'))
+        self.data = bytes(range(256)) * 40  # 10240 bytes
+        with open(os.path.join(self.media_root, 'videos', 'clip.mp4'), 'wb') as f:
+            f.write(self.data)
+        
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Streaming Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+        
+        self.video = Video.objects.create(
+            course=self.course,
+            title='Clip',
+            video_file='videos/clip.mp4',
+            duration=60
+        )
+        self.url = reverse('videos:stream_video', args=[self.video.id])
+        self.client.login(username='instructor@example.com', password='testpass123')
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+    
+    def body(self, response):
+        return b''.join(response.streaming_content)
+    
+    def test_full_response(self):
+        """Test a plain GET returns the whole file with validators"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+    
+    def test_single_range(self):
+        """Test a single range returns 206 with exactly those bytes"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(self.body(response), self.data[100:200])
+    
+    def test_suffix_range(self):
+        """Test a suffix range returns the last N bytes"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.data[-10:])
+    
+    def test_multiple_ranges(self):
+        """Test multiple ranges are returned as multipart/byteranges"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9,500-509')
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges'))
+        body = self.body(response)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        self.assertIn(self.data[0:10], body)
+        self.assertIn(self.data[500:510], body)
+    
+    def test_unsatisfiable_range(self):
+        """Test a range past the end returns 416"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=999999-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+    
+    def test_conditional_requests(self):
+        """Test If-None-Match and stale If-Range handling"""
+        etag = self.client.get(self.url)['ETag']
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+    
+    def test_accel_redirect_mode(self):
+        """Test proxy offload mode returns only the internal redirect header"""
+        with override_settings(VIDEO_STREAM_MODE='x-accel-redirect', VIDEO_STREAM_ACCEL_PREFIX='/protected-media/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/videos/clip.mp4')
+        self.assertEqual(response.content, b'')
+
+
+class FakeS3Client:
+    """Stand-in for boto3's S3 client that records signing calls"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        self.calls += 1
+        return f"https://s3.test/{Params['Bucket']}/{Params['Key']}?sig={self.calls}"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+@override_settings(
+    AWS_STORAGE_BUCKET_NAME='videos-bucket',
+    S3_PRESIGNED_URL_EXPIRY=3600,
+    S3_PRESIGNED_URL_REFRESH_MARGIN=300,
+    S3_URL_USER_BUCKETS=4,
+)
+class VideoStorageServiceTestCase(TestCase):
+    """Test presigned URL reuse and batching"""
+    
+    def setUp(self):
+        self.client_stub = FakeS3Client()
+        self.clock = FakeClock()
+        self.factory_calls = 0
+        
+        def factory():
+            self.factory_calls += 1
+            return self.client_stub
+        
+        self.service = VideoStorageService(client_factory=factory, clock=self.clock)
+    
+    def test_url_reused_until_refresh_margin(self):
+        """Test a URL is reused until it is close to expiry"""
+        first = self.service.presigned_url('videos/a.mp4')
+        self.clock.now = 3000
+        self.assertEqual(self.service.presigned_url('videos/a.mp4'), first)
+        
+        self.clock.now = 3400  # within the 300 second margin
+        self.assertNotEqual(self.service.presigned_url('videos/a.mp4'), first)
+        self.assertEqual(self.client_stub.calls, 2)
+    
+    def test_client_created_once(self):
+        """Test the S3 client is built once and shared"""
+        self.service.presigned_urls(['a', 'b', 'c'])
+        self.service.presigned_url('d')
+        self.assertEqual(self.factory_calls, 1)
+    
+    def test_batch_signs_only_misses(self):
+        """Test batch signing reuses cached entries"""
+        self.service.presigned_url('videos/a.mp4')
+        urls = self.service.presigned_urls(['videos/a.mp4', 'videos/b.mp4', 'videos/b.mp4'])
+        self.assertEqual(set(urls), {'videos/a.mp4', 'videos/b.mp4'})
+        self.assertEqual(self.client_stub.calls, 2)
+    
+    def test_cache_partitioned_by_user_bucket(self):
+        """Test users in different buckets get separately cached URLs"""
+        user_a = User(pk=1)
+        user_b = User(pk=2)
+        self.service.presigned_url('videos/a.mp4', user_a)
+        self.service.presigned_url('videos/a.mp4', user_a)
+        self.service.presigned_url('videos/a.mp4', user_b)
+        self.assertEqual(self.client_stub.calls, 2)
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first"""
+        cache = PresignedURLCache(max_entries=2, clock=self.clock)
+        cache.set('a', 'url-a', 60)
+        cache.set('b', 'url-b', 60)
+        cache.get('a')
+        cache.set('c', 'url-c', 60)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'url-a')
+    
+    def test_presigned_video_urls_for_course_page(self):
+        """Test the module-level batch helper maps video ids to URLs"""
+        set_storage_service(self.service)
+        self.addCleanup(set_storage_service, None)
+        videos = [Video(id=1, s3_video_key='k1'), Video(id=2, s3_video_key=None), Video(id=3, s3_video_key='k3')]
+        self.assertEqual(set(presigned_video_urls(videos)), {1, 3})
+    
+    @unittest.skipUnless(importlib.util.find_spec('moto'), 'moto is not installed')
+    @override_settings(AWS_S3_REGION_NAME='us-east-1', AWS_S3_ENDPOINT_URL='')
+    def test_signs_against_moto(self):
+        """Test the real boto3 client path against moto's S3 stand-in"""
+        from moto import mock_aws
+        
+        with mock_aws():
+            service = VideoStorageService()
+            service.client.create_bucket(Bucket='videos-bucket')
+            url = service.presigned_url('videos/a.mp4')
+            self.assertIn('videos/a.mp4', url)
+            self.assertEqual(service.presigned_url('videos/a.mp4'), url)
+
+
+@override_settings(VIDEO_PROGRESS_FLUSH_THREAD=False, VIDEO_PROGRESS_FLUSH_SIZE=100, VIDEO_PROGRESS_FLUSH_INTERVAL=3600)
+class ProgressBufferTestCase(TestCase):
+    """Test write-behind buffering of progress heartbeats"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        progress_buffer.drain()
+        
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.student = User.objects.create_user(
+            username='student@example.com',
+            email='student@example.com',
+            password='testpass123',
+            role='student'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Progress Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+        
+        self.videos = [
+            Video.objects.create(course=self.course, title=f'Lesson {i}', video_file=f'videos/{i}.mp4', duration=100)
+            for i in range(2)
+        ]
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+    
+    def tearDown(self):
+        progress_buffer.drain()
+    
+    def heartbeat(self, video, watched):
+        return record_heartbeat(self.student.id, video.id, watched, video.duration)
+    
+    def test_first_heartbeat_writes_through(self):
+        """Test the first heartbeat creates the progress row immediately"""
+        self.heartbeat(self.videos[0], 10)
+        self.assertEqual(VideoProgress.objects.get(video=self.videos[0]).watched_duration, 10)
+        self.assertEqual(len(progress_buffer), 0)
+    
+    def test_later_heartbeats_are_coalesced(self):
+        """Test repeated heartbeats keep only the latest value until flushed"""
+        self.heartbeat(self.videos[0], 10)
+        for watched in (20, 30, 40):
+            self.heartbeat(self.videos[0], watched)
+        
+        self.assertEqual(len(progress_buffer), 1)
+        self.assertEqual(VideoProgress.objects.get(video=self.videos[0]).watched_duration, 10)
+        
+        self.assertEqual(progress_buffer.flush(), 1)
+        self.assertEqual(VideoProgress.objects.get(video=self.videos[0]).watched_duration, 40)
+    
+    def test_size_threshold_triggers_flush(self):
+        """Test the buffer flushes itself once it holds enough entries"""
+        for video in self.videos:
+            self.heartbeat(video, 10)
+        with self.settings(VIDEO_PROGRESS_FLUSH_SIZE=2):
+            for video in self.videos:
+                self.heartbeat(video, 50)
+        
+        self.assertEqual(len(progress_buffer), 0)
+        self.assertEqual(
+            list(VideoProgress.objects.order_by('video_id').values_list('watched_duration', flat=True)),
+            [50, 50]
+        )
+    
+    def test_flush_rolls_up_enrollment_progress(self):
+        """Test completion flips update the enrollment during the flush"""
+        for video in self.videos:
+            self.heartbeat(video, 10)
+        self.heartbeat(self.videos[0], 95)
+        progress_buffer.flush()
+        
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress_percentage, Decimal('50.00'))
+        self.assertIsNone(self.enrollment.completed_at)
+        
+        self.heartbeat(self.videos[1], 100)
+        progress_buffer.flush()
+        
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress_percentage, Decimal('100.00'))
+        self.assertIsNotNone(self.enrollment.completed_at)
+    
+    def test_deferred_fields_are_not_loaded(self):
+        """Test progress rows loaded with only() keep the enrollment counters right"""
+        self.heartbeat(self.videos[0], 10)
+        
+        progress = VideoProgress.objects.only('id').get()
+        self.assertFalse(progress._progress_known)
+        progress.watched_duration = 95
+        progress.is_completed = True
+        progress.save()
+        
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_videos, 1)
+        self.assertEqual(self.enrollment.watched_seconds, 95)
+    
+    def test_completion_is_sticky(self):
+        """Test rewinding after completion does not un-complete a video"""
+        self.heartbeat(self.videos[0], 95)
+        self.heartbeat(self.videos[0], 5)
+        progress_buffer.flush()
+        
+        self.assertTrue(VideoProgress.objects.get(video=self.videos[0]).is_completed)
+
+
+class TranscodingWorkerTestCase(TestCase):
+    """Test transcoding job claiming, completion and retries"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Test Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+        
+        self.video = Video.objects.create(course=self.course, title='Lesson', video_file='videos/lesson.mp4')
+        self.job = TranscodingJob.objects.create(video=self.video, source_file='videos/lesson.mp4')
+    
+    def test_claim_marks_jobs_processing(self):
+        """Test claimed jobs move to processing and count an attempt"""
+        jobs = claim_jobs(5)
+        
+        self.assertEqual([job.pk for job in jobs], [self.job.pk])
+        self.assertEqual(jobs[0].status, 'processing')
+        self.assertEqual(jobs[0].attempts, 1)
+        self.assertIsNotNone(jobs[0].started_at)
+        self.assertEqual(claim_jobs(5), [])
+    
+    def test_claim_respects_backoff_and_reclaims_stale_jobs(self):
+        """Test jobs waiting for a retry are skipped and expired leases reclaimed"""
+        TranscodingJob.objects.filter(pk=self.job.pk).update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(claim_jobs(5), [])
+        
+        TranscodingJob.objects.filter(pk=self.job.pk).update(
+            status='processing', started_at=timezone.now() - timedelta(hours=2)
+        )
+        with self.settings(TRANSCODE_JOB_LEASE=3600):
+            self.assertEqual([job.pk for job in claim_jobs(5)], [self.job.pk])
+    
+    def test_renewed_lease_is_not_reclaimed(self):
+        """Test a running job keeps its lease past the ffmpeg timeout while renewed"""
+        job = claim_jobs(1)[0]
+        TranscodingJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        
+        with self.settings(TRANSCODE_JOB_LEASE=300):
+            self.assertEqual(renew_leases([job]), [])
+            self.assertEqual(claim_jobs(5), [])
+            
+            TranscodingJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+            reclaimed = claim_jobs(5)
+        self.assertEqual(reclaimed[0].attempts, 2)
+        self.assertEqual(renew_leases([job]), [job.pk])
+    
+    def test_failures_retry_then_fail_video(self):
+        """Test failed jobs back off and give up after the last attempt"""
+        with self.settings(TRANSCODE_MAX_ATTEMPTS=2):
+            job = claim_jobs(1)[0]
+            fail_job(job, 'boom')
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'pending')
+            self.assertGreater(job.next_attempt_at, timezone.now())
+            
+            TranscodingJob.objects.filter(pk=job.pk).update(next_attempt_at=None)
+            job = claim_jobs(1)[0]
+            fail_job(job, 'boom again')
+        
+        job.refresh_from_db()
+        self.video.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error_message, 'boom again')
+        self.assertEqual(self.video.status, 'failed')
+    
+    def test_complete_job_updates_video(self):
+        """Test a successful result fills in duration, thumbnail and status"""
+        output_dir = os.path.join(self.media_root, 'videos', 'streams', '1', '1')
+        with self.settings(MEDIA_ROOT=self.media_root):
+            job = claim_jobs(1)[0]
+            complete_job(job, {
+                'duration': 125,
+                'renditions': ['720p'],
+                'output_dir': output_dir,
+                'hls_manifest': os.path.join(output_dir, 'master.m3u8'),
+                'dash_manifest': None,
+                'thumbnail': os.path.join(self.media_root, 'video_thumbnails', '1.jpg'),
+                's3_prefix': None,
+            })
+        
+        job.refresh_from_db()
+        self.video.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.output_file, 'videos/streams/1/1')
+        self.assertEqual(self.video.status, 'ready')
+        self.assertEqual(self.video.duration, 125)
+        self.assertEqual(self.video.thumbnail.name, 'video_thumbnails/1.jpg')
+        self.assertEqual(self.video.hls_manifest, 'videos/streams/1/1/master.m3u8')
+        self.assertFalse(self.video.streams_in_s3)
+    
+    def test_local_output_removed_after_s3_upload(self):
+        """Test renditions uploaded to S3 do not stay on the worker's disk"""
+        source = os.path.join(self.media_root, 'lesson.mp4')
+        open(source, 'wb').close()
+        output_dir = os.path.join(self.media_root, 'videos', 'streams', '1', '1')
+        spec = {
+            'source': source,
+            'output_dir': output_dir,
+            'thumbnail': os.path.join(self.media_root, 'video_thumbnails', '1.jpg'),
+            'ladder': DEFAULT_LADDER,
+            'segment_seconds': 6,
+            'dash': False,
+            's3_prefix': 'videos/streams/1/1',
+            'cache_control': 'private',
+            'timeout': 60,
+        }
+        storage = mock.Mock()
+        with mock.patch('videos.transcoding._run', return_value=''), \
+                mock.patch('videos.transcoding.probe_duration', return_value=10), \
+                mock.patch('videos.transcoding.probe_streams', return_value=(720, True)), \
+                mock.patch('videos.transcoding.get_storage_service', return_value=storage):
+            result = _transcode_local(spec)
+        
+        storage.upload_directory.assert_called_once_with(output_dir, 'videos/streams/1/1', cache_control='private')
+        self.assertEqual(result['s3_prefix'], 'videos/streams/1/1')
+        self.assertFalse(os.path.exists(output_dir))
+    
+    def test_ladder_skips_renditions_above_source(self):
+        """Test the ladder is capped at the source height and decoded once"""
+        rungs = ladder_rungs(DEFAULT_LADDER, source_height=720)
+        command, playlists = hls_command('in.mp4', 'out', rungs, has_audio=False)
+        
+        self.assertEqual(list(playlists), ['720p', '480p', '360p'])
+        self.assertEqual(command.count('-i'), 1)
+        self.assertIn('v:0,name:720p v:1,name:480p v:2,name:360p', command)
+    
+    def test_worker_command_records_missing_source(self):
+        """Test the worker runs jobs through the pool and records failures"""
+        with self.settings(MEDIA_ROOT=self.media_root, TRANSCODE_MAX_ATTEMPTS=1):
+            call_command('transcode_videos', '--once', '--concurrency', '1', stdout=open(os.devnull, 'w'))
+        
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'failed')
+        self.assertIn('Source file not found', self.job.error_message)
+
+
+class StreamAssetTestCase(TestCase):
+    """Test serving HLS manifests and segments"""
+    
+    def setUp(self):
+        """Set up test client and a transcoded video on disk"""
+        cache.clear()
+        self.client = Client()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.student = User.objects.create_user(
+            username='student@example.com',
+            email='student@example.com',
+            password='testpass123',
+            role='student'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Test Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+        
+        self.video = Video.objects.create(
+            course=self.course,
+            title='Lesson',
+            video_file='videos/lesson.mp4',
+            hls_manifest='videos/streams/1/1/master.m3u8'
+        )
+        
+        stream_dir = os.path.join(self.media_root, 'videos', 'streams', '1', '1')
+        os.makedirs(os.path.join(stream_dir, '720p'))
+        with open(os.path.join(stream_dir, 'master.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n720p/index.m3u8\n')
+        with open(os.path.join(stream_dir, '720p', 'seg_00001.ts'), 'wb') as f:
+            f.write(b'\x47' * 188)
+        
+        self.settings_override = self.settings(MEDIA_ROOT=self.media_root, VIDEO_STREAM_MODE='direct')
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+    
+    def asset_url(self, name):
+        return reverse('videos:stream_asset', args=[self.video.id, name])
+    
+    def test_requires_enrollment(self):
+        """Test unenrolled students cannot fetch segments"""
+        self.client.login(username='student@example.com', password='testpass123')
+        response = self.client.get(self.asset_url('720p/seg_00001.ts'))
+        self.assertEqual(response.status_code, 403)
+    
+    def test_segment_is_cacheable(self):
+        """Test segments are served with long-lived immutable caching"""
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.login(username='student@example.com', password='testpass123')
+        
+        response = self.client.get(self.asset_url('720p/seg_00001.ts'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'video/mp2t')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+        self.assertEqual(b''.join(response.streaming_content), b'\x47' * 188)
+    
+    @override_settings(VIDEO_SEGMENT_CACHE_CONTROL='public, max-age=31536000, immutable')
+    def test_unsigned_segment_is_never_public(self):
+        """Test shared caches cannot keep segments served behind the enrollment check"""
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.login(username='student@example.com', password='testpass123')
+        
+        response = self.client.get(self.asset_url('720p/seg_00001.ts'))
+        
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(segment_cache_control(signed=True), 'public, max-age=31536000, immutable')
+    
+    def test_manifest_has_short_private_caching(self):
+        """Test manifests are served privately"""
+        self.client.login(username='instructor@example.com', password='testpass123')
+        response = self.client.get(self.asset_url('master.m3u8'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+    
+    def test_enrollment_check_cached_in_session(self):
+        """Test repeated segment requests reuse the session access check"""
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.login(username='student@example.com', password='testpass123')
+        self.client.get(self.asset_url('720p/seg_00001.ts'))
+        
+        with self.assertNumQueries(2):  # session and user lookups only
+            response = self.client.get(self.asset_url('720p/seg_00001.ts'))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_rejects_path_traversal(self):
+        """Test asset names cannot escape the stream directory"""
+        self.client.login(username='instructor@example.com', password='testpass123')
+        response = self.client.get(self.asset_url('../../../settings.ts'))
+        self.assertEqual(response.status_code, 404)
+
+
+class FakeMultipartClient:
+    """Stand-in for boto3's S3 client that keeps multipart uploads in memory"""
+    
+    def __init__(self):
+        self.parts = {}
+        self.objects = {}
+        self.aborted = []
+    
+    def create_multipart_upload(self, Bucket, Key):
+        return {'UploadId': 'upload-1'}
+    
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, ContentLength):
+        self.parts[PartNumber] = Body.read()
+        return {'ETag': f'"etag-{PartNumber}"'}
+    
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b''.join(self.parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+    
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+
+
+class ChunkedUploadTestCase(TestCase):
+    """Test resumable chunked uploads of videos and resources"""
+    
+    def setUp(self):
+        """Set up an instructor, a course and temporary storage"""
+        self.client = Client()
+        self.media_root = tempfile.mkdtemp()
+        self.chunk_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.chunk_dir, ignore_errors=True)
+        
+        self.settings_override = self.settings(
+            MEDIA_ROOT=self.media_root,
+            CHUNKED_UPLOAD_DIR=self.chunk_dir,
+            CHUNKED_UPLOAD_CHUNK_SIZE=4,
+            USE_S3=False,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        
+        self.instructor = User.objects.create_user(
+            username='instructor@example.com',
+            email='instructor@example.com',
+            password='testpass123',
+            role='instructor'
+        )
+        
+        self.course = Course.objects.create(
+            instructor=self.instructor,
+            title='Test Course',
+            description='Test',
+            price=Decimal('99.99'),
+            status='published'
+        )
+        self.client.login(username='instructor@example.com', password='testpass123')
+    
+    def start(self, data, **extra):
+        payload = {'purpose': 'video', 'title': 'Lesson', 'filename': 'lesson.mp4', 'size': len(data)}
+        payload.update(extra)
+        response = self.client.post(reverse('videos:start_chunked_upload', args=[self.course.id]), payload)
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+    
+    def put_chunk(self, upload_id, index, data, checksum=None):
+        return self.client.put(
+            reverse('videos:upload_chunk', args=[upload_id, index]),
+            data,
+            content_type='application/octet-stream',
+            HTTP_X_CHUNK_CHECKSUM=checksum or hashlib.sha256(data).hexdigest(),
+        )
+    
+    def complete(self, upload_id):
+        return self.client.post(reverse('videos:complete_chunked_upload', args=[upload_id]))
+    
+    def test_video_round_trip(self):
+        """Test chunks sent out of order are assembled into a video with a transcoding job"""
+        data = b'0123456789'
+        upload = self.start(data)
+        self.assertEqual(upload['chunk_count'], 3)
+        
+        for index in (2, 0, 1):
+            response = self.put_chunk(upload['upload_id'], index, data[index * 4:index * 4 + 4])
+            self.assertEqual(response.status_code, 200)
+        response = self.complete(upload['upload_id'])
+        
+        self.assertEqual(response.status_code, 200)
+        video = Video.objects.get(pk=response.json()['result_id'])
+        self.assertEqual(video.title, 'Lesson')
+        with open(os.path.join(self.media_root, video.video_file.name), 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertTrue(TranscodingJob.objects.filter(video=video, source_file=video.video_file.name).exists())
+        self.assertFalse(os.path.exists(os.path.join(self.chunk_dir, upload['upload_id'])))
+    
+    def test_concurrent_completion_has_one_winner(self):
+        """Test a second completion of the same upload gets a 409 instead of a crash"""
+        data = b'01234567'
+        upload = self.start(data)
+        for index in range(2):
+            self.put_chunk(upload['upload_id'], index, data[index * 4:index * 4 + 4])
+        first = ChunkedUpload.objects.get(pk=upload['upload_id'])
+        second = ChunkedUpload.objects.get(pk=upload['upload_id'])
+        
+        result_id = complete_upload(first)
+        with self.assertRaises(UploadError) as raised:
+            complete_upload(second)
+        
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(Video.objects.get().pk, result_id)
+    
+    def test_failed_assembly_can_be_retried(self):
+        """Test an upload whose assembly fails goes back to uploading"""
+        data = b'0123'
+        upload = self.start(data)
+        self.put_chunk(upload['upload_id'], 0, data)
+        
+        with mock.patch('videos.uploads._assemble', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                complete_upload(ChunkedUpload.objects.get(pk=upload['upload_id']))
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload['upload_id']).status, 'uploading')
+        
+        self.assertEqual(self.complete(upload['upload_id']).status_code, 200)
+    
+    def test_bad_checksum_rejected(self):
+        """Test a chunk whose checksum does not match is not stored"""
+        upload = self.start(b'abcd')
+        
+        response = self.put_chunk(upload['upload_id'], 0, b'abcd', checksum='0' * 64)
+        
+        self.assertEqual(response.status_code, 422)
+        status = self.client.get(reverse('videos:chunked_upload_status', args=[upload['upload_id']])).json()
+        self.assertEqual(status['missing_chunks'], [0])
+    
+    def test_resume_reports_missing_chunks(self):
+        """Test status lists the chunks still needed and completion waits for them"""
+        data = b'0123456789'
+        upload = self.start(data)
+        self.put_chunk(upload['upload_id'], 0, data[:4])
+        
+        status = self.client.get(reverse('videos:chunked_upload_status', args=[upload['upload_id']])).json()
+        self.assertEqual(status['missing_chunks'], [1, 2])
+        self.assertEqual(self.complete(upload['upload_id']).status_code, 409)
+        
+        # Resending a chunk is harmless
+        self.put_chunk(upload['upload_id'], 0, data[:4])
+        self.put_chunk(upload['upload_id'], 1, data[4:8])
+        self.put_chunk(upload['upload_id'], 2, data[8:])
+        self.assertEqual(self.complete(upload['upload_id']).status_code, 200)
+    
+    def test_wrong_chunk_size_rejected(self):
+        """Test chunks must have exactly the expected length"""
+        upload = self.start(b'0123456789')
+        response = self.put_chunk(upload['upload_id'], 2, b'8')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_resource_upload(self):
+        """Test a chunked upload can create a course resource"""
+        data = b'%PDF-1.4 notes'
+        upload = self.start(data, purpose='resource', filename='notes.pdf', resource_type='pdf')
+        for index in range(upload['chunk_count']):
+            self.put_chunk(upload['upload_id'], index, data[index * 4:index * 4 + 4])
+        
+        response = self.complete(upload['upload_id'])
+        
+        resource = CourseResource.objects.get(pk=response.json()['result_id'])
+        self.assertEqual(resource.resource_type, 'pdf')
+        self.assertTrue(resource.file.name.startswith('course_resources/'))
+    
+    def test_only_owner_can_upload(self):
+        """Test another instructor cannot send chunks to an upload"""
+        upload = self.start(b'abcd')
+        User.objects.create_user(username='other@example.com', email='other@example.com', password='testpass123', role='instructor')
+        self.client.login(username='other@example.com', password='testpass123')
+        self.assertEqual(self.put_chunk(upload['upload_id'], 0, b'abcd').status_code, 404)
+    
+    @override_settings(USE_S3=True, CHUNKED_UPLOAD_DIRECT_TO_S3=True, AWS_STORAGE_BUCKET_NAME='videos-bucket')
+    def test_direct_to_s3(self):
+        """Test video chunks are forwarded as S3 multipart parts"""
+        fake = FakeMultipartClient()
+        set_storage_service(VideoStorageService(client_factory=lambda: fake))
+        self.addCleanup(set_storage_service, None)
+        data = b'x' * (5 * 1024 * 1024 + 3)
+        upload = self.start(data)
+        self.assertEqual(upload['mode'], 's3')
+        
+        size = upload['chunk_size']
+        for index in range(upload['chunk_count']):
+            self.put_chunk(upload['upload_id'], index, data[index * size:(index + 1) * size])
+        response = self.complete(upload['upload_id'])
+        
+        video = Video.objects.get(pk=response.json()['result_id'])
+        self.assertEqual(fake.objects[video.s3_video_key], data)
+        self.assertEqual(video.transcoding_jobs.get().source_file, f's3://{video.s3_video_key}')
+        self.assertFalse(os.listdir(self.chunk_dir))
+    
+    def test_purge_stale_uploads(self):
+        """Test idle uploads are aborted and their chunks removed"""
+        upload = self.start(b'0123456789')
+        self.put_chunk(upload['upload_id'], 0, b'0123')
+        ChunkedUpload.objects.filter(pk=upload['upload_id']).update(updated_at=timezone.now() - timedelta(days=2))
+        
+        self.assertEqual(purge_stale_uploads(ttl=3600), 1)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload['upload_id']).status, 'aborted')
+        self.assertFalse(os.path.exists(os.path.join(self.chunk_dir, upload['upload_id'])))
@@ -0,0 +1,393 @@
+"""
+Background transcoding for uploaded videos.
+
+The transcode_videos management command claims pending TranscodingJob rows
+(select_for_update with skip_locked, so several workers can share the
+queue), runs ffmpeg/ffprobe for each claimed job in a process pool and
+records the outcome. Child processes only touch the filesystem (and S3 when
+USE_S3 is on); every database write happens in the worker's main process.
+
+Each job packages the bitrate ladder as HLS (master.m3u8 plus one playlist
+and MPEG-TS segments per rendition) and, with TRANSCODE_DASH, as a DASH
+manifest with fMP4 segments. Output goes to a per-job directory under
+videos/streams/<video id>/<job id>/, so segment URLs never change content
+and can be cached as immutable.
+
+Failed jobs are retried with exponential backoff until
+TRANSCODE_MAX_ATTEMPTS is reached. A claimed job holds a lease of
+TRANSCODE_JOB_LEASE seconds that the worker renews on every poll while the
+job runs, however long its ffmpeg steps take (each one is limited to
+TRANSCODE_JOB_TIMEOUT). Jobs whose worker stopped renewing (e.g. after a
+crash) are claimed again.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from datetime import timedelta
+from .models import Video, TranscodingJob
+from .storage import get_storage_service
+from .streaming import segment_cache_control
+import json
+import os
+import random
+import shutil
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Output renditions, highest first: (name, height, video bitrate, audio bitrate)
+DEFAULT_LADDER = [
+    ('1080p', 1080, '5000k', '192k'),
+    ('720p', 720, '2800k', '128k'),
+    ('480p', 480, '1400k', '128k'),
+    ('360p', 360, '800k', '96k'),
+]
+
+STREAMS_DIR = 'videos/streams'
+HLS_MASTER = 'master.m3u8'
+DASH_MANIFEST = 'dash/manifest.mpd'
+THUMBNAIL_DIR = 'video_thumbnails'
+S3_SOURCE_PREFIX = 's3://'  # TranscodingJob.source_file for sources that only exist in S3
+
+
+class TranscodeError(Exception):
+    """ffmpeg/ffprobe failed for a job."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_ladder():
+    return _setting('TRANSCODE_LADDER', DEFAULT_LADDER)
+
+
+def probe_duration(source, timeout=60):
+    """Duration of a media file in whole seconds, via ffprobe."""
+    command = [
+        _setting('FFPROBE_BINARY', 'ffprobe'),
+        '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        source,
+    ]
+    output = _run(command, timeout)
+    try:
+        return int(float(output.strip()))
+    except ValueError:
+        raise TranscodeError(f"ffprobe returned no duration for {source}")
+
+
+def _encode_args(rungs, has_audio, segment_seconds):
+    """Filter graph, stream maps and codec options shared by HLS and DASH."""
+    split = f"[0:v]split={len(rungs)}" + ''.join(f'[v{i}]' for i in range(len(rungs)))
+    scales = ';'.join(f'[v{i}]scale=-2:{rung[1]}[v{i}out]' for i, rung in enumerate(rungs))
+    args = ['-filter_complex', f'{split};{scales}']
+    for i in range(len(rungs)):
+        args += ['-map', f'[v{i}out]']
+        if has_audio:
+            args += ['-map', '0:a:0']
+    args += [
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+        # Keyframes on segment boundaries so renditions can be switched
+        '-sc_threshold', '0', '-force_key_frames', f'expr:gte(t,n_forced*{segment_seconds})',
+    ]
+    if has_audio:
+        args += ['-c:a', 'aac', '-ac', '2']
+    for i, (_, _, video_bitrate, audio_bitrate) in enumerate(rungs):
+        args += [f'-b:v:{i}', video_bitrate, f'-maxrate:v:{i}', video_bitrate, f'-bufsize:v:{i}', video_bitrate]
+        if has_audio:
+            args += [f'-b:a:{i}', audio_bitrate]
+    return args
+
+
+def ladder_rungs(ladder, source_height=None):
+    """Rungs no taller than the source (the lowest rung is always kept)."""
+    return [rung for rung in ladder if source_height is None or rung[1] <= source_height] or ladder[-1:]
+
+
+def hls_command(source, output_dir, rungs, has_audio=True, segment_seconds=6):
+    """
+    One ffmpeg invocation packaging every rendition as HLS.
+
+    The input is decoded once and split per rendition.
+
+    Returns:
+        tuple: (command list, {rendition name: playlist path})
+    """
+    if has_audio:
+        stream_map = ' '.join(f'v:{i},a:{i},name:{rung[0]}' for i, rung in enumerate(rungs))
+    else:
+        stream_map = ' '.join(f'v:{i},name:{rung[0]}' for i, rung in enumerate(rungs))
+    command = [_setting('FFMPEG_BINARY', 'ffmpeg'), '-y', '-v', 'error', '-i', source]
+    command += _encode_args(rungs, has_audio, segment_seconds)
+    command += [
+        '-f', 'hls',
+        '-hls_time', str(segment_seconds),
+        '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(output_dir, '%v', 'seg_%05d.ts'),
+        '-master_pl_name', HLS_MASTER,
+        '-var_stream_map', stream_map,
+        os.path.join(output_dir, '%v', 'index.m3u8'),
+    ]
+    playlists = {rung[0]: os.path.join(output_dir, rung[0], 'index.m3u8') for rung in rungs}
+    return command, playlists
+
+
+def dash_command(source, output_dir, rungs, has_audio=True, segment_seconds=6):
+    """ffmpeg invocation packaging the ladder as DASH. Returns (command, manifest path)."""
+    manifest = os.path.join(output_dir, DASH_MANIFEST)
+    adaptation_sets = 'id=0,streams=v id=1,streams=a' if has_audio else 'id=0,streams=v'
+    command = [_setting('FFMPEG_BINARY', 'ffmpeg'), '-y', '-v', 'error', '-i', source]
+    command += _encode_args(rungs, has_audio, segment_seconds)
+    command += [
+        '-f', 'dash',
+        '-seg_duration', str(segment_seconds),
+        '-use_template', '1',
+        '-use_timeline', '1',
+        '-init_seg_name', 'init-$RepresentationID$.m4s',
+        '-media_seg_name', 'chunk-$RepresentationID$-$Number%05d$.m4s',
+        '-adaptation_sets', adaptation_sets,
+        manifest,
+    ]
+    return command, manifest
+
+
+def thumbnail_command(source, destination, at_seconds):
+    return [
+        _setting('FFMPEG_BINARY', 'ffmpeg'), '-y', '-v', 'error',
+        '-ss', str(at_seconds), '-i', source,
+        '-frames:v', '1', '-vf', 'scale=640:-2',
+        destination,
+    ]
+
+
+def probe_streams(source, timeout=60):
+    """Return (video height or None, has_audio) for a media file."""
+    command = [
+        _setting('FFPROBE_BINARY', 'ffprobe'),
+        '-v', 'error',
+        '-show_entries', 'stream=codec_type,height',
+        '-of', 'json',
+        source,
+    ]
+    try:
+        streams = json.loads(_run(command, timeout)).get('streams', [])
+    except (TranscodeError, ValueError):
+        return None, True
+    heights = [stream.get('height') for stream in streams if stream.get('codec_type') == 'video']
+    has_audio = any(stream.get('codec_type') == 'audio' for stream in streams)
+    return (heights[0] if heights else None), has_audio
+
+
+def _run(command, timeout):
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except FileNotFoundError:
+        raise TranscodeError(f"{command[0]} is not installed")
+    except subprocess.TimeoutExpired:
+        raise TranscodeError(f"{os.path.basename(command[0])} timed out after {timeout}s")
+    if completed.returncode != 0:
+        raise TranscodeError(completed.stderr.strip()[-2000:] or f"{command[0]} exited with {completed.returncode}")
+    return completed.stdout
+
+
+def transcode(spec):
+    """
+    Run one job's ffmpeg work. Executed in a pool process.
+
+    Args:
+        spec (dict): see job_spec()
+
+    Returns:
+        dict: duration, renditions, output_dir, hls/dash manifest paths,
+        thumbnail path and the S3 prefix the output was uploaded to (or None)
+    """
+    source = spec['source']
+    if spec.get('source_s3_key'):
+        # Uploaded straight to S3 (chunked upload); ffmpeg needs a local copy
+        os.makedirs(os.path.dirname(source), exist_ok=True)
+        storage = get_storage_service()
+        storage.client.download_file(storage.bucket, spec['source_s3_key'], source)
+        try:
+            return _transcode_local(spec)
+        finally:
+            if os.path.exists(source):
+                os.unlink(source)
+    return _transcode_local(spec)
+
+
+def _transcode_local(spec):
+    source, output_dir, timeout = spec['source'], spec['output_dir'], spec['timeout']
+    if not os.path.exists(source):
+        raise TranscodeError(f"Source file not found: {source}")
+    os.makedirs(os.path.dirname(spec['thumbnail']), exist_ok=True)
+
+    duration = probe_duration(source)
+    height, has_audio = probe_streams(source)
+    rungs = ladder_rungs(spec['ladder'], height)
+    segment_seconds = spec['segment_seconds']
+
+    command, playlists = hls_command(source, output_dir, rungs, has_audio, segment_seconds)
+    for playlist in playlists.values():
+        os.makedirs(os.path.dirname(playlist), exist_ok=True)
+    _run(command, timeout)
+
+    dash_manifest = None
+    if spec['dash']:
+        command, dash_manifest = dash_command(source, output_dir, rungs, has_audio, segment_seconds)
+        os.makedirs(os.path.dirname(dash_manifest), exist_ok=True)
+        _run(command, timeout)
+
+    _run(thumbnail_command(source, spec['thumbnail'], min(5, duration // 2)), 60)
+
+    if spec['s3_prefix']:
+        get_storage_service().upload_directory(
+            output_dir, spec['s3_prefix'], cache_control=spec['cache_control']
+        )
+        # Served from S3 from now on
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        'duration': duration,
+        'renditions': list(playlists),
+        'output_dir': output_dir,
+        'hls_manifest': os.path.join(output_dir, HLS_MASTER),
+        'dash_manifest': dash_manifest,
+        'thumbnail': spec['thumbnail'],
+        's3_prefix': spec['s3_prefix'],
+    }
+
+
+def job_spec(job):
+    """Plain-data description of a job that can be pickled to a pool process."""
+    source_s3_key = None
+    try:
+        media_root = default_storage.path('')
+        if job.source_file.startswith(S3_SOURCE_PREFIX):
+            source_s3_key = job.source_file[len(S3_SOURCE_PREFIX):]
+            extension = os.path.splitext(source_s3_key)[1]
+            source = os.path.join(media_root, 'videos', 'sources', f'{job.pk}{extension}')
+        else:
+            source = default_storage.path(job.source_file)
+    except NotImplementedError:
+        raise TranscodeError("Transcoding requires local file storage")
+    relative_dir = f'{STREAMS_DIR}/{job.video_id}/{job.pk}'
+    return {
+        'job_id': job.pk,
+        'source': source,
+        'source_s3_key': source_s3_key,
+        'output_dir': os.path.join(media_root, *relative_dir.split('/')),
+        'thumbnail': os.path.join(media_root, THUMBNAIL_DIR, f'{job.video_id}.jpg'),
+        'ladder': get_ladder(),
+        'segment_seconds': _setting('TRANSCODE_SEGMENT_SECONDS', 6),
+        'dash': _setting('TRANSCODE_DASH', False),
+        's3_prefix': relative_dir if _setting('USE_S3', False) else None,
+        'cache_control': segment_cache_control(signed=True),  # S3 objects are only fetched through presigned URLs
+        'timeout': _setting('TRANSCODE_JOB_TIMEOUT', 3600),
+    }
+
+
+def claim_jobs(limit):
+    """
+    Atomically move up to `limit` due jobs to 'processing'.
+
+    Due jobs are pending jobs whose retry time has passed, plus processing
+    jobs whose lease (TRANSCODE_JOB_LEASE, see renew_leases) expired.
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=_setting('TRANSCODE_JOB_LEASE', 300))
+    due = (
+        Q(status='pending') & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        | Q(status='processing', started_at__lt=stale_before)
+    )
+    with transaction.atomic():
+        ids = list(
+            TranscodingJob.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by('created_at', 'pk')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        TranscodingJob.objects.filter(pk__in=ids).update(
+            status='processing',
+            started_at=now,
+            completed_at=None,
+            attempts=F('attempts') + 1,
+        )
+    return list(TranscodingJob.objects.filter(pk__in=ids).select_related('video').order_by('created_at', 'pk'))
+
+
+def renew_leases(jobs):
+    """
+    Push back the lease of in-flight jobs by resetting started_at.
+
+    Only rows still in the attempt this worker claimed are renewed; returns
+    the ids of jobs another worker has reclaimed since.
+    """
+    now = timezone.now()
+    lost = []
+    for job in jobs:
+        renewed = TranscodingJob.objects.filter(pk=job.pk, status='processing', attempts=job.attempts).update(started_at=now)
+        if not renewed:
+            lost.append(job.pk)
+    return lost
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter for the given attempt number."""
+    base = _setting('TRANSCODE_RETRY_BACKOFF', 60)
+    delay = min(base * 2 ** max(attempts - 1, 0), _setting('TRANSCODE_RETRY_BACKOFF_MAX', 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _relative(path):
+    return os.path.relpath(path, default_storage.path('')).replace(os.sep, '/')
+
+
+def complete_job(job, result):
+    """Store a successful result on the job and its video."""
+    video = job.video
+    video.duration = result['duration']
+    video.thumbnail = _relative(result['thumbnail'])
+    video.hls_manifest = _relative(result['hls_manifest'])
+    video.dash_manifest = _relative(result['dash_manifest']) if result['dash_manifest'] else None
+    video.streams_in_s3 = bool(result['s3_prefix'])
+    video.status = 'ready'
+    now = timezone.now()
+    with transaction.atomic():
+        video.save(update_fields=[
+            'duration', 'thumbnail', 'hls_manifest', 'dash_manifest', 'streams_in_s3', 'status', 'updated_at',
+        ])
+        job.status = 'completed'
+        job.output_file = _relative(result['output_dir'])
+        job.error_message = None
+        job.completed_at = now
+        job.next_attempt_at = None
+        job.save(update_fields=['status', 'output_file', 'error_message', 'completed_at', 'next_attempt_at'])
+    logger.info(f"Transcoded video {video.pk} ({', '.join(result['renditions'])})")
+
+
+def fail_job(job, error):
+    """Schedule a retry, or mark the job and video failed after the last attempt."""
+    job.error_message = str(error)
+    if job.attempts < _setting('TRANSCODE_MAX_ATTEMPTS', 3):
+        job.status = 'pending'
+        job.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        job.save(update_fields=['status', 'error_message', 'next_attempt_at'])
+        logger.warning(f"Transcoding job {job.pk} failed (attempt {job.attempts}), retrying at {job.next_attempt_at}: {error}")
+        return
+
+    with transaction.atomic():
+        job.status = 'failed'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'completed_at'])
+        Video.objects.filter(pk=job.video_id).update(status='failed', updated_at=timezone.now())
+    logger.error(f"Transcoding job {job.pk} failed permanently: {error}")
@@ -0,0 +1,352 @@
+"""
+Chunked, resumable uploads for course videos and resources.
+
+A client starts an upload (file name, size and the fields of the Video or
+CourseResource to create), then PUTs the file in CHUNKED_UPLOAD_CHUNK_SIZE
+pieces, each with its SHA-256 in the X-Chunk-Checksum header. Chunks can
+arrive in any order and be resent; the status endpoint lists the ones still
+missing, so an interrupted upload resumes where it stopped. Completing the
+upload assembles the file and creates the Video (plus its TranscodingJob)
+or the CourseResource; the upload moves to 'assembling' first, so only one
+of several concurrent completion requests does the work.
+
+Chunks are read from the request stream in small blocks, so no worker ever
+holds more than one block in memory. In 'local' mode they are written to
+CHUNKED_UPLOAD_DIR and concatenated on completion. With USE_S3 and
+CHUNKED_UPLOAD_DIRECT_TO_S3, video chunks are forwarded as parts of an S3
+multipart upload and the file is never assembled on the web server.
+Resources always use local mode because CourseResource.file lives in the
+default (filesystem) storage.
+
+Uploads left unfinished for CHUNKED_UPLOAD_TTL seconds are removed by
+`python manage.py purge_chunked_uploads`.
+"""
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from datetime import timedelta
+from courses.models import CourseResource
+from .models import Video, TranscodingJob, ChunkedUpload, UploadChunk
+from .storage import get_storage_service
+from .transcoding import S3_SOURCE_PREFIX
+import hashlib
+import os
+import shutil
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """A client error in the upload protocol; `status` is the HTTP status to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def upload_mode(purpose):
+    if purpose == 'video' and _setting('USE_S3', False) and _setting('CHUNKED_UPLOAD_DIRECT_TO_S3', True):
+        return 's3'
+    return 'local'
+
+
+def chunk_dir(upload):
+    return os.path.join(_setting('CHUNKED_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'chunked_uploads')), str(upload.pk))
+
+
+def _chunk_path(upload, index):
+    return os.path.join(chunk_dir(upload), f'{index}.part')
+
+
+def start_upload(owner, course, purpose, filename, total_size, metadata):
+    """
+    Create an upload session.
+
+    Args:
+        owner: Instructor uploading the file
+        course (Course): Course the video or resource belongs to
+        purpose (str): 'video' or 'resource'
+        filename (str): Original file name
+        total_size (int): File size in bytes
+        metadata (dict): Fields for the object created on completion
+
+    Returns:
+        ChunkedUpload
+    """
+    max_size = _setting('CHUNKED_UPLOAD_MAX_SIZE', 10 * 1024 ** 3)
+    if total_size <= 0:
+        raise UploadError('File size must be positive')
+    if total_size > max_size:
+        raise UploadError(f'File exceeds the maximum upload size of {max_size} bytes', status=413)
+
+    filename = get_valid_filename(os.path.basename(filename)) or 'upload'
+    mode = upload_mode(purpose)
+    chunk_size = _setting('CHUNKED_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+    if mode == 's3':
+        chunk_size = max(chunk_size, S3_MIN_PART_SIZE)
+
+    upload = ChunkedUpload(
+        owner=owner,
+        course=course,
+        purpose=purpose,
+        filename=filename,
+        total_size=total_size,
+        chunk_size=chunk_size,
+        mode=mode,
+        metadata=metadata,
+    )
+    if mode == 's3':
+        storage = get_storage_service()
+        upload.s3_key = f'videos/uploads/{upload.pk}/{filename}'
+        response = storage.client.create_multipart_upload(Bucket=storage.bucket, Key=upload.s3_key)
+        upload.s3_upload_id = response['UploadId']
+    upload.save()
+    return upload
+
+
+def missing_chunks(upload):
+    received = set(upload.chunks.values_list('index', flat=True))
+    return [index for index in range(upload.chunk_count) if index not in received]
+
+
+def _spool(stream, length):
+    """Copy exactly `length` bytes of a stream to a temp file, hashing as it goes."""
+    digest = hashlib.sha256()
+    spooled = tempfile.SpooledTemporaryFile(max_size=READ_BLOCK_SIZE * 16)
+    remaining = length
+    while remaining > 0:
+        block = stream.read(min(READ_BLOCK_SIZE, remaining))
+        if not block:
+            break
+        digest.update(block)
+        spooled.write(block)
+        remaining -= len(block)
+    if remaining or stream.read(1):
+        spooled.close()
+        raise UploadError('Chunk body does not match its expected size')
+    spooled.seek(0)
+    return spooled, digest.hexdigest()
+
+
+def receive_chunk(upload, index, stream, length, checksum):
+    """
+    Store one chunk. Resending a chunk that was already received replaces it.
+
+    Args:
+        upload (ChunkedUpload): An upload in 'uploading' status
+        index (int): Zero-based chunk number
+        stream: File-like request body
+        length (int): Content-Length of the body
+        checksum (str): SHA-256 hex digest of the chunk sent by the client
+
+    Returns:
+        UploadChunk
+    """
+    if upload.status != 'uploading':
+        raise UploadError(f'Upload is {upload.status}', status=409)
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError('Chunk index out of range')
+    if length != upload.expected_chunk_size(index):
+        raise UploadError(f'Chunk {index} must be {upload.expected_chunk_size(index)} bytes')
+    if not checksum:
+        raise UploadError('X-Chunk-Checksum header is required')
+
+    spooled, digest = _spool(stream, length)
+    try:
+        if digest != checksum.lower():
+            raise UploadError(f'Checksum mismatch for chunk {index}', status=422)
+
+        etag = ''
+        if upload.mode == 's3':
+            storage = get_storage_service()
+            response = storage.client.upload_part(
+                Bucket=storage.bucket,
+                Key=upload.s3_key,
+                UploadId=upload.s3_upload_id,
+                PartNumber=index + 1,
+                Body=spooled,
+                ContentLength=length,
+            )
+            etag = response['ETag']
+        else:
+            path = _chunk_path(upload, index)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = f'{path}.{os.getpid()}.tmp'
+            with open(partial, 'wb') as out:
+                shutil.copyfileobj(spooled, out, READ_BLOCK_SIZE)
+            os.replace(partial, path)
+    finally:
+        spooled.close()
+
+    chunk, _ = UploadChunk.objects.update_or_create(
+        upload=upload,
+        index=index,
+        defaults={'size': length, 'checksum': digest, 'etag': etag},
+    )
+    ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+    return chunk
+
+
+class _AssembledFile(File):
+    """A local temp file the filesystem storage can move instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def _assemble(upload):
+    """Concatenate local chunks into one temp file and return its path."""
+    directory = chunk_dir(upload)
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.assembled')
+    with os.fdopen(fd, 'wb') as out:
+        for index in range(upload.chunk_count):
+            with open(_chunk_path(upload, index), 'rb') as part:
+                shutil.copyfileobj(part, out, 1024 * 1024)
+    return path
+
+
+def _create_result(upload, stored_name):
+    metadata = upload.metadata
+    if upload.purpose == 'video':
+        video = Video(
+            course=upload.course,
+            title=metadata.get('title', ''),
+            description=metadata.get('description', ''),
+            order=metadata.get('order', 0),
+        )
+        if upload.mode == 's3':
+            video.video_file.name = upload.s3_key
+            video.s3_video_key = upload.s3_key
+            source_file = f'{S3_SOURCE_PREFIX}{upload.s3_key}'
+        else:
+            video.video_file.name = stored_name
+            source_file = stored_name
+        video.save()
+        TranscodingJob.objects.create(video=video, source_file=source_file)
+        return video.pk
+
+    resource = CourseResource.objects.create(
+        course=upload.course,
+        title=metadata.get('title', ''),
+        description=metadata.get('description', ''),
+        resource_type=metadata.get('resource_type', ''),
+        file=stored_name,
+        order=metadata.get('order', 0),
+    )
+    return resource.pk
+
+
+def complete_upload(upload):
+    """
+    Assemble a fully received upload and create its Video or CourseResource.
+
+    Returns:
+        int: Primary key of the created object
+    """
+    if upload.status == 'completed':
+        return upload.result_id
+    if upload.status != 'uploading':
+        raise UploadError(f'Upload is {upload.status}', status=409)
+    missing = missing_chunks(upload)
+    if missing:
+        raise UploadError(f'{len(missing)} chunks have not been received', status=409)
+
+    claimed = ChunkedUpload.objects.filter(pk=upload.pk, status='uploading').update(
+        status='assembling', updated_at=timezone.now()
+    )
+    if not claimed:
+        raise UploadError('Upload is already being completed', status=409)
+    upload.status = 'assembling'
+    try:
+        return _finish_upload(upload)
+    except Exception:
+        # Let the client retry; chunks are kept until the upload completes
+        ChunkedUpload.objects.filter(pk=upload.pk, status='assembling').update(
+            status='uploading', updated_at=timezone.now()
+        )
+        upload.status = 'uploading'
+        raise
+
+
+def _finish_upload(upload):
+    stored_name = None
+    if upload.mode == 's3':
+        storage = get_storage_service()
+        parts = [
+            {'PartNumber': index + 1, 'ETag': etag}
+            for index, etag in upload.chunks.order_by('index').values_list('index', 'etag')
+        ]
+        storage.client.complete_multipart_upload(
+            Bucket=storage.bucket,
+            Key=upload.s3_key,
+            UploadId=upload.s3_upload_id,
+            MultipartUpload={'Parts': parts},
+        )
+    else:
+        path = _assemble(upload)
+        try:
+            if os.path.getsize(path) != upload.total_size:
+                raise UploadError('Assembled file size does not match the declared size', status=409)
+            upload_to = 'videos/' if upload.purpose == 'video' else 'course_resources/'
+            with open(path, 'rb') as assembled:
+                stored_name = default_storage.save(upload_to + upload.filename, _AssembledFile(assembled, name=upload.filename))
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    with transaction.atomic():
+        upload.result_id = _create_result(upload, stored_name)
+        upload.status = 'completed'
+        upload.save(update_fields=['result_id', 'status', 'updated_at'])
+    _discard_chunks(upload)
+    logger.info(f"Chunked upload {upload.pk} completed as {upload.purpose} {upload.result_id}")
+    return upload.result_id
+
+
+def _discard_chunks(upload):
+    upload.chunks.all().delete()
+    shutil.rmtree(chunk_dir(upload), ignore_errors=True)
+
+
+def abort_upload(upload):
+    """Cancel an upload and release its chunks (and the S3 multipart upload)."""
+    if upload.status == 'completed':
+        raise UploadError('Upload is already completed', status=409)
+    if upload.mode == 's3' and upload.s3_upload_id and upload.status in ('uploading', 'assembling'):
+        storage = get_storage_service()
+        try:
+            storage.client.abort_multipart_upload(Bucket=storage.bucket, Key=upload.s3_key, UploadId=upload.s3_upload_id)
+        except Exception as e:
+            logger.warning(f"Could not abort S3 multipart upload for {upload.pk}: {e}")
+    upload.status = 'aborted'
+    upload.save(update_fields=['status', 'updated_at'])
+    _discard_chunks(upload)
+
+
+def purge_stale_uploads(ttl=None):
+    """
+    Abort uploads with no activity for `ttl` seconds (CHUNKED_UPLOAD_TTL),
+    including ones left 'assembling' by a worker that died mid-completion.
+
+    Returns:
+        int: Number of uploads aborted
+    """
+    ttl = ttl if ttl is not None else _setting('CHUNKED_UPLOAD_TTL', 60 * 60 * 24)
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    purged = 0
+    for upload in ChunkedUpload.objects.filter(status__in=('uploading', 'assembling'), updated_at__lt=cutoff).iterator():
+        abort_upload(upload)
+        purged += 1
+    return purged
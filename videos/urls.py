@@ -7,5 +7,10 @@ urlpatterns = [
     path('course/<int:course_id>/upload', views.upload_video, name='upload_video'),
     path('watch/<int:video_id>/', views.watch_video, name='watch_video'),
     path('stream/<int:video_id>/', views.stream_video, name='stream_video'),
+    path('stream/<int:video_id>/<path:name>', views.stream_asset, name='stream_asset'),
     path('video/<int:video_id>/progress/', views.save_progress, name='save_progress'),
+    path('course/<int:course_id>/uploads/', views.start_chunked_upload, name='start_chunked_upload'),
+    path('uploads/<uuid:upload_id>/', views.chunked_upload_status, name='chunked_upload_status'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/complete', views.complete_chunked_upload, name='complete_chunked_upload'),
 ]
@@ -1,13 +1,47 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, StreamingHttpResponse
+from django.http import JsonResponse, HttpResponse, Http404
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.urls import reverse
 from courses.models import Course, Enrollment
-from .models import Video, VideoProgress, TranscodingJob
+from django.views.decorators.http import require_POST, require_http_methods
+from .models import Video, VideoProgress, TranscodingJob, ChunkedUpload
 from .forms import VideoUploadForm
+from .streaming import serve_file, get_stream_info, parse_stream_asset, segment_cache_control
+from .storage import presigned_video_url, get_storage_service, guess_content_type
+from .progress import get_video_meta, record_heartbeat
+from .uploads import UploadError, start_upload, receive_chunk, complete_upload, abort_upload, missing_chunks
+from courses.models import CourseResource
 import os
+import time
 from accounts.decorators import instructor_required
 
 
+def _has_course_access(request, course_id, instructor_id):
+    """
+    Whether the user may watch a course, remembered in the session.
+
+    Segment requests arrive every few seconds per viewer, so a positive
+    enrollment check is reused for VIDEO_ACCESS_CACHE_TTL seconds.
+    """
+    if request.user.id == instructor_id:
+        return True
+    access = request.session.get('video_access', {})
+    key = str(course_id)
+    if access.get(key, 0) > time.time():
+        return True
+    if not Enrollment.objects.filter(student=request.user, course_id=course_id, is_active=True).exists():
+        return False
+    # Drop expired entries while we are writing the session anyway
+    now = time.time()
+    access = {course: expires for course, expires in access.items() if expires > now}
+    access[key] = now + getattr(settings, 'VIDEO_ACCESS_CACHE_TTL', 300)
+    request.session['video_access'] = access
+    return True
+
+
 @instructor_required
 def upload_video(request, course_id):
     """Upload video to course (instructor only)"""
@@ -60,6 +94,8 @@ def watch_video(request, video_id):
         'video': video,
         'course': course,
         'progress': progress,
+        'hls_url': reverse('videos:stream_asset', args=[video.id, 'master.m3u8']) if video.hls_manifest else None,
+        'dash_url': reverse('videos:stream_asset', args=[video.id, 'dash/manifest.mpd']) if video.dash_manifest else None,
     }
     return render(request, 'videos/watch_video.html', context)
 
@@ -80,60 +116,57 @@ def stream_video(request, video_id):
     if not is_enrolled and course.instructor != request.user:
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
-    # If video is stored in S3
+    # If video is stored in S3 - reuse a cached presigned URL when possible
     if video.s3_video_key:
-        import boto3
-        from django.conf import settings
-        s3_client = boto3.client('s3', region_name=settings.AWS_S3_REGION_NAME)
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': video.s3_video_key},
-            ExpiresIn=3600
-        )
-        return redirect(presigned_url)
+        return redirect(presigned_video_url(video.s3_video_key, request.user))
     
-    # Local file streaming
+    # Local file streaming - handed to sendfile or the fronting proxy
     file_path = video.video_file.path
     if not os.path.exists(file_path):
         return JsonResponse({'error': 'Video not found'}, status=404)
     
-    file_size = os.path.getsize(file_path)
-    range_header = request.META.get('HTTP_RANGE', '')
+    return serve_file(request, file_path, relative_name=video.video_file.name)
+
+
+@login_required
+def stream_asset(request, video_id, name):
+    """Serve an HLS/DASH manifest or segment for a transcoded video"""
+    info = get_stream_info(video_id)
+    asset = parse_stream_asset(name)
+    if info is None or info['base'] is None or asset is None:
+        raise Http404('Stream not found')
+    
+    if not _has_course_access(request, info['course_id'], info['instructor_id']):
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
     
-    if range_header:
-        # Parse range header
-        range_match = range_header.replace('bytes=', '').split('-')
-        start = int(range_match[0]) if range_match[0] else 0
-        end = int(range_match[1]) if range_match[1] else file_size - 1
-        
-        def file_generator():
-            with open(file_path, 'rb') as f:
-                f.seek(start)
-                remaining = end - start + 1
-                while remaining > 0:
-                    chunk_size = min(8192, remaining)
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    remaining -= len(chunk)
-                    yield chunk
-        
-        response = StreamingHttpResponse(file_generator(), content_type='video/mp4')
-        response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-        response['Content-Length'] = end - start + 1
-        response.status_code = 206
-        return response
-    
-    def file_generator():
-        with open(file_path, 'rb') as f:
-            while True:
-                chunk = f.read(8192)
-                if not chunk:
-                    break
-                yield chunk
-    
-    response = StreamingHttpResponse(file_generator(), content_type='video/mp4')
-    response['Content-Length'] = file_size
+    name, is_manifest = asset
+    storage_name = f"{info['base']}/{name}"
+    content_type = guess_content_type(name)
+    # Output directories are per transcoding job, so a URL never changes content
+    if is_manifest:
+        cache_control = getattr(settings, 'VIDEO_MANIFEST_CACHE_CONTROL', 'private, max-age=3600')
+    else:
+        cache_control = segment_cache_control()
+    
+    if info['in_s3']:
+        if is_manifest:
+            # Manifests are proxied so their relative URIs resolve back to this view
+            cache_key = f'videos:manifest:{storage_name}'
+            body = cache.get(cache_key)
+            if body is None:
+                body = get_storage_service().read_object(storage_name)
+                cache.set(cache_key, body, timeout=None)
+            response = HttpResponse(body, content_type=content_type)
+        else:
+            response = redirect(presigned_video_url(storage_name, request.user))
+            cache_control = 'private, max-age=60'
+    else:
+        file_path = default_storage.path(storage_name)
+        if not os.path.exists(file_path):
+            raise Http404('Stream not found')
+        response = serve_file(request, file_path, relative_name=storage_name, content_type=content_type)
+    
+    response['Cache-Control'] = cache_control
     return response
 
 
@@ -143,21 +176,114 @@ def save_progress(request, video_id):
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
     
-    video = get_object_or_404(Video, id=video_id)
+    video_meta = get_video_meta(video_id)
+    if video_meta is None:
+        return JsonResponse({'error': 'Video not found'}, status=404)
+    duration, course_id = video_meta
     
     try:
-        watched_duration = int(request.POST.get('watched_duration', 0))
-        progress, created = VideoProgress.objects.get_or_create(
-            video=video,
-            student=request.user
+        watched_duration = max(int(request.POST.get('watched_duration', 0)), 0)
+        # Heartbeats are coalesced and written in bulk by the progress buffer
+        completion_percent, is_completed = record_heartbeat(
+            request.user.id, video_id, watched_duration, duration
         )
-        progress.watched_duration = watched_duration
-        progress.update_completion()
         
         return JsonResponse({
             'status': 'success',
-            'completion_percent': float(progress.completion_percent),
-            'is_completed': progress.is_completed
+            'completion_percent': float(completion_percent),
+            'is_completed': is_completed
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
+
+
+def _upload_status(upload):
+    return {
+        'upload_id': str(upload.pk),
+        'status': upload.status,
+        'mode': upload.mode,
+        'chunk_size': upload.chunk_size,
+        'chunk_count': upload.chunk_count,
+        'missing_chunks': missing_chunks(upload) if upload.status == 'uploading' else [],
+        'result_id': upload.result_id,
+    }
+
+
+@instructor_required
+@require_POST
+def start_chunked_upload(request, course_id):
+    """Start a resumable upload of a video or course resource (instructor only)"""
+    course = get_object_or_404(Course, id=course_id, instructor=request.user)
+    
+    purpose = request.POST.get('purpose', 'video')
+    title = request.POST.get('title', '').strip()
+    resource_type = request.POST.get('resource_type', '')
+    
+    if purpose not in dict(ChunkedUpload.PURPOSE_CHOICES):
+        return JsonResponse({'error': 'Invalid purpose'}, status=400)
+    if not title:
+        return JsonResponse({'error': 'Title is required'}, status=400)
+    if purpose == 'resource' and resource_type not in dict(CourseResource.RESOURCE_TYPE_CHOICES):
+        return JsonResponse({'error': 'Invalid resource type'}, status=400)
+    
+    try:
+        total_size = int(request.POST.get('size', 0))
+        order = int(request.POST.get('order') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'size and order must be integers'}, status=400)
+    
+    metadata = {
+        'title': title,
+        'description': request.POST.get('description', ''),
+        'order': order,
+    }
+    if purpose == 'resource':
+        metadata['resource_type'] = resource_type
+    
+    try:
+        upload = start_upload(request.user, course, purpose, request.POST.get('filename', ''), total_size, metadata)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_status(upload), status=201)
+
+
+@instructor_required
+@require_http_methods(['GET', 'DELETE'])
+def chunked_upload_status(request, upload_id):
+    """Report which chunks are still missing (GET) or abort the upload (DELETE)"""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, owner=request.user)
+    
+    if request.method == 'DELETE':
+        try:
+            abort_upload(upload)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_status(upload))
+
+
+@instructor_required
+@require_http_methods(['PUT'])
+def upload_chunk(request, upload_id, index):
+    """Receive one chunk; the body is the raw bytes, X-Chunk-Checksum its SHA-256"""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, owner=request.user)
+    
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        # Read the body as a stream rather than through request.body
+        chunk = receive_chunk(upload, index, request, length, request.headers.get('X-Chunk-Checksum', ''))
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse({'index': chunk.index, 'checksum': chunk.checksum})
+
+
+@instructor_required
+@require_POST
+def complete_chunked_upload(request, upload_id):
+    """Assemble a fully received upload and create the video or resource"""
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, owner=request.user)
+    
+    try:
+        complete_upload(upload)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    return JsonResponse(_upload_status(upload))